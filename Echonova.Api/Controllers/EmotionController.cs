@@ -32,5 +32,32 @@ public class EmotionController : ControllerBase
         var result = await _emotionService.PredictEmotionAsync(stream, file.FileName, ct);
         return Ok(result);
     }
-}
 
+    /// <summary>
+    /// Accepts several facial images (e.g. a camera burst, in capture order) and returns per-frame
+    /// emotions plus a temporally smoothed aggregate from a single call to the emotion service.
+    /// </summary>
+    [HttpPost("facial/batch")]
+    [RequestSizeLimit(32 * 1024 * 1024)]
+    public async Task<IActionResult> PredictFacialEmotionBatch([FromForm] List<IFormFile> files, CancellationToken ct)
+    {
+        if (files == null || files.Count == 0 || files.Any(f => f.Length == 0))
+        {
+            return BadRequest("At least one non-empty image file is required.");
+        }
+
+        var streams = files.Select(f => (f.OpenReadStream(), f.FileName)).ToList();
+        try
+        {
+            var result = await _emotionService.PredictEmotionBatchAsync(streams, ct);
+            return Ok(result);
+        }
+        finally
+        {
+            foreach (var (stream, _) in streams)
+            {
+                await stream.DisposeAsync();
+            }
+        }
+    }
+}
@@ -34,8 +34,8 @@ public class RecommendationsController : ControllerBase
             return Ok(new RecommendationListResponse(Array.Empty<SongResponse>()));
 
         var items = trackIds.Count == 1
-            ? await _recommendations.RecommendByTrackIdAsync(trackIds[0], 10, ct)
-            : await _recommendations.RecommendFromMultipleAsync(trackIds, 10, ct);
+            ? await _recommendations.RecommendByTrackIdAsync(trackIds[0], 10, ct: ct)
+            : await _recommendations.RecommendFromMultipleAsync(trackIds, 10, ct: ct);
 
         return Ok(new RecommendationListResponse(items));
     }
@@ -46,7 +46,10 @@ public class RecommendationsController : ControllerBase
         if (request.N <= 0 || request.N > 100)
             return BadRequest("N must be between 1 and 100.");
 
-        var items = await _recommendations.RecommendByTrackIdAsync(request.TrackId, request.N, ct);
+        if (request.Filters is { } filters && !AreValid(filters))
+            return BadRequest("MaxPerArtist must be at least 1 and Diversity between 0 and 1.");
+
+        var items = await _recommendations.RecommendByTrackIdAsync(request.TrackId, request.N, request.Filters, ct);
         return Ok(new RecommendationListResponse(items));
     }
 
@@ -58,7 +61,32 @@ public class RecommendationsController : ControllerBase
         if (request.N <= 0 || request.N > 100)
             return BadRequest("N must be between 1 and 100.");
 
-        var items = await _recommendations.RecommendFromMultipleAsync(request.TrackIds, request.N, ct);
+        if (request.Filters is { } filters && !AreValid(filters))
+            return BadRequest("MaxPerArtist must be at least 1 and Diversity between 0 and 1.");
+
+        var items = await _recommendations.RecommendFromMultipleAsync(request.TrackIds, request.N, request.Filters, ct);
         return Ok(new RecommendationListResponse(items));
     }
+
+    /// <summary>
+    /// Mood playlist: songs matching the listener's detected emotion, optionally near a seed track.
+    /// </summary>
+    [HttpPost("by-emotion")]
+    public async Task<IActionResult> RecommendByEmotion([FromBody] RecommendByEmotionRequest request, CancellationToken ct)
+    {
+        if (request.Probabilities == null || request.Probabilities.Count == 0)
+            return BadRequest("Probabilities cannot be empty.");
+        if (request.N <= 0 || request.N > 100)
+            return BadRequest("N must be between 1 and 100.");
+
+        if (request.Filters is { } filters && !AreValid(filters))
+            return BadRequest("MaxPerArtist must be at least 1 and Diversity between 0 and 1.");
+
+        var items = await _recommendations.RecommendByEmotionAsync(
+            request.Probabilities, request.SeedTrackId, request.N, request.Filters, ct);
+        return Ok(new RecommendationListResponse(items));
+    }
+
+    private static bool AreValid(RecommendationFilters filters) =>
+        filters.MaxPerArtist is null or >= 1 && filters.Diversity is >= 0 and <= 1;
 }
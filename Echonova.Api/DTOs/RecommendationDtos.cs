@@ -2,15 +2,34 @@ using System.Text.Json.Serialization;
 
 namespace Echonova.Api.DTOs;
 
-public record RecommendByTrackIdRequest(string TrackId, int N = 10);
+/// <summary>
+/// Filters the recommendation service applies while picking the top N, so a response is not
+/// cut short by filtering it afterwards: track IDs never to return (e.g. already played), a cap
+/// on songs per artist, and a diversity weight from 0 (similarity only) to 1.
+/// </summary>
+public record RecommendationFilters(
+    IReadOnlyList<string>? ExcludeTrackIds = null, int? MaxPerArtist = null, double Diversity = 0);
+
+public record RecommendByTrackIdRequest(
+    string TrackId, int N = 10, RecommendationFilters? Filters = null);
 
-public record RecommendFromMultipleRequest(IReadOnlyList<string> TrackIds, int N = 20);
+public record RecommendFromMultipleRequest(
+    IReadOnlyList<string> TrackIds, int N = 20, RecommendationFilters? Filters = null);
+
+/// <summary>
+/// Emotion probabilities by class name, e.g. the <c>aggregate</c> of <c>POST /emotion/facial/batch</c>.
+/// </summary>
+public record RecommendByEmotionRequest(
+    IReadOnlyDictionary<string, double> Probabilities,
+    string? SeedTrackId = null,
+    int N = 10,
+    RecommendationFilters? Filters = null);
 
 public record RecommendationListResponse(IReadOnlyList<SongResponse> Items);
 
 /// <summary>
 /// Shape of a single recommendation item returned by the Python FastAPI service.
-/// We only rely on title/artist/genre to map back to our Song collection.
+/// Songs are mapped back to our Song collection by track_id (title/artist when it is missing).
 /// </summary>
 public sealed class MusicRecItemDto
 {
@@ -1,4 +1,5 @@
 using System.Net.Http.Headers;
+using System.Text.Json.Serialization;
 using Echonova.Api.Options;
 using Microsoft.Extensions.Options;
 
@@ -7,6 +8,12 @@ namespace Echonova.Api.Services;
 public interface IEmotionService
 {
     Task<FacialEmotionResult> PredictEmotionAsync(Stream imageStream, string fileName, CancellationToken ct = default);
+
+    /// <summary>
+    /// Predicts the emotion of several images (e.g. a camera burst, in capture order) in one call.
+    /// </summary>
+    Task<FacialEmotionBatchResult> PredictEmotionBatchAsync(
+        IReadOnlyList<(Stream Stream, string FileName)> images, CancellationToken ct = default);
 }
 
 public sealed class FacialEmotionResult
@@ -18,6 +25,56 @@ public sealed class FacialEmotionResult
     public IReadOnlyList<string> Classes { get; set; } = Array.Empty<string>();
 }
 
+public sealed class FacialEmotionPrediction
+{
+    [JsonPropertyName("predicted_label")]
+    public string PredictedLabel { get; set; } = string.Empty;
+
+    [JsonPropertyName("predicted_index")]
+    public int PredictedIndex { get; set; }
+
+    [JsonPropertyName("probabilities")]
+    public IReadOnlyDictionary<string, double> Probabilities { get; set; } = new Dictionary<string, double>();
+}
+
+public sealed class FacialEmotionFrame
+{
+    [JsonPropertyName("index")]
+    public int Index { get; set; }
+
+    [JsonPropertyName("filename")]
+    public string? FileName { get; set; }
+
+    [JsonPropertyName("predicted_label")]
+    public string? PredictedLabel { get; set; }
+
+    [JsonPropertyName("smoothed_label")]
+    public string? SmoothedLabel { get; set; }
+
+    [JsonPropertyName("probabilities")]
+    public IReadOnlyDictionary<string, double>? Probabilities { get; set; }
+
+    /// <summary>Set instead of a prediction when the frame could not be decoded.</summary>
+    [JsonPropertyName("error")]
+    public string? Error { get; set; }
+}
+
+public sealed class FacialEmotionBatchResult
+{
+    [JsonPropertyName("frames")]
+    public IReadOnlyList<FacialEmotionFrame> Frames { get; set; } = Array.Empty<FacialEmotionFrame>();
+
+    [JsonPropertyName("n_decoded")]
+    public int DecodedCount { get; set; }
+
+    /// <summary>Emotion over the temporally smoothed frames; use this as the mood.</summary>
+    [JsonPropertyName("aggregate")]
+    public FacialEmotionPrediction Aggregate { get; set; } = new();
+
+    [JsonPropertyName("classes")]
+    public IReadOnlyList<string> Classes { get; set; } = Array.Empty<string>();
+}
+
 public class EmotionService : IEmotionService
 {
     private readonly IHttpClientFactory _httpClientFactory;
@@ -31,14 +88,7 @@ public class EmotionService : IEmotionService
 
     public async Task<FacialEmotionResult> PredictEmotionAsync(Stream imageStream, string fileName, CancellationToken ct = default)
     {
-        var baseUrl = _options.FacialApiBaseUrl?.TrimEnd('/');
-        if (string.IsNullOrWhiteSpace(baseUrl))
-        {
-            throw new InvalidOperationException("FacialApiBaseUrl is not configured.");
-        }
-
-        var client = _httpClientFactory.CreateClient("facial-emotion");
-        client.BaseAddress ??= new Uri(baseUrl);
+        var client = CreateClient();
 
         using var content = new MultipartFormDataContent();
         var streamContent = new StreamContent(imageStream);
@@ -56,5 +106,42 @@ public class EmotionService : IEmotionService
 
         return dto;
     }
-}
 
+    public async Task<FacialEmotionBatchResult> PredictEmotionBatchAsync(
+        IReadOnlyList<(Stream Stream, string FileName)> images, CancellationToken ct = default)
+    {
+        var client = CreateClient();
+
+        using var content = new MultipartFormDataContent();
+        foreach (var (stream, fileName) in images)
+        {
+            var streamContent = new StreamContent(stream);
+            streamContent.Headers.ContentType = MediaTypeHeaderValue.Parse("image/jpeg");
+            content.Add(streamContent, "files", fileName);
+        }
+
+        using var response = await client.PostAsync("/emotion/predict-batch", content, ct);
+        response.EnsureSuccessStatusCode();
+
+        var dto = await response.Content.ReadFromJsonAsync<FacialEmotionBatchResult>(cancellationToken: ct);
+        if (dto == null)
+        {
+            throw new InvalidOperationException("Failed to deserialize batch emotion prediction response.");
+        }
+
+        return dto;
+    }
+
+    private HttpClient CreateClient()
+    {
+        var baseUrl = _options.FacialApiBaseUrl?.TrimEnd('/');
+        if (string.IsNullOrWhiteSpace(baseUrl))
+        {
+            throw new InvalidOperationException("FacialApiBaseUrl is not configured.");
+        }
+
+        var client = _httpClientFactory.CreateClient("facial-emotion");
+        client.BaseAddress ??= new Uri(baseUrl);
+        return client;
+    }
+}
@@ -7,8 +7,21 @@ namespace Echonova.Api.Services;
 
 public interface IRecommendationService
 {
-    Task<IReadOnlyList<SongResponse>> RecommendByTrackIdAsync(string trackId, int n, CancellationToken ct = default);
-    Task<IReadOnlyList<SongResponse>> RecommendFromMultipleAsync(IReadOnlyList<string> trackIds, int n, CancellationToken ct = default);
+    Task<IReadOnlyList<SongResponse>> RecommendByTrackIdAsync(
+        string trackId, int n, RecommendationFilters? filters = null, CancellationToken ct = default);
+    Task<IReadOnlyList<SongResponse>> RecommendFromMultipleAsync(
+        IReadOnlyList<string> trackIds, int n, RecommendationFilters? filters = null, CancellationToken ct = default);
+
+    /// <summary>
+    /// Songs matching an emotion distribution (as returned by the emotion service), optionally
+    /// around a seed track, in a single call to the recommendation service.
+    /// </summary>
+    Task<IReadOnlyList<SongResponse>> RecommendByEmotionAsync(
+        IReadOnlyDictionary<string, double> probabilities,
+        string? seedTrackId,
+        int n,
+        RecommendationFilters? filters = null,
+        CancellationToken ct = default);
 }
 
 public class RecommendationService : IRecommendationService
@@ -27,17 +40,26 @@ public class RecommendationService : IRecommendationService
         _options = options.Value;
     }
 
-    public async Task<IReadOnlyList<SongResponse>> RecommendByTrackIdAsync(string trackId, int n, CancellationToken ct = default)
+    public async Task<IReadOnlyList<SongResponse>> RecommendByTrackIdAsync(
+        string trackId, int n, RecommendationFilters? filters = null, CancellationToken ct = default)
     {
         var seedSong = await _songs.GetByTrackIdAsync(trackId, ct);
         if (seedSong is null) return Array.Empty<SongResponse>();
 
-        var payload = new { title = seedSong.Title, n };
+        var payload = new
+        {
+            title = seedSong.Title,
+            n,
+            exclude_track_ids = filters?.ExcludeTrackIds ?? Array.Empty<string>(),
+            max_per_artist = filters?.MaxPerArtist,
+            diversity = filters?.Diversity ?? 0,
+        };
         var items = await CallMusicRecApiAsync("/recommend/by-title", payload, ct);
         return await MapToSongsAsync(items, ct);
     }
 
-    public async Task<IReadOnlyList<SongResponse>> RecommendFromMultipleAsync(IReadOnlyList<string> trackIds, int n, CancellationToken ct = default)
+    public async Task<IReadOnlyList<SongResponse>> RecommendFromMultipleAsync(
+        IReadOnlyList<string> trackIds, int n, RecommendationFilters? filters = null, CancellationToken ct = default)
     {
         if (trackIds.Count == 0) return Array.Empty<SongResponse>();
 
@@ -51,11 +73,40 @@ public class RecommendationService : IRecommendationService
 
         if (titles.Count == 0) return Array.Empty<SongResponse>();
 
-        var payload = new { titles, n };
+        var payload = new
+        {
+            titles,
+            n,
+            exclude_track_ids = filters?.ExcludeTrackIds ?? Array.Empty<string>(),
+            max_per_artist = filters?.MaxPerArtist,
+            diversity = filters?.Diversity ?? 0,
+        };
         var items = await CallMusicRecApiAsync("/recommend/from-multiple", payload, ct);
         return await MapToSongsAsync(items, ct);
     }
 
+    public async Task<IReadOnlyList<SongResponse>> RecommendByEmotionAsync(
+        IReadOnlyDictionary<string, double> probabilities,
+        string? seedTrackId,
+        int n,
+        RecommendationFilters? filters = null,
+        CancellationToken ct = default)
+    {
+        if (probabilities.Count == 0) return Array.Empty<SongResponse>();
+
+        var payload = new
+        {
+            probabilities,
+            track_id = seedTrackId,
+            n,
+            exclude_track_ids = filters?.ExcludeTrackIds ?? Array.Empty<string>(),
+            max_per_artist = filters?.MaxPerArtist,
+            diversity = filters?.Diversity ?? 0,
+        };
+        var items = await CallMusicRecApiAsync("/recommend/by-emotion", payload, ct);
+        return await MapToSongsAsync(items, ct);
+    }
+
     private async Task<IReadOnlyList<MusicRecItemDto>> CallMusicRecApiAsync(string path, object payload, CancellationToken ct)
     {
         var baseUrl = _options.MusicRecApiBaseUrl?.TrimEnd('/');
@@ -74,10 +125,21 @@ public class RecommendationService : IRecommendationService
 
     private async Task<IReadOnlyList<SongResponse>> MapToSongsAsync(IReadOnlyList<MusicRecItemDto> items, CancellationToken ct)
     {
+        // Items carry their track_id, so all songs are fetched in one query. Items without one
+        // (from an older recommendation service) fall back to a title/artist lookup each.
+        var trackIds = items.Select(i => i.TrackId).OfType<string>().Where(id => id.Length > 0);
+        var byTrackId = (await _songs.GetByTrackIdsAsync(trackIds, ct))
+            .GroupBy(s => s.TrackId)
+            .ToDictionary(g => g.Key, g => g.First());
+
         var results = new List<SongResponse>();
         foreach (var item in items)
         {
-            var song = await _songs.GetByTitleAndArtistAsync(item.Title, item.Artist, ct);
+            SongResponse? song;
+            if (!string.IsNullOrEmpty(item.TrackId))
+                byTrackId.TryGetValue(item.TrackId, out song);
+            else
+                song = await _songs.GetByTitleAndArtistAsync(item.Title, item.Artist, ct);
             if (song != null) results.Add(song);
         }
         return results;
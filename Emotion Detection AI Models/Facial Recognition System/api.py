@@ -1,13 +1,47 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, HTTPException, Query, Response, UploadFile
+from fastapi.responses import PlainTextResponse
 
-from emotion_model_utils import EMOTION_CLASSES, predict_emotion_from_bytes
+import shared_path  # noqa: F401  (before service_common)
+from emotion_model_utils import (
+    EMOTION_CLASSES,
+    ENGINE,
+    FACE_DETECTION,
+    SMOOTHING_ALPHA,
+    get_batcher,
+    get_face_pool,
+    get_prediction_cache,
+    predict_emotion_async,
+    predict_emotion_batch_async,
+)
+from service_common import metrics, serving
 
 
-app = FastAPI(title="Facial Emotion Recognition API")
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Uploads are decoded on the SERVING_THREADS pool; the forward passes run
+    # on the batcher's one thread, which gets this worker's share of the
+    # cores for BLAS / TensorFlow. Both are set before the model loads.
+    serving.configure_thread_pools()
+    serving.limit_blas_threads()
+    # The batcher's worker thread loads and warms up the model in the
+    # background, so the worker starts serving straight away; /ready turns
+    # 200 once it is done. The face detection pool starts here so that a
+    # missing OpenCV still fails start-up.
+    get_batcher()
+    if FACE_DETECTION != "off":
+        get_face_pool()
+    yield
+
+
+app = FastAPI(title="Facial Emotion Recognition API", lifespan=lifespan)
+app.add_middleware(serving.LoadShedder)
+app.add_middleware(metrics.MetricsMiddleware)
 
 
 @app.post("/emotion/predict")
@@ -16,11 +50,14 @@ async def predict_emotion(file: UploadFile = File(...)) -> Dict[str, Any]:
     Predict facial emotion from an uploaded image.
 
     The backend can call this endpoint by sending a multipart/form-data
-    request with an image file under the "file" field.
+    request with an image file under the "file" field. Concurrent requests
+    share forward passes through the inference batcher. With face detection
+    enabled (``EMOTION_FACE_DETECTION``) the response also lists every face
+    found; ``timings`` breaks the request down by stage.
     """
     try:
         contents = await file.read()
-        result = predict_emotion_from_bytes(contents)
+        result = await predict_emotion_async(contents)
     except FileNotFoundError as exc:
         # model files missing on the server
         raise HTTPException(status_code=500, detail=str(exc)) from exc
@@ -32,10 +69,90 @@ async def predict_emotion(file: UploadFile = File(...)) -> Dict[str, Any]:
         "predicted_label": result["predicted_label"],
         "predicted_index": result["predicted_index"],
         "probabilities": result["probabilities"],
+        **({"faces": result["faces"]} if "faces" in result else {}),
+        "timings": result["timings"],
         "classes": EMOTION_CLASSES,
     }
 
 
+@app.post("/emotion/predict-batch")
+async def predict_emotion_batch(
+    files: List[UploadFile] = File(...),
+    alpha: float = Query(SMOOTHING_ALPHA, ge=0.0, le=1.0),
+) -> Dict[str, Any]:
+    """
+    Predict facial emotion for several images in one request.
+
+    Send the images as repeated "files" fields of a multipart/form-data
+    request; for a camera burst or video frames, send them in capture order.
+    All frames share one forward pass. The aggregate emotion is taken over
+    exponentially smoothed probabilities (``alpha`` is the weight of the
+    newest frame), so one noisy frame does not flip the result.
+    """
+    try:
+        contents = await asyncio.gather(*(file.read() for file in files))
+        result = await predict_emotion_batch_async(list(contents), alpha=alpha)
+    except FileNotFoundError as exc:
+        # model files missing on the server
+        raise HTTPException(status_code=500, detail=str(exc)) from exc
+    except Exception as exc:  # noqa: BLE001
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+    for frame, file in zip(result["frames"], files):
+        frame["filename"] = file.filename
+
+    return {**result, "classes": EMOTION_CLASSES}
+
+
+@app.get("/emotion/stats")
+def inference_stats() -> Dict[str, Any]:
+    """
+    Report the inference queue depth, the batch-size histogram and the
+    prediction cache counters.
+    """
+    return {**get_batcher().stats(), "cache": get_prediction_cache().stats()}
+
+
+@app.get("/ready")
+def readiness(response: Response) -> Dict[str, Any]:
+    """
+    Readiness probe: 200 once the model is loaded and warmed up, 503 while it
+    is still loading or if loading failed.
+    """
+    batcher = get_batcher()
+    if not batcher.ready:
+        response.status_code = 503
+    status: Dict[str, Any] = {"ready": batcher.ready, "engine": ENGINE}
+    if batcher.warmup_error is not None:
+        status["error"] = str(batcher.warmup_error)
+    return status
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def api_metrics() -> str:
+    """
+    Prometheus metrics: request counts and latency per route, per-stage
+    timings (decode, face detection, inference, forward pass), model load
+    time, batcher and prediction cache counters, and process memory.
+    """
+    batcher = get_batcher().stats()
+    cache = get_prediction_cache().stats()
+    return metrics.render(
+        gauges={
+            "inference_queue_depth": batcher["queue_depth"],
+            "inference_mean_batch_size": batcher["mean_batch_size"],
+            "prediction_cache_entries": cache["entries"],
+        },
+        counters={
+            "inference_batches_total": batcher["batches"],
+            "inference_images_total": batcher["images"],
+            "inference_busy_seconds_total": batcher["busy_seconds"],
+            "prediction_cache_hits_total": cache["hits"],
+            "prediction_cache_misses_total": cache["misses"],
+        },
+    )
+
+
 # To run locally:
 #   uvicorn api:app --reload
 
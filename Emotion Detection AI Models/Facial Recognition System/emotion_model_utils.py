@@ -1,17 +1,70 @@
 from __future__ import annotations
 
+import asyncio
+import atexit
+import hashlib
 import io
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Tuple
 
 import numpy as np
-from PIL import Image
-from tensorflow.keras.models import model_from_json
+from PIL import Image, UnidentifiedImageError
+
+import shared_path  # noqa: F401  (before service_common)
+from service_common.metrics import observe_stage, set_gauge
 
 
 BASE_DIR = Path(__file__).resolve().parent
 MODEL_JSON_PATH = BASE_DIR / "model.json"
-MODEL_WEIGHTS_PATH = BASE_DIR / "model_weights.h5"
+MODEL_WEIGHTS_PATH = Path(
+    os.environ.get("EMOTION_MODEL_WEIGHTS_PATH", BASE_DIR / "model_weights.h5")
+)
+
+# "keras" runs model.json + model_weights.h5 through TensorFlow; "numpy" runs
+# the export written by `python numpy_engine.py export` and never imports it;
+# "tflite" runs a model from `python tflite_engine.py quantize`.
+ENGINES = ("keras", "numpy", "tflite")
+ENGINE = os.environ.get("EMOTION_ENGINE", "keras")
+NUMPY_MODEL_PATH = Path(
+    os.environ.get("EMOTION_NUMPY_MODEL_PATH", BASE_DIR / "emotion_model.npz")
+)
+# int8 or float16 model for the "tflite" engine; the thread count defaults to
+# the interpreter's own choice.
+TFLITE_MODEL_PATH = Path(
+    os.environ.get("EMOTION_TFLITE_MODEL_PATH", BASE_DIR / "emotion_model_int8.tflite")
+)
+TFLITE_THREADS = int(os.environ.get("EMOTION_TFLITE_THREADS", "0")) or None
+
+# Concurrent requests are grouped into one forward pass of up to this many
+# images, waiting at most this long after the first one for others to arrive.
+MAX_BATCH_SIZE = int(os.environ.get("EMOTION_MAX_BATCH_SIZE", "32"))
+MAX_BATCH_WAIT_MS = float(os.environ.get("EMOTION_MAX_BATCH_WAIT_MS", "5"))
+
+# /emotion/predict-batch: most frames per request, and the weight of the
+# newest frame in the exponential moving average over a frame sequence.
+MAX_FRAMES = int(os.environ.get("EMOTION_MAX_FRAMES", "64"))
+SMOOTHING_ALPHA = float(os.environ.get("EMOTION_SMOOTHING_ALPHA", "0.3"))
+
+# Predictions are remembered for this many distinct images (by content hash),
+# so a resent frame skips both decoding and inference; 0 disables the cache.
+CACHE_SIZE = int(os.environ.get("EMOTION_CACHE_SIZE", "1024"))
+
+# Optional face localization before the CNN (see face_detection.py): "off",
+# "dominant" (largest face only) or "all". Detection runs in a pool of this
+# many worker processes (default: one per CPU).
+FACE_DETECTION = os.environ.get("EMOTION_FACE_DETECTION", "off")
+FACE_WORKERS = int(os.environ.get("EMOTION_FACE_WORKERS", "0")) or os.cpu_count() or 1
+
+# Model input: 48x48 grayscale.
+INPUT_SIZE = (48, 48)
 
 # Order taken from notebook output:
 # Generator Class Indices: {'angry': 0, 'disgust': 1, 'fear': 2, 'happy': 3,
@@ -27,13 +80,20 @@ EMOTION_CLASSES: List[str] = [
 ]
 
 _MODEL = None
+_NUMPY_MODEL = None
+_TFLITE_MODEL = None
+_BATCHER: "InferenceBatcher | None" = None
+_BATCHER_LOCK = threading.Lock()
+_FACE_POOL: ProcessPoolExecutor | None = None
+_FACE_POOL_LOCK = threading.Lock()
 
 
 def load_emotion_model():
     """
     Load the CNN emotion recognition model from JSON + H5 weights.
 
-    The model is cached globally after the first load.
+    The model is cached globally after the first load. TensorFlow is only
+    imported here, so the NumPy engine never pays for it.
     """
     global _MODEL
     if _MODEL is not None:
@@ -44,59 +104,549 @@ def load_emotion_model():
     if not MODEL_WEIGHTS_PATH.exists():
         raise FileNotFoundError(f"model_weights.h5 not found at {MODEL_WEIGHTS_PATH}")
 
+    start = time.perf_counter()
+    from tensorflow.keras.models import model_from_json
+
     with MODEL_JSON_PATH.open("r", encoding="utf-8") as f:
         model_json = f.read()
 
+    # Inference only goes through predict_on_batch, which needs no optimizer
+    # or loss, so the model is not compiled.
     model = model_from_json(model_json)
     model.load_weights(str(MODEL_WEIGHTS_PATH))
 
-    # Compilation settings are embedded in the JSON, but for inference-only
-    # use it is not strictly necessary to compile. Compile anyway for safety.
-    if not hasattr(model, "optimizer") or model.optimizer is None:
-        model.compile(
-            optimizer="adam",
-            loss="categorical_crossentropy",
-            metrics=["accuracy"],
-        )
-
     _MODEL = model
+    set_gauge("model_load_seconds", time.perf_counter() - start)
     return _MODEL
 
 
-def preprocess_image_bytes(image_bytes: bytes) -> np.ndarray:
+def load_numpy_model():
+    """
+    Load the NumPy export of the model (see ``numpy_engine.py``).
+
+    The model is cached globally after the first load.
+    """
+    global _NUMPY_MODEL
+    if _NUMPY_MODEL is not None:
+        return _NUMPY_MODEL
+
+    if not NUMPY_MODEL_PATH.exists():
+        raise FileNotFoundError(
+            f"NumPy model not found at {NUMPY_MODEL_PATH}; "
+            "run `python numpy_engine.py export` first"
+        )
+
+    start = time.perf_counter()
+    from numpy_engine import NumpyEmotionModel
+
+    _NUMPY_MODEL = NumpyEmotionModel.load(NUMPY_MODEL_PATH)
+    set_gauge("model_load_seconds", time.perf_counter() - start)
+    return _NUMPY_MODEL
+
+
+def load_tflite_model():
+    """
+    Load the quantized TFLite model (see ``tflite_engine.py``).
+
+    The model is cached globally after the first load.
+    """
+    global _TFLITE_MODEL
+    if _TFLITE_MODEL is not None:
+        return _TFLITE_MODEL
+
+    if not TFLITE_MODEL_PATH.exists():
+        raise FileNotFoundError(
+            f"TFLite model not found at {TFLITE_MODEL_PATH}; "
+            "run `python tflite_engine.py quantize` first"
+        )
+
+    start = time.perf_counter()
+    from tflite_engine import TFLiteEmotionModel
+
+    _TFLITE_MODEL = TFLiteEmotionModel.load(TFLITE_MODEL_PATH, TFLITE_THREADS)
+    set_gauge("model_load_seconds", time.perf_counter() - start)
+    return _TFLITE_MODEL
+
+
+def load_inference_model():
     """
-    Convert raw image bytes into a model-ready tensor.
+    Load the model for the configured ``EMOTION_ENGINE``.
+    """
+    if ENGINE == "keras":
+        return load_emotion_model()
+    if ENGINE == "numpy":
+        return load_numpy_model()
+    if ENGINE == "tflite":
+        return load_tflite_model()
+    raise ValueError(f"Unknown EMOTION_ENGINE '{ENGINE}', expected one of {ENGINES}")
+
+
+def preprocess_image_into(image_bytes: bytes, out: np.ndarray) -> np.ndarray:
+    """
+    Decode raw image bytes into ``out``, a float32 ``(48, 48, 1)`` slot of a
+    batch buffer.
 
     - Converts to grayscale
     - Resizes to 48x48
     - Normalizes to [0, 1]
-    - Adds batch and channel dimensions => (1, 48, 48, 1)
+
+    JPEGs are decoded in draft mode: the decoder scales by 1/2, 1/4 or 1/8
+    in the DCT domain (to no less than 48x48) and emits grayscale directly,
+    so a phone photo is never decompressed at full resolution.
     """
     with Image.open(io.BytesIO(image_bytes)) as img:
+        img.draft("L", INPUT_SIZE)
         img = img.convert("L")  # grayscale
-        img = img.resize((48, 48))
+        img = img.resize(INPUT_SIZE)
+
+    np.divide(np.asarray(img), 255.0, out=out[..., 0], casting="unsafe")
+    return out
 
-    arr = np.array(img).astype("float32") / 255.0
-    arr = np.expand_dims(arr, axis=-1)  # (48, 48, 1)
-    arr = np.expand_dims(arr, axis=0)  # (1, 48, 48, 1)
+
+def preprocess_image_bytes(image_bytes: bytes) -> np.ndarray:
+    """
+    Convert raw image bytes into a model-ready ``(1, 48, 48, 1)`` tensor
+    (see :func:`preprocess_image_into`).
+    """
+    arr = np.empty((1, *INPUT_SIZE, 1), dtype=np.float32)
+    preprocess_image_into(image_bytes, arr[0])
     return arr
 
 
-def predict_emotion_from_bytes(image_bytes: bytes) -> Dict[str, Any]:
+def image_key(image_bytes: bytes) -> bytes:
     """
-    Run inference on raw image bytes and return:
-      - predicted_label
-      - predicted_index
-      - probabilities (per emotion class)
+    Content hash identifying an image in the :class:`PredictionCache`.
+
+    SHA-256 is hardware-accelerated on most CPUs, which makes it the fastest
+    hashlib digest for multi-megabyte uploads.
+    """
+    return hashlib.sha256(image_bytes).digest()
+
+
+# Face boxes (None for the whole image) and their class probabilities.
+Prediction = Tuple[List[List[int] | None], np.ndarray]
+
+
+class PredictionCache:
+    """
+    Bounded LRU of predictions keyed by :func:`image_key` (plus the face
+    detection mode): the face boxes and one row of class probabilities each.
+
+    Safe to use from several threads; ``max_entries <= 0`` disables it.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Prediction]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: bytes) -> Prediction | None:
+        with self._lock:
+            prediction = self._entries.get(key)
+            if prediction is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return prediction
+
+    def put(self, key: bytes, prediction: Prediction) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = prediction
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+_CACHE = PredictionCache(CACHE_SIZE)
+
+
+def get_prediction_cache() -> PredictionCache:
+    return _CACHE
+
+
+def get_face_pool() -> ProcessPoolExecutor:
+    """
+    Return the process pool that runs face detection, starting it on first use.
+
+    Workers are spawned rather than forked, so they never inherit the model or
+    TensorFlow's threads; they only import ``face_detection``. The detector is
+    also loaded here once, so a missing OpenCV fails at startup.
+    """
+    global _FACE_POOL
+    if _FACE_POOL is None:
+        with _FACE_POOL_LOCK:
+            if _FACE_POOL is None:
+                import face_detection
+
+                if FACE_DETECTION not in face_detection.FACE_MODES:
+                    raise ValueError(
+                        f"Unknown EMOTION_FACE_DETECTION '{FACE_DETECTION}', "
+                        f"expected one of {face_detection.FACE_MODES}"
+                    )
+                face_detection.warm_up()
+                _FACE_POOL = ProcessPoolExecutor(
+                    max_workers=FACE_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=face_detection.warm_up,
+                )
+                # Workers are spawned on demand; start them all now so the
+                # first requests do not pay for it.
+                for _ in range(FACE_WORKERS):
+                    _FACE_POOL.submit(face_detection.warm_up)
+                atexit.register(_FACE_POOL.shutdown)
+    return _FACE_POOL
+
+
+@dataclass
+class _Analysis:
+    """
+    One upload after the cache lookup and, on a miss, preprocessing.
+
+    ``probabilities`` (one row per face) is set on a cache hit; otherwise
+    ``tensor`` holds the ``(n_faces, 48, 48, 1)`` input to run.
+    """
+
+    key: bytes
+    boxes: List[List[int] | None]
+    probabilities: np.ndarray | None = None
+    tensor: np.ndarray | None = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+def _lookup(image_bytes: bytes) -> _Analysis | None:
+    """
+    Hash the image; return the cached analysis, or None with the key stashed.
+    """
+    start = time.perf_counter()
+    # Face detection changes what is classified, so it is part of the key.
+    key = image_key(image_bytes) + FACE_DETECTION.encode()
+    cached = _CACHE.get(key)
+    elapsed = {"lookup_ms": (time.perf_counter() - start) * 1e3}
+    if cached is None:
+        return _Analysis(key, [], timings=elapsed)
+    boxes, probabilities = cached
+    return _Analysis(key, boxes, probabilities=probabilities, timings=elapsed)
+
+
+def _analyse_whole_image(image_bytes: bytes, out: np.ndarray) -> _Analysis:
+    """
+    Cache lookup, then on a miss decode the whole image into ``out``, a
+    ``(1, 48, 48, 1)`` slice of a batch buffer.
+
+    Runs in a worker thread: hashing and decoding both release the GIL.
+    """
+    analysis = _lookup(image_bytes)
+    if analysis.probabilities is None:
+        start = time.perf_counter()
+        preprocess_image_into(image_bytes, out[0])
+        analysis.boxes = [None]
+        analysis.tensor = out
+        analysis.timings["decode_ms"] = (time.perf_counter() - start) * 1e3
+    return analysis
+
+
+def _add_faces(analysis: _Analysis, located: Dict[str, Any]) -> _Analysis:
+    analysis.boxes = located["boxes"]
+    analysis.tensor = (located["crops"][..., None] / 255.0).astype(np.float32)
+    analysis.timings.update(located["timings"])
+    return analysis
+
+
+def _locate_faces_job(image_bytes: bytes) -> Future:
+    import face_detection
+
+    return get_face_pool().submit(
+        face_detection.locate_faces, image_bytes, FACE_DETECTION, INPUT_SIZE
+    )
+
+
+def _analyse(image_bytes: bytes, out: np.ndarray) -> _Analysis:
+    if FACE_DETECTION == "off":
+        return _analyse_whole_image(image_bytes, out)
+    analysis = _lookup(image_bytes)
+    if analysis.probabilities is not None:
+        return analysis
+    return _add_faces(analysis, _locate_faces_job(image_bytes).result())
+
+
+async def _analyse_async(image_bytes: bytes, out: np.ndarray) -> _Analysis:
+    if FACE_DETECTION == "off":
+        return await asyncio.to_thread(_analyse_whole_image, image_bytes, out)
+    analysis = await asyncio.to_thread(_lookup, image_bytes)
+    if analysis.probabilities is not None:
+        return analysis
+    located = await asyncio.wrap_future(_locate_faces_job(image_bytes))
+    return _add_faces(analysis, located)
+
+
+def batch_buckets(max_batch_size: int = MAX_BATCH_SIZE) -> List[int]:
+    """
+    Batch sizes the model is run at: powers of two below ``max_batch_size``,
+    then ``max_batch_size`` itself.
+    """
+    sizes = [1]
+    while sizes[-1] * 2 < max_batch_size:
+        sizes.append(sizes[-1] * 2)
+    if sizes[-1] < max_batch_size:
+        sizes.append(max_batch_size)
+    return sizes
+
+
+def predict_probabilities(batch: np.ndarray) -> np.ndarray:
+    """
+    Run the model over a ``(n, 48, 48, 1)`` batch and return the
+    ``(n, len(EMOTION_CLASSES))`` class probabilities.
+
+    Keras traces a new graph for every distinct input shape, which costs far
+    more than the forward pass itself, so batches are zero-padded up to the
+    next of :func:`batch_buckets` (and split above the largest one). TFLite
+    reallocates its tensors on every batch size change, so it is bucketed
+    the same way; the NumPy engine takes the batch as is.
     """
-    model = load_emotion_model()
-    input_tensor = preprocess_image_bytes(image_bytes)
+    model = load_inference_model()
+    if ENGINE == "numpy":
+        return model.predict(batch)
 
-    preds = model.predict(input_tensor)
-    if preds.ndim != 2 or preds.shape[0] != 1:
+    # predict_on_batch skips the per-call dataset / callback setup of
+    # model.predict, which dominates the cost for small batches.
+    run = model.predict_on_batch if ENGINE == "keras" else model.predict
+    buckets = batch_buckets()
+    outputs = []
+    for start in range(0, len(batch), buckets[-1]):
+        chunk = batch[start : start + buckets[-1]]
+        n = len(chunk)
+        padded = next(size for size in buckets if size >= n)
+        if padded > n:
+            padding = np.zeros((padded - n,) + chunk.shape[1:], dtype=chunk.dtype)
+            chunk = np.concatenate([chunk, padding])
+        outputs.append(np.asarray(run(chunk))[:n])
+
+    preds = np.concatenate(outputs) if outputs else np.zeros((0, len(EMOTION_CLASSES)))
+    if preds.ndim != 2 or preds.shape[0] != batch.shape[0]:
         raise ValueError(f"Unexpected prediction shape: {preds.shape}")
+    return preds
+
+
+def warm_up_model() -> None:
+    """
+    Load the model, then trace it once at every bucket size so no request
+    pays for either.
+    """
+    load_inference_model()
+    if ENGINE == "numpy":
+        return
+    for size in batch_buckets():
+        predict_probabilities(np.zeros((size, 48, 48, 1), dtype=np.float32))
+
+
+# Queued to stop the batcher's worker thread.
+_SHUTDOWN = object()
+
+
+class InferenceBatcher:
+    """
+    Dynamic micro-batching in front of a batch prediction function.
+
+    Callers :meth:`submit` tensors of shape ``(k, 48, 48, 1)`` from any
+    thread and get a future for their ``(k, n_classes)`` rows. A single
+    worker thread owns the model: it takes the first waiting job, gathers
+    more until ``max_batch_size`` images are queued or ``max_wait_ms`` has
+    passed, runs one forward pass and fans the rows back out to the futures.
+    Under load, jobs that arrive during a forward pass make up the next batch.
 
-    probabilities = preds[0]
+    ``warmup`` runs on the worker thread before the first job; :attr:`ready`
+    turns true once it has succeeded.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        warmup: Callable[[], None] | None = None,
+    ) -> None:
+        self.predict_fn = predict_fn
+        self.warmup = warmup
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.warmup_error: BaseException | None = None
+
+        self._warm = threading.Event()
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter[int] = Counter()
+        self._images = 0
+        self._busy_seconds = 0.0
+
+        self._thread = threading.Thread(
+            target=self._run, name="emotion-inference", daemon=True
+        )
+        self._thread.start()
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether ``warmup`` has finished without raising.
+        """
+        return self._warm.is_set() and self.warmup_error is None
+
+    def submit(self, tensor: np.ndarray) -> "Future[np.ndarray]":
+        """
+        Queue ``tensor`` for inference and return a future for its predictions.
+        """
+        future: Future[np.ndarray] = Future()
+        self._queue.put((tensor, future))
+        return future
+
+    def predict(self, tensor: np.ndarray) -> np.ndarray:
+        """
+        Blocking variant of :meth:`submit`.
+        """
+        return self.submit(tensor).result()
+
+    async def predict_async(self, tensor: np.ndarray) -> np.ndarray:
+        """
+        Awaitable variant of :meth:`submit`; the event loop is never blocked.
+        """
+        return await asyncio.wrap_future(self.submit(tensor))
+
+    def close(self) -> None:
+        """
+        Stop the worker thread once the jobs already queued are done.
+        """
+        self._queue.put(_SHUTDOWN)
+        self._thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Queue depth plus a histogram of forward-pass batch sizes.
+        """
+        with self._stats_lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "batches": batches,
+                "images": self._images,
+                "mean_batch_size": self._images / batches if batches else 0.0,
+                "busy_seconds": self._busy_seconds,
+                "batch_size_histogram": {
+                    str(size): count
+                    for size, count in sorted(self._batch_sizes.items())
+                },
+            }
+
+    def _run(self) -> None:
+        if self.warmup is not None:
+            # Jobs submitted meanwhile simply wait in the queue. A failure here
+            # resurfaces on the first real batch, so it must not stop the worker.
+            try:
+                self.warmup()
+            except Exception as exc:
+                self.warmup_error = exc
+        self._warm.set()
+
+        carry: Any = None
+        while True:
+            job = carry if carry is not None else self._queue.get()
+            carry = None
+            if job is _SHUTDOWN:
+                return
+
+            jobs = [job]
+            size = len(job[0])
+            deadline = time.monotonic() + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    timeout = deadline - time.monotonic()
+                    if timeout > 0:
+                        job = self._queue.get(timeout=timeout)
+                    else:
+                        job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is _SHUTDOWN or size + len(job[0]) > self.max_batch_size:
+                    # Shutdown, or a job that does not fit: handle it next.
+                    carry = job
+                    break
+                jobs.append(job)
+                size += len(job[0])
+
+            self._run_batch(jobs)
+
+    def _run_batch(self, jobs: List[Tuple[np.ndarray, Future]]) -> None:
+        # Skip callers that gave up (e.g. cancelled requests).
+        jobs = [job for job in jobs if job[1].set_running_or_notify_cancel()]
+        if not jobs:
+            return
+        size = sum(len(tensor) for tensor, _ in jobs)
+
+        start = time.perf_counter()
+        try:
+            batch = np.concatenate([tensor for tensor, _ in jobs], axis=0)
+            preds = self.predict_fn(batch)
+        except Exception as exc:
+            for _, future in jobs:
+                future.set_exception(exc)
+            return
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._stats_lock:
+                self._batch_sizes[size] += 1
+                self._images += size
+                self._busy_seconds += elapsed
+            observe_stage("emotion.forward_pass", elapsed)
+
+        offset = 0
+        for tensor, future in jobs:
+            future.set_result(preds[offset : offset + len(tensor)])
+            offset += len(tensor)
+
+
+def get_batcher() -> InferenceBatcher:
+    """
+    Return the process-wide batcher, starting its worker thread on first use.
+
+    The worker thread loads and warms up the model before taking any job, so
+    this returns at once; TensorFlow is not imported until then.
+    """
+    global _BATCHER
+    if _BATCHER is None:
+        with _BATCHER_LOCK:
+            if _BATCHER is None:
+                _BATCHER = InferenceBatcher(
+                    predict_probabilities,
+                    max_batch_size=MAX_BATCH_SIZE,
+                    max_wait_ms=MAX_BATCH_WAIT_MS,
+                    warmup=warm_up_model,
+                )
+                # TensorFlow aborts if the interpreter exits mid-warmup.
+                atexit.register(_BATCHER.close)
+    return _BATCHER
+
+
+def _format_prediction(probabilities: np.ndarray) -> Dict[str, Any]:
     predicted_index = int(np.argmax(probabilities))
     predicted_label = EMOTION_CLASSES[predicted_index]
 
@@ -109,6 +659,193 @@ def predict_emotion_from_bytes(image_bytes: bytes) -> Dict[str, Any]:
     }
 
 
-# Eagerly load model so first API call is fast
-load_emotion_model()
+def _format_result(
+    analysis: _Analysis, probabilities: np.ndarray, start: float
+) -> Dict[str, Any]:
+    """
+    Prediction for the first (dominant) face, all faces when detection is on,
+    and the per-stage timings.
+    """
+    result = _format_prediction(probabilities[0])
+    if FACE_DETECTION != "off":
+        result["faces"] = [
+            {"box": box, **_format_prediction(row)}
+            for box, row in zip(analysis.boxes, probabilities)
+        ]
+    analysis.timings["total_ms"] = (time.perf_counter() - start) * 1e3
+    result["timings"] = analysis.timings
+    _observe_timings("emotion", analysis.timings)
+    return result
+
+
+def _observe_timings(prefix: str, timings: Dict[str, float]) -> None:
+    """
+    Feed a response's ``timings`` (``<stage>_ms``) to the stage histograms.
+    """
+    for name, ms in timings.items():
+        observe_stage(f"{prefix}.{name.removesuffix('_ms')}", ms / 1e3)
+
+
+def predict_emotion_from_bytes(image_bytes: bytes) -> Dict[str, Any]:
+    """
+    Run inference on raw image bytes and return:
+      - predicted_label
+      - predicted_index
+      - probabilities (per emotion class)
+      - faces: every face found, with its box (only with face detection)
+      - timings: milliseconds spent per stage
+
+    The forward pass goes through the shared batcher, so concurrent callers
+    are batched together; repeated images are answered from the cache.
+    """
+    start = time.perf_counter()
+    out = np.empty((1, *INPUT_SIZE, 1), dtype=np.float32)
+    analysis = _analyse(image_bytes, out)
+    probabilities = analysis.probabilities
+    if probabilities is None:
+        queued = time.perf_counter()
+        probabilities = get_batcher().predict(analysis.tensor)
+        analysis.timings["inference_ms"] = (time.perf_counter() - queued) * 1e3
+        _CACHE.put(analysis.key, (analysis.boxes, probabilities))
+    return _format_result(analysis, probabilities, start)
+
+
+async def predict_emotion_async(image_bytes: bytes) -> Dict[str, Any]:
+    """
+    Async variant of :func:`predict_emotion_from_bytes` for request handlers.
+
+    Hashing and decoding run in a worker thread (face detection in the
+    process pool) and inference in the batcher's thread, so the event loop
+    stays free to accept more requests meanwhile.
+    """
+    start = time.perf_counter()
+    out = np.empty((1, *INPUT_SIZE, 1), dtype=np.float32)
+    analysis = await _analyse_async(image_bytes, out)
+    probabilities = analysis.probabilities
+    if probabilities is None:
+        queued = time.perf_counter()
+        probabilities = await get_batcher().predict_async(analysis.tensor)
+        analysis.timings["inference_ms"] = (time.perf_counter() - queued) * 1e3
+        _CACHE.put(analysis.key, (analysis.boxes, probabilities))
+    return _format_result(analysis, probabilities, start)
 
+
+def smooth_probabilities(
+    probabilities: np.ndarray, alpha: float = SMOOTHING_ALPHA
+) -> np.ndarray:
+    """
+    Exponential moving average of ``(n_frames, n_classes)`` probabilities in
+    frame order: ``s[t] = alpha * p[t] + (1 - alpha) * s[t - 1]``.
+
+    A smaller ``alpha`` smooths more, so a single noisy frame cannot flip
+    the label.
+    """
+    alpha = min(max(alpha, 0.0), 1.0)
+    smoothed = np.empty_like(probabilities, dtype=np.float64)
+    state = None
+    for i, frame in enumerate(probabilities):
+        state = frame if state is None else alpha * frame + (1.0 - alpha) * state
+        smoothed[i] = state
+    return smoothed
+
+
+async def _try_analyse_async(
+    image_bytes: bytes, out: np.ndarray
+) -> Tuple[_Analysis | None, str | None]:
+    try:
+        return await _analyse_async(image_bytes, out), None
+    except UnidentifiedImageError:
+        return None, "Not a recognised image format"
+    except Exception as exc:  # noqa: BLE001
+        return None, str(exc) or type(exc).__name__
+
+
+async def predict_emotion_batch_async(
+    images: List[bytes], alpha: float = SMOOTHING_ALPHA
+) -> Dict[str, Any]:
+    """
+    Predict the emotion of several images (or frames of one sequence, in
+    order) and aggregate them.
+
+    Images are decoded concurrently in worker threads straight into one batch
+    buffer (or, with face detection on, cropped to their dominant face in the
+    process pool), and the ones not already cached run through the batcher as
+    a single job, so they share one forward pass. Frames that cannot be
+    decoded are reported with an ``error`` and left out of the aggregate.
+    Returns:
+      - frames: per-frame prediction (as for a single image) plus the
+        ``smoothed_label`` after temporal smoothing, or an ``error``
+      - n_decoded: how many frames were predicted
+      - aggregate: prediction over the mean of the smoothed probabilities
+      - timings: milliseconds spent preprocessing, in inference and in total
+
+    Raises ValueError if there are no images, too many, or none decode.
+    """
+    if not images:
+        raise ValueError("No images were provided")
+    if len(images) > MAX_FRAMES:
+        raise ValueError(f"At most {MAX_FRAMES} images per request, got {len(images)}")
+
+    start = time.perf_counter()
+    buffer = np.empty((len(images), *INPUT_SIZE, 1), dtype=np.float32)
+    analysed = await asyncio.gather(
+        *(
+            _try_analyse_async(image, buffer[i : i + 1])
+            for i, image in enumerate(images)
+        )
+    )
+    valid = [i for i, (analysis, _) in enumerate(analysed) if analysis is not None]
+    if not valid:
+        raise ValueError(f"No image could be decoded: {analysed[0][1]}")
+    preprocessed = time.perf_counter()
+
+    # Only the dominant face of each frame is classified.
+    probabilities = {
+        i: analysed[i][0].probabilities[0]
+        for i in valid
+        if analysed[i][0].probabilities is not None
+    }
+    misses = [i for i in valid if i not in probabilities]
+    if misses:
+        if FACE_DETECTION == "off" and len(misses) == len(images):
+            batch = buffer
+        else:
+            batch = np.concatenate([analysed[i][0].tensor[:1] for i in misses])
+        preds = await get_batcher().predict_async(batch)
+        for row, i in enumerate(misses):
+            probabilities[i] = preds[row]
+            analysis = analysed[i][0]
+            # The single-image path expects every face under this key, so
+            # with EMOTION_FACE_DETECTION=all only single-face frames are
+            # complete enough to cache.
+            if FACE_DETECTION != "all" or len(analysis.boxes) <= 1:
+                _CACHE.put(analysis.key, (analysis.boxes[:1], preds[row : row + 1]))
+    inferred = time.perf_counter()
+
+    preds = np.stack([probabilities[i] for i in valid])
+    smoothed = smooth_probabilities(preds, alpha)
+
+    frames: List[Dict[str, Any]] = [
+        {"index": i, "error": error} for i, (_, error) in enumerate(analysed)
+    ]
+    for row, i in enumerate(valid):
+        frames[i] = {
+            "index": i,
+            **_format_prediction(preds[row]),
+            "smoothed_label": EMOTION_CLASSES[int(np.argmax(smoothed[row]))],
+        }
+        if FACE_DETECTION != "off":
+            frames[i]["box"] = analysed[i][0].boxes[0]
+
+    timings = {
+        "preprocess_ms": (preprocessed - start) * 1e3,
+        "inference_ms": (inferred - preprocessed) * 1e3,
+        "total_ms": (time.perf_counter() - start) * 1e3,
+    }
+    _observe_timings("emotion.batch", timings)
+    return {
+        "frames": frames,
+        "n_decoded": len(valid),
+        "aggregate": _format_prediction(smoothed.mean(axis=0)),
+        "timings": timings,
+    }
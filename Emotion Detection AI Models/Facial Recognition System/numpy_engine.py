@@ -0,0 +1,302 @@
+"""
+TensorFlow-free CPU inference for the emotion CNN.
+
+``export`` walks the trained Keras model once and writes a flat ``.npz``:
+BatchNormalization layers are folded into the preceding Conv2D / Dense
+weights, activations are fused into them and Dropout is dropped, leaving a
+short list of ops. :class:`NumpyEmotionModel` runs that list with plain NumPy
+(convolutions become BLAS matrix products), so serving needs neither
+TensorFlow nor Keras and has no per-call graph overhead::
+
+    python numpy_engine.py export --out emotion_model.npz
+    python numpy_engine.py check --model emotion_model.npz
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+_ACTIVATIONS = ("linear", "relu", "softmax")
+
+# Upper bound on the im2col buffer of one convolution chunk.
+_IM2COL_BYTES = 8 << 20
+
+
+# ── Export ──────────────────────────────────────────────────────────────────
+
+
+def _fold_batch_norm(
+    kernel: np.ndarray, bias: np.ndarray, layer: Any
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fold an inference-mode BatchNormalization into the weights before it:
+    ``gamma * (x - mean) / sqrt(var + eps) + beta`` per output channel.
+    """
+    config = layer.get_config()
+    weights = list(layer.get_weights())
+    gamma = weights.pop(0) if config.get("scale", True) else 1.0
+    beta = weights.pop(0) if config.get("center", True) else 0.0
+    mean, variance = weights
+    scale = gamma / np.sqrt(variance + config.get("epsilon", 1e-3))
+    return kernel * scale, (bias - mean) * scale + beta
+
+
+def export_ops(model: Any) -> Tuple[List[Dict[str, Any]], Dict[str, np.ndarray]]:
+    """
+    Translate a Keras Sequential model into ``(ops, arrays)``.
+
+    Raises ValueError for layers the NumPy engine cannot run.
+    """
+    ops: List[Dict[str, Any]] = []
+    arrays: Dict[str, np.ndarray] = {}
+
+    def fold_target() -> Dict[str, Any] | None:
+        # The op a following BatchNormalization / Activation folds into.
+        last = ops[-1] if ops else None
+        if last and last["op"] in ("conv2d", "dense"):
+            return last if last["activation"] == "linear" else None
+        return None
+
+    for layer in model.layers:
+        kind = type(layer).__name__
+        config = layer.get_config()
+
+        if kind in ("InputLayer", "Dropout"):
+            continue
+
+        if kind in ("Conv2D", "Dense"):
+            kernel, *rest = layer.get_weights()
+            bias = rest[0] if rest else np.zeros(kernel.shape[-1], kernel.dtype)
+            op: Dict[str, Any] = {
+                "op": "conv2d" if kind == "Conv2D" else "dense",
+                "activation": config.get("activation", "linear"),
+                "weights": f"w{len(ops)}",
+            }
+            if kind == "Conv2D":
+                dilation = tuple(config["dilation_rate"])
+                if tuple(config["strides"]) != (1, 1) or dilation != (1, 1):
+                    raise ValueError(
+                        f"{layer.name}: only stride 1, undilated Conv2D is supported"
+                    )
+                op["padding"] = config["padding"]
+            ops.append(op)
+            arrays[op["weights"] + "/kernel"] = kernel
+            arrays[op["weights"] + "/bias"] = bias
+
+        elif kind == "BatchNormalization":
+            target = fold_target()
+            if target is None:
+                raise ValueError(
+                    f"{layer.name}: BatchNormalization must follow a linear layer"
+                )
+            key = target["weights"]
+            arrays[key + "/kernel"], arrays[key + "/bias"] = _fold_batch_norm(
+                arrays[key + "/kernel"], arrays[key + "/bias"], layer
+            )
+
+        elif kind == "Activation":
+            target = fold_target()
+            if target is None:
+                ops.append({"op": "activation", "activation": config["activation"]})
+            else:
+                target["activation"] = config["activation"]
+
+        elif kind == "MaxPooling2D":
+            pool_size = tuple(config["pool_size"])
+            if tuple(config["strides"] or pool_size) != pool_size:
+                raise ValueError(
+                    f"{layer.name}: only non-overlapping max pooling is supported"
+                )
+            ops.append({"op": "maxpool", "pool_size": list(config["pool_size"])})
+
+        elif kind == "GlobalAveragePooling2D":
+            ops.append({"op": "global_avg_pool"})
+
+        else:
+            raise ValueError(f"{layer.name}: unsupported layer type {kind}")
+
+    for op in ops:
+        if op.get("activation", "linear") not in _ACTIVATIONS:
+            raise ValueError(f"Unsupported activation '{op['activation']}'")
+
+    return ops, {key: value.astype(np.float32) for key, value in arrays.items()}
+
+
+def save_model(
+    path: Path, ops: List[Dict[str, Any]], arrays: Dict[str, np.ndarray]
+) -> Path:
+    """
+    Write ``ops`` and ``arrays`` as an uncompressed ``.npz``.
+    """
+    spec = json.dumps({"format_version": FORMAT_VERSION, "ops": ops})
+    with Path(path).open("wb") as f:
+        np.savez(f, __spec__=np.array(spec), **arrays)
+    return Path(path)
+
+
+def export(out: Path) -> Path:
+    """
+    Export the Keras model served by ``emotion_model_utils`` to ``out``.
+    """
+    from emotion_model_utils import load_emotion_model
+
+    ops, arrays = export_ops(load_emotion_model())
+    return save_model(out, ops, arrays)
+
+
+# ── Inference ───────────────────────────────────────────────────────────────
+
+
+def _conv2d(
+    x: np.ndarray, kernel: np.ndarray, bias: np.ndarray, padding: str
+) -> np.ndarray:
+    """
+    Stride-1 convolution of NHWC ``x`` with an HWIO ``kernel``.
+
+    The patches are copied into an im2col buffer so each chunk of images is
+    a single ``(pixels, kh * kw * c) @ (kh * kw * c, filters)`` product;
+    chunking keeps that buffer under ``_IM2COL_BYTES``.
+    """
+    kh, kw, c, filters = kernel.shape
+    if padding == "same":
+        top, left = (kh - 1) // 2, (kw - 1) // 2
+        x = np.pad(x, ((0, 0), (top, kh - 1 - top), (left, kw - 1 - left), (0, 0)))
+    n, h, w, _ = x.shape
+    out_h, out_w = h - kh + 1, w - kw + 1
+    weights = kernel.reshape(kh * kw * c, filters)
+
+    out = np.empty((n, out_h, out_w, filters), dtype=np.float32)
+    per_image = out_h * out_w * kh * kw * c * 4
+    step = max(1, _IM2COL_BYTES // per_image)
+    for start in range(0, n, step):
+        chunk = x[start : start + step]
+        cols = np.empty((len(chunk), out_h, out_w, kh, kw, c), dtype=np.float32)
+        for i in range(kh):
+            for j in range(kw):
+                cols[:, :, :, i, j, :] = chunk[:, i : i + out_h, j : j + out_w, :]
+        np.matmul(
+            cols.reshape(-1, kh * kw * c),
+            weights,
+            out=out[start : start + step].reshape(-1, filters),
+        )
+    out += bias
+    return out
+
+
+def _maxpool(x: np.ndarray, pool_size: List[int]) -> np.ndarray:
+    ph, pw = pool_size
+    n, h, w, c = x.shape
+    x = x[:, : h - h % ph, : w - w % pw, :]
+    return x.reshape(n, h // ph, ph, w // pw, pw, c).max(axis=(2, 4))
+
+
+def _activate(x: np.ndarray, activation: str) -> np.ndarray:
+    if activation == "relu":
+        return np.maximum(x, 0.0, out=x)
+    if activation == "softmax":
+        x = np.exp(x - x.max(axis=-1, keepdims=True))
+        return x / x.sum(axis=-1, keepdims=True)
+    return x
+
+
+class NumpyEmotionModel:
+    """
+    Runs the ops written by :func:`export` on float32 NHWC batches.
+    """
+
+    def __init__(
+        self, ops: List[Dict[str, Any]], arrays: Dict[str, np.ndarray]
+    ) -> None:
+        self.ops = ops
+        self.arrays = arrays
+
+    @classmethod
+    def load(cls, path: Path) -> "NumpyEmotionModel":
+        with np.load(path, allow_pickle=False) as data:
+            spec = json.loads(str(data["__spec__"]))
+            if spec.get("format_version") != FORMAT_VERSION:
+                raise ValueError(
+                    f"{path} has format version {spec.get('format_version')}, "
+                    f"expected {FORMAT_VERSION}; re-run the export"
+                )
+            arrays = {key: data[key] for key in data.files if key != "__spec__"}
+        return cls(spec["ops"], arrays)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        x = np.asarray(batch, dtype=np.float32)
+        for op in self.ops:
+            kind = op["op"]
+            if kind == "conv2d":
+                x = _conv2d(
+                    x,
+                    self.arrays[op["weights"] + "/kernel"],
+                    self.arrays[op["weights"] + "/bias"],
+                    op["padding"],
+                )
+            elif kind == "dense":
+                key = op["weights"]
+                x = x @ self.arrays[key + "/kernel"] + self.arrays[key + "/bias"]
+            elif kind == "maxpool":
+                x = _maxpool(x, op["pool_size"])
+            elif kind == "global_avg_pool":
+                x = x.mean(axis=(1, 2))
+            elif kind != "activation":
+                raise ValueError(f"Unknown op '{kind}'")
+            x = _activate(x, op.get("activation", "linear"))
+        return x
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────────
+
+
+def _check(model_path: Path, n_images: int, seed: int) -> float:
+    """
+    Largest absolute probability difference between Keras and the export.
+    """
+    from emotion_model_utils import load_emotion_model
+
+    rng = np.random.default_rng(seed)
+    batch = rng.random((n_images, 48, 48, 1), dtype=np.float32)
+    expected = np.asarray(load_emotion_model().predict_on_batch(batch))
+    actual = NumpyEmotionModel.load(model_path).predict(batch)
+    return float(np.abs(expected - actual).max())
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Emotion model NumPy export")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    export_cmd = sub.add_parser("export", help="Export the Keras weights to .npz")
+    export_cmd.add_argument(
+        "--out", default=None, help="Defaults to EMOTION_NUMPY_MODEL_PATH"
+    )
+
+    check_cmd = sub.add_parser("check", help="Compare an export against Keras")
+    check_cmd.add_argument(
+        "--model", default=None, help="Defaults to EMOTION_NUMPY_MODEL_PATH"
+    )
+    check_cmd.add_argument("--images", type=int, default=64)
+    check_cmd.add_argument("--tolerance", type=float, default=1e-4)
+
+    args = parser.parse_args(argv)
+    from emotion_model_utils import NUMPY_MODEL_PATH
+
+    if args.command == "export":
+        out = export(Path(args.out or NUMPY_MODEL_PATH))
+        print(f"Wrote {out} ({out.stat().st_size / 1e6:.1f} MB)")
+    else:
+        diff = _check(Path(args.model or NUMPY_MODEL_PATH), args.images, seed=0)
+        print(f"max |keras - numpy| = {diff:.2e}")
+        if diff > args.tolerance:
+            raise SystemExit(f"Difference exceeds tolerance {args.tolerance}")
+
+
+if __name__ == "__main__":
+    main()
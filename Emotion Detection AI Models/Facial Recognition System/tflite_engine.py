@@ -0,0 +1,279 @@
+"""
+Post-training quantization of the emotion CNN to TensorFlow Lite.
+
+``quantize`` converts the trained Keras model to ``float16`` (weights stored
+as half precision, computed in float32) and / or ``int8`` (weights and
+activations in int8, calibrated on sample images). ``evaluate`` compares the
+quantized models against the float model on a labelled held-out set::
+
+    python tflite_engine.py quantize --calibration-dir images/train
+    python tflite_engine.py evaluate --eval-dir images/validation
+
+Image folders use the training layout, one sub-folder per emotion class
+(``images/train/happy/*.jpg``, ...). :class:`TFLiteEmotionModel` serves a
+converted model when ``EMOTION_ENGINE=tflite``; it prefers the standalone
+LiteRT / tflite-runtime interpreter and falls back to TensorFlow's.
+"""
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+
+QUANTIZATION_MODES = ("int8", "float16")
+
+_IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def default_model_path(mode: str) -> Path:
+    """
+    Where ``quantize`` writes the ``mode`` model by default.
+    """
+    return Path(__file__).resolve().parent / f"emotion_model_{mode}.tflite"
+
+
+# ── Data ────────────────────────────────────────────────────────────────────
+
+
+def load_image_folder(
+    root: Path, per_class: int | None = None, seed: int = 0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Load ``root/<class>/*`` images preprocessed exactly as for serving.
+
+    Returns ``(images, labels)`` with labels indexing ``EMOTION_CLASSES``;
+    folders that are not an emotion class are ignored. ``per_class`` takes a
+    seeded random sample of each class.
+    """
+    from emotion_model_utils import EMOTION_CLASSES, preprocess_image_bytes
+
+    rng = np.random.default_rng(seed)
+    images: List[np.ndarray] = []
+    labels: List[int] = []
+    for index, label in enumerate(EMOTION_CLASSES):
+        folder = Path(root) / label
+        if not folder.is_dir():
+            continue
+        files = sorted(
+            p for p in folder.iterdir() if p.suffix.lower() in _IMAGE_SUFFIXES
+        )
+        if per_class is not None and len(files) > per_class:
+            keep = sorted(rng.choice(len(files), per_class, replace=False))
+            files = [files[i] for i in keep]
+        for path in files:
+            images.append(preprocess_image_bytes(path.read_bytes()))
+            labels.append(index)
+
+    if not images:
+        raise ValueError(f"No class folders with images found under {root}")
+    return np.concatenate(images), np.asarray(labels, dtype=np.int64)
+
+
+# ── Conversion ──────────────────────────────────────────────────────────────
+
+
+def quantize(model: Any, mode: str, calibration: np.ndarray | None = None) -> bytes:
+    """
+    Convert a Keras model to a TFLite flatbuffer in ``mode``.
+
+    ``int8`` needs ``calibration`` images to choose activation ranges; inputs
+    and outputs stay float32, so callers feed the same tensors as to Keras.
+    """
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if mode == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    elif mode == "int8":
+        if calibration is None or not len(calibration):
+            raise ValueError("int8 quantization needs calibration images")
+
+        def representative_dataset() -> Iterator[List[np.ndarray]]:
+            for i in range(len(calibration)):
+                yield [calibration[i : i + 1].astype(np.float32)]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    else:
+        raise ValueError(
+            f"Unknown quantization mode '{mode}', expected one of {QUANTIZATION_MODES}"
+        )
+    return converter.convert()
+
+
+# ── Inference ───────────────────────────────────────────────────────────────
+
+
+def _interpreter_class() -> Any:
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteEmotionModel:
+    """
+    Runs a converted model on float32 NHWC batches.
+
+    The interpreter is resized to each new batch size on demand; calls are
+    serialized because an interpreter is not thread-safe.
+    """
+
+    def __init__(self, model_content: bytes, num_threads: int | None = None) -> None:
+        self.size_bytes = len(model_content)
+        self._interpreter = _interpreter_class()(
+            model_content=model_content, num_threads=num_threads
+        )
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        self._batch_size = -1
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(
+        cls, path: Path, num_threads: int | None = None
+    ) -> "TFLiteEmotionModel":
+        return cls(Path(path).read_bytes(), num_threads=num_threads)
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        batch = np.ascontiguousarray(batch, dtype=np.float32)
+        with self._lock:
+            if len(batch) != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input, batch.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = len(batch)
+            self._interpreter.set_tensor(self._input, batch)
+            self._interpreter.invoke()
+            return np.array(self._interpreter.get_tensor(self._output))
+
+
+# ── Evaluation ──────────────────────────────────────────────────────────────
+
+
+def _predict_all(
+    predict_fn: Callable[[np.ndarray], np.ndarray], images: np.ndarray, batch_size: int
+) -> Tuple[np.ndarray, float]:
+    start = time.perf_counter()
+    preds = np.concatenate(
+        [
+            np.asarray(predict_fn(images[i : i + batch_size]))
+            for i in range(0, len(images), batch_size)
+        ]
+    )
+    return preds, time.perf_counter() - start
+
+
+def evaluate(
+    predict_fn: Callable[[np.ndarray], np.ndarray],
+    images: np.ndarray,
+    labels: np.ndarray,
+    reference: np.ndarray | None = None,
+    batch_size: int = 64,
+) -> Dict[str, float]:
+    """
+    Accuracy and throughput of ``predict_fn`` on ``images``; with
+    ``reference`` predictions (the float model's), also top-1 agreement with
+    them and the largest probability difference.
+    """
+    preds, elapsed = _predict_all(predict_fn, images, batch_size)
+    result = {
+        "accuracy": float((preds.argmax(axis=1) == labels).mean()),
+        "images_per_second": len(images) / elapsed,
+    }
+    if reference is not None:
+        result["top1_agreement"] = float(
+            (preds.argmax(axis=1) == reference.argmax(axis=1)).mean()
+        )
+        result["max_abs_diff"] = float(np.abs(preds - reference).max())
+    return result
+
+
+# ── CLI ─────────────────────────────────────────────────────────────────────
+
+
+def _run_quantize(args: argparse.Namespace) -> None:
+    from emotion_model_utils import load_emotion_model
+
+    calibration = None
+    if "int8" in args.modes:
+        if not args.calibration_dir:
+            raise SystemExit("int8 quantization needs --calibration-dir")
+        calibration, _ = load_image_folder(
+            Path(args.calibration_dir), per_class=args.calibration_per_class
+        )
+
+    model = load_emotion_model()
+    for mode in args.modes:
+        path = default_model_path(mode)
+        if args.out_dir:
+            path = Path(args.out_dir) / path.name
+        path.write_bytes(quantize(model, mode, calibration))
+        print(f"Wrote {path} ({path.stat().st_size / 1e6:.1f} MB)")
+
+
+def _run_evaluate(args: argparse.Namespace) -> None:
+    from emotion_model_utils import load_emotion_model
+
+    images, labels = load_image_folder(Path(args.eval_dir), per_class=args.per_class)
+    keras_model = load_emotion_model()
+    keras_model.predict_on_batch(images[:64])  # trace before timing
+    reference, elapsed = _predict_all(keras_model.predict_on_batch, images, 64)
+    baseline = float((reference.argmax(axis=1) == labels).mean())
+    print(f"{'float32':<22} accuracy={baseline:.4f}  "
+          f"{len(images) / elapsed:7.1f} img/s  (n={len(images)})")
+
+    paths = args.models or [default_model_path(mode) for mode in QUANTIZATION_MODES]
+    for path in map(Path, paths):
+        if not path.exists():
+            continue
+        model = TFLiteEmotionModel.load(path)
+        result = evaluate(model.predict, images, labels, reference)
+        print(f"{path.stem:<22} accuracy={result['accuracy']:.4f} "
+              f"(delta {result['accuracy'] - baseline:+.4f})  "
+              f"{result['images_per_second']:7.1f} img/s  "
+              f"agreement={result['top1_agreement']:.4f}  "
+              f"max_diff={result['max_abs_diff']:.3f}  "
+              f"size={model.size_bytes / 1e6:.1f} MB")
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Emotion model TFLite quantization")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    quantize_cmd = sub.add_parser("quantize", help="Write quantized .tflite models")
+    quantize_cmd.add_argument(
+        "--modes",
+        nargs="+",
+        choices=QUANTIZATION_MODES,
+        default=list(QUANTIZATION_MODES),
+    )
+    quantize_cmd.add_argument("--calibration-dir", default=None)
+    quantize_cmd.add_argument("--calibration-per-class", type=int, default=100)
+    quantize_cmd.add_argument("--out-dir", default=None)
+
+    evaluate_cmd = sub.add_parser("evaluate", help="Accuracy delta on a held-out set")
+    evaluate_cmd.add_argument("--eval-dir", required=True)
+    evaluate_cmd.add_argument("--per-class", type=int, default=None)
+    evaluate_cmd.add_argument("--models", nargs="*", default=None)
+
+    args = parser.parse_args(argv)
+    if args.command == "quantize":
+        _run_quantize(args)
+    else:
+        _run_evaluate(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,164 @@
 from __future__ import annotations
 
-from typing import Any, Iterable, List
+import os
+import secrets
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Iterable, List
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, Field
+from fastapi import Depends, FastAPI, Header, HTTPException, Response
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field, field_validator
+
+import shared_path  # noqa: F401  (before service_common)
+from mood import EMOTION_CLASSES, emotion_weights
+
+from service_common import metrics, serving
 
 from recommendation import (
+    add_tracks,
+    cache_stats,
+    load_models_in_background,
+    lookup_tracks,
+    model_status,
+    rebuild_models,
+    recommend_batch,
+    recommend_by_emotion,
     recommend_by_track_id,
     recommend_from_multiple_songs,
     recommend_songs,
-    to_response_list,
+    remove_tracks,
+    warm_cache,
 )
 
 
-app = FastAPI(title="Music Recommendation API")
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # The handlers are sync, so they run on the SERVING_THREADS pool, each
+    # request's vector products on one BLAS thread: more would only compete
+    # with the other request threads for the same cores.
+    serving.configure_thread_pools()
+    serving.limit_blas_threads(default=1)
+    # Importing this module loads no models, so the worker starts serving
+    # straight away; /ready turns 200 once the first snapshot is live.
+    load_models_in_background()
+    yield
+
+
+app = FastAPI(title="Music Recommendation API", lifespan=lifespan)
+app.add_middleware(serving.LoadShedder)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Shared secret for the /admin endpoints. Without one they refuse every call
+# unless RECOMMENDER_ADMIN_OPEN=1 explicitly opens them, e.g. for local work
+# on a service only the developer can reach.
+ADMIN_TOKEN = os.environ.get("RECOMMENDER_ADMIN_TOKEN")
+ADMIN_OPEN = os.environ.get("RECOMMENDER_ADMIN_OPEN", "0") == "1"
+
+
+class SelectionFields(BaseModel):
+    """
+    Filters applied while picking the top ``n``, so responses are not cut
+    short by filtering them afterwards.
+    """
+
+    exclude_track_ids: List[str] = Field(
+        default_factory=list,
+        max_length=5000,
+        description="Track IDs never to recommend, e.g. those already played",
+    )
+    max_per_artist: int | None = Field(
+        None, ge=1, description="At most this many songs by any one artist"
+    )
+    diversity: float = Field(
+        0.0,
+        ge=0.0,
+        le=1.0,
+        description="0 ranks by similarity alone; higher values favour variety",
+    )
+
+    def selection(self) -> dict[str, Any]:
+        return {
+            "exclude_track_ids": self.exclude_track_ids,
+            "max_per_artist": self.max_per_artist,
+            "diversity": self.diversity,
+        }
+
+
+class MetadataFields(BaseModel):
+    fields: List[str] = Field(
+        default_factory=list,
+        max_length=50,
+        description=(
+            "Other songs.json columns to include per track, e.g. s3_url; "
+            "see metadata_fields in /health"
+        ),
+    )
 
 
-class RecommendByTitleRequest(BaseModel):
+class RecommendByTitleRequest(SelectionFields, MetadataFields):
     title: str = Field(..., description="Song title to base recommendations on")
     n: int = Field(5, ge=1, le=100, description="Number of recommendations to return")
+    all_matches: bool = Field(
+        False,
+        description="Recommend for every song with this title instead of only the first",
+    )
 
 
-class RecommendByTrackIdRequest(BaseModel):
+class RecommendByTrackIdRequest(SelectionFields, MetadataFields):
     track_id: str = Field(..., description="Track ID to base recommendations on")
     n: int = Field(5, ge=1, le=100, description="Number of recommendations to return")
 
 
-class RecommendFromMultipleRequest(BaseModel):
+class RecommendFromMultipleRequest(SelectionFields, MetadataFields):
     titles: List[str] = Field(
         ..., description="List of song titles to base recommendations on"
     )
     n: int = Field(5, ge=1, le=100, description="Number of recommendations to return")
+    all_matches: bool = Field(
+        False,
+        description="Average over every song sharing a title instead of only the first",
+    )
+
+
+class RecommendBatchRequest(MetadataFields):
+    track_ids: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=1000,
+        description="Seed track IDs; recommendations are returned for each one",
+    )
+    n: int = Field(5, ge=1, le=100, description="Number of recommendations per seed")
+
+
+class RecommendByEmotionRequest(SelectionFields, MetadataFields):
+    probabilities: dict[str, float] | List[float] = Field(
+        ...,
+        description=(
+            "Emotion probabilities as returned by /emotion/predict: by class name, "
+            f"or a list in the order {', '.join(EMOTION_CLASSES)}"
+        ),
+    )
+    track_id: str | None = Field(None, description="Optional seed track ID")
+    title: str | None = Field(None, description="Optional seed title (if no track_id)")
+    n: int = Field(5, ge=1, le=100, description="Number of recommendations to return")
+    mood_weight: float = Field(
+        0.5,
+        ge=0.0,
+        le=1.0,
+        description="With a seed, how much the mood counts against seed similarity",
+    )
+
+    @field_validator("probabilities")
+    @classmethod
+    def check_probabilities(cls, value: Any) -> Any:
+        emotion_weights(value)
+        return value
+
+
+class TrackLookupRequest(MetadataFields):
+    track_ids: List[str] = Field(
+        ..., min_length=1, max_length=5000, description="Track IDs to resolve"
+    )
 
 
 @app.post("/recommend/by-title")
@@ -42,11 +170,17 @@ def api_recommend_by_title(payload: RecommendByTitleRequest) -> dict[str, Any]:
     recommendation module and returns a JSON-serializable structure.
     """
     try:
-        df = recommend_songs(payload.title, n=payload.n)
+        items = recommend_songs(
+            payload.title,
+            n=payload.n,
+            all_matches=payload.all_matches,
+            fields=payload.fields,
+            **payload.selection(),
+        )
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
-    return {"items": to_response_list(df)}
+    return {"items": items}
 
 
 @app.post("/recommend/by-track-id")
@@ -55,11 +189,16 @@ def api_recommend_by_track_id(payload: RecommendByTrackIdRequest) -> dict[str, A
     Recommend songs based on a track ID.
     """
     try:
-        df = recommend_by_track_id(payload.track_id, n=payload.n)
+        items = recommend_by_track_id(
+            payload.track_id,
+            n=payload.n,
+            fields=payload.fields,
+            **payload.selection(),
+        )
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
-    return {"items": to_response_list(df)}
+    return {"items": items}
 
 
 @app.post("/recommend/from-multiple")
@@ -70,8 +209,186 @@ def api_recommend_from_multiple(
     Recommend songs based on multiple input titles by averaging their feature vectors.
     """
     try:
-        df = recommend_from_multiple_songs(payload.titles, n=payload.n)
+        items = recommend_from_multiple_songs(
+            payload.titles,
+            n=payload.n,
+            all_matches=payload.all_matches,
+            fields=payload.fields,
+            **payload.selection(),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+
+    return {"items": items}
+
+
+@app.post("/recommend/by-emotion")
+def api_recommend_by_emotion(payload: RecommendByEmotionRequest) -> dict[str, Any]:
+    """
+    Recommend songs matching the listener's emotion, optionally around a seed.
+
+    Takes the emotion probabilities straight from the facial emotion service,
+    so one call turns a prediction into a mood playlist.
+    """
+    try:
+        items = recommend_by_emotion(
+            payload.probabilities,
+            track_id=payload.track_id,
+            title=payload.title,
+            n=payload.n,
+            mood_weight=payload.mood_weight,
+            fields=payload.fields,
+            **payload.selection(),
+        )
     except ValueError as exc:
         raise HTTPException(status_code=404, detail=str(exc)) from exc
 
-    return {"items": to_response_list(df)}
\ No newline at end of file
+    return {"items": items}
+
+
+@app.post("/recommend/batch")
+def api_recommend_batch(payload: RecommendBatchRequest) -> dict[str, Any]:
+    """
+    Recommend songs for many seed track IDs in a single call.
+
+    Each entry in ``results`` carries either ``items`` or an ``error`` for
+    that seed, so one unknown track ID does not fail the whole batch.
+    """
+    results = recommend_batch(payload.track_ids, n=payload.n, fields=payload.fields)
+    return {"results": results}
+
+
+@app.post("/tracks/lookup")
+def api_lookup_tracks(payload: TrackLookupRequest) -> dict[str, Any]:
+    """
+    Resolve many track IDs to their metadata in one call.
+
+    Lets callers turn recommended track IDs into full records (plus any
+    requested ``fields``) without a database query per track. Unknown IDs are
+    listed under ``missing``.
+    """
+    return lookup_tracks(payload.track_ids, fields=payload.fields)
+
+
+class AddTracksRequest(BaseModel):
+    tracks: List[dict[str, Any]] = Field(
+        ...,
+        min_length=1,
+        description="Songs in the songs.json record format (track_id is required)",
+    )
+
+
+class RemoveTracksRequest(BaseModel):
+    track_ids: List[str] = Field(..., min_length=1, description="Track IDs to remove")
+
+
+class WarmCacheRequest(BaseModel):
+    track_ids: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=10000,
+        description="Seed track IDs to precompute, e.g. the most played ones",
+    )
+    n: int = Field(5, ge=1, le=100, description="Number of recommendations per seed")
+
+
+def require_admin(x_admin_token: str | None = Header(None)) -> None:
+    if ADMIN_TOKEN:
+        if not secrets.compare_digest(
+            (x_admin_token or "").encode(), ADMIN_TOKEN.encode()
+        ):
+            raise HTTPException(status_code=401, detail="Invalid admin token")
+    elif not ADMIN_OPEN:
+        raise HTTPException(
+            status_code=403,
+            detail="Admin endpoints are disabled; set RECOMMENDER_ADMIN_TOKEN",
+        )
+
+
+@app.post("/admin/tracks/add", dependencies=[Depends(require_admin)])
+def api_add_tracks(payload: AddTracksRequest) -> dict[str, Any]:
+    """
+    Add (or replace) songs in the live catalogue without a full refit.
+    """
+    try:
+        return add_tracks(payload.tracks)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.post("/admin/tracks/remove", dependencies=[Depends(require_admin)])
+def api_remove_tracks(payload: RemoveTracksRequest) -> dict[str, Any]:
+    """
+    Remove songs from the live catalogue without a full refit.
+    """
+    return remove_tracks(payload.track_ids)
+
+
+@app.post("/admin/rebuild", dependencies=[Depends(require_admin)])
+def api_rebuild() -> dict[str, Any]:
+    """
+    Refit the models on songs.json in the background and hot-swap them in.
+
+    Requests keep being served from the current snapshot until the new one is
+    ready; poll ``/health`` until ``last_build`` names the new build, which is
+    then the snapshot version served.
+    """
+    return {"started": rebuild_models(), **model_status()}
+
+
+@app.post("/admin/cache/warm", dependencies=[Depends(require_admin)])
+def api_warm_cache(payload: WarmCacheRequest) -> dict[str, Any]:
+    """
+    Precompute recommendations for popular tracks into the result cache.
+    """
+    return {"cached": warm_cache(payload.track_ids, n=payload.n)}
+
+
+@app.get("/stats")
+def api_stats() -> dict[str, Any]:
+    """
+    Report the result cache's hit, miss and eviction counters.
+    """
+    return {"cache": cache_stats()}
+
+
+@app.get("/health")
+def api_health() -> dict[str, Any]:
+    """
+    Report whether models are loaded and which snapshot version is live.
+    """
+    return model_status()
+
+
+@app.get("/ready")
+def api_ready(response: Response) -> dict[str, Any]:
+    """
+    Readiness probe: 200 once a model snapshot is live, 503 while the models
+    are still loading or failed to load (see /health for the details).
+    """
+    status = model_status()
+    ready = status["status"] == "ok"
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "version": status["snapshot"]["version"] if ready else None,
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def api_metrics() -> str:
+    """
+    Prometheus metrics: request counts and latency per route, per-stage
+    timings of the recommendation path, model load time, result cache
+    counters and process memory.
+    """
+    cache = cache_stats()
+    return metrics.render(
+        gauges={"result_cache_entries": cache["entries"]},
+        counters={
+            "result_cache_hits_total": cache["hits"] + cache["shared_hits"],
+            "result_cache_misses_total": cache["misses"],
+            "result_cache_evictions_total": cache["evictions"],
+        },
+    )
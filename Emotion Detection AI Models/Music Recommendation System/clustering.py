@@ -0,0 +1,239 @@
+"""
+Offline clustering stage of the model artifact build.
+
+Recommendations only search the seed's cluster, so the number of clusters
+trades neighbor quality against per-query cost. ``fit_clusters`` picks it
+from the catalogue size unless ``RECOMMENDER_CLUSTERS`` fixes it: candidate
+values from a size-based minimum upwards are fitted on a sample, in
+parallel across cores, and the one with the best silhouette score wins. Large
+catalogues are clustered with MiniBatchKMeans, and a rebuild warm-starts
+from the previous artifact's centroids, keeping its cluster count while the
+catalogue size stays within the candidate range.
+
+scikit-learn is imported by the functions that fit, so importing this module
+stays cheap for serving workers.
+"""
+from __future__ import annotations
+
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, List
+
+import numpy as np
+
+
+# Number of clusters; 0 chooses it per build (see ``candidate_counts``).
+CLUSTERS = int(os.environ.get("RECOMMENDER_CLUSTERS", "0"))
+# The fixed count used before automatic selection; never choose fewer.
+MIN_TARGET_CLUSTERS = 40
+RANDOM_STATE = 42
+
+# Catalogues with more rows than this are clustered with MiniBatchKMeans
+# (0: always full KMeans).
+MINIBATCH_ROWS = int(os.environ.get("RECOMMENDER_CLUSTER_MINIBATCH_ROWS", "50000"))
+MINIBATCH_SIZE = 4096
+# Fit the centroids on a random sample of this many rows and only assign the
+# rest (0: fit on every row).
+FIT_SAMPLE = int(os.environ.get("RECOMMENDER_CLUSTER_FIT_SAMPLE", "0"))
+# Rows each candidate count is fitted on while choosing it (at least 40 per
+# cluster), and the rows its silhouette is scored on (silhouette is
+# quadratic in the rows).
+SELECT_SAMPLE = int(os.environ.get("RECOMMENDER_CLUSTER_SELECT_SAMPLE", "10000"))
+SILHOUETTE_SAMPLE = 3000
+# Processes evaluating candidate counts (0: one per core).
+JOBS = int(os.environ.get("RECOMMENDER_CLUSTER_JOBS", "0")) or os.cpu_count() or 1
+
+# Candidates are the target times these factors. Silhouette tends to favour
+# the coarsest candidate on weakly clustered features, so none is below the
+# target, which bounds the rows a query scans.
+_CANDIDATE_FACTORS = (1.0, 1.41, 2.0, 2.83)
+# Rows are assigned to centroids in chunks of this many.
+_ASSIGN_CHUNK = 65536
+
+
+@dataclass(frozen=True)
+class ClusterFit:
+    """
+    Fitted centroids, the cluster of every row, and how they were obtained
+    (stored in the artifact manifest under ``"clustering"``).
+    """
+
+    centroids: np.ndarray
+    labels: np.ndarray
+    info: dict[str, Any]
+
+    @property
+    def n_clusters(self) -> int:
+        return len(self.centroids)
+
+
+def target_clusters(n_rows: int) -> int:
+    """
+    Smallest cluster count for ``n_rows`` rows: growing like ``sqrt(n_rows)``
+    keeps both the number of clusters and the rows a query scans growing
+    slowly.
+    """
+    return max(MIN_TARGET_CLUSTERS, round(math.sqrt(n_rows) / 4))
+
+
+def candidate_counts(n_rows: int) -> List[int]:
+    """
+    Cluster counts ``fit_clusters`` chooses between for ``n_rows`` rows.
+    """
+    target = target_clusters(n_rows)
+    counts = {
+        min(max(2, round(target * factor)), n_rows) for factor in _CANDIDATE_FACTORS
+    }
+    return sorted(counts)
+
+
+def _estimator(n_clusters: int, n_rows: int, init: np.ndarray | None, seed: int):
+    from sklearn.cluster import KMeans, MiniBatchKMeans
+
+    start: Any = "k-means++" if init is None else init
+    n_init: Any = "auto" if init is None else 1
+    if 0 < MINIBATCH_ROWS < n_rows:
+        return MiniBatchKMeans(
+            n_clusters=n_clusters,
+            init=start,
+            n_init=n_init,
+            batch_size=MINIBATCH_SIZE,
+            random_state=seed,
+        )
+    return KMeans(n_clusters=n_clusters, init=start, n_init=n_init, random_state=seed)
+
+
+def assign_clusters(X: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Index of the closest centroid (Euclidean) for each row of ``X``, computed
+    in chunks so the distance matrix stays small for any catalogue size.
+    """
+    squared_norms = (centroids**2).sum(axis=1)
+    labels = np.empty(len(X), dtype=np.int32)
+    for start in range(0, len(X), _ASSIGN_CHUNK):
+        chunk = X[start : start + _ASSIGN_CHUNK]
+        # ||x||^2 is the same for every centroid, so it does not change argmin.
+        distances = squared_norms - 2.0 * chunk @ centroids.T
+        labels[start : start + len(chunk)] = np.argmin(distances, axis=1)
+    return labels
+
+
+def _score_count(
+    sample: np.ndarray, n_clusters: int, seed: int, threads: int
+) -> tuple[int, float, float]:
+    """
+    Fit ``n_clusters`` clusters on ``sample`` and return the count, its
+    silhouette score and its inertia per row. ``threads`` caps the BLAS /
+    OpenMP threads meanwhile (0: leave the caller's limits alone).
+    """
+    from sklearn.metrics import silhouette_score
+    from threadpoolctl import threadpool_limits
+
+    with threadpool_limits(limits=threads or None):
+        estimator = _estimator(n_clusters, len(sample), None, seed).fit(sample)
+        score = silhouette_score(
+            sample,
+            estimator.labels_,
+            sample_size=min(SILHOUETTE_SAMPLE, len(sample)),
+            random_state=seed,
+        )
+    return n_clusters, float(score), float(estimator.inertia_) / len(sample)
+
+
+def select_clusters(
+    X: np.ndarray,
+    counts: List[int] | None = None,
+    seed: int = RANDOM_STATE,
+    jobs: int = JOBS,
+) -> tuple[int, dict[str, Any]]:
+    """
+    Choose the cluster count with the best silhouette score on a sample of
+    ``X``, evaluating the candidates in up to ``jobs`` processes. Returns the
+    count and a summary of the evaluation.
+    """
+    counts = counts or candidate_counts(len(X))
+    rng = np.random.default_rng(seed)
+    sample_rows = max(SELECT_SAMPLE, 40 * max(counts))
+    if len(X) > sample_rows and SELECT_SAMPLE > 0:
+        sample = X[np.sort(rng.choice(len(X), sample_rows, replace=False))]
+    else:
+        sample = X
+    counts = [k for k in counts if k < len(sample)]
+    summary: dict[str, Any] = {"metric": "silhouette", "sample_rows": len(sample)}
+    if not counts:
+        # Too few rows to score two clusters; keep them all in one.
+        return 1, summary
+
+    jobs = max(1, min(jobs, len(counts)))
+    if jobs == 1:
+        scored = [_score_count(sample, k, seed, 0) for k in counts]
+    else:
+        threads = max(1, (os.cpu_count() or 1) // jobs)
+        # Spawned, not forked: the parent may already run BLAS / OpenMP threads.
+        with ProcessPoolExecutor(
+            max_workers=jobs, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            scored = list(
+                pool.map(
+                    _score_count,
+                    [sample] * len(counts),
+                    counts,
+                    [seed] * len(counts),
+                    [threads] * len(counts),
+                )
+            )
+
+    summary["scores"] = {str(k): round(score, 5) for k, score, _ in scored}
+    summary["inertia_per_row"] = {str(k): round(i, 5) for k, _, i in scored}
+    return max(scored, key=lambda item: item[1])[0], summary
+
+
+def fit_clusters(
+    X: np.ndarray,
+    n_clusters: int = CLUSTERS,
+    previous: np.ndarray | None = None,
+    seed: int = RANDOM_STATE,
+    jobs: int = JOBS,
+) -> ClusterFit:
+    """
+    Cluster the scaled feature matrix ``X``.
+
+    ``n_clusters`` of 0 keeps the count of ``previous`` centroids (already in
+    the space of ``X``) when it is still a candidate for this catalogue
+    size, and otherwise selects one with :func:`select_clusters` in up to
+    ``jobs`` processes. Fitting starts from ``previous`` whenever the counts
+    agree.
+    """
+    started = time.perf_counter()
+    selection = None
+    if n_clusters <= 0:
+        counts = candidate_counts(len(X))
+        if previous is not None and counts[0] <= len(previous) <= counts[-1]:
+            n_clusters = len(previous)
+        else:
+            n_clusters, selection = select_clusters(X, counts, seed, jobs)
+    n_clusters = min(n_clusters, len(X))
+    init = previous if previous is not None and len(previous) == n_clusters else None
+
+    fit_rows = X
+    if len(X) > FIT_SAMPLE > 0:
+        rng = np.random.default_rng(seed)
+        fit_rows = X[np.sort(rng.choice(len(X), FIT_SAMPLE, replace=False))]
+    estimator = _estimator(n_clusters, len(fit_rows), init, seed).fit(fit_rows)
+    centroids = estimator.cluster_centers_
+
+    return ClusterFit(
+        centroids=centroids,
+        labels=assign_clusters(X, centroids),
+        info={
+            "method": type(estimator).__name__,
+            "fit_rows": len(fit_rows),
+            "warm_start": init is not None,
+            "selection": selection,
+            "seconds": round(time.perf_counter() - started, 3),
+        },
+    )
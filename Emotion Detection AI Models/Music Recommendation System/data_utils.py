@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import gc
 import json
+import re
+from contextlib import contextmanager
+from itertools import chain, islice
 from pathlib import Path
-from typing import Any, Iterable, List
+from typing import Any, Iterable, Iterator, List
 
 import numpy as np
 import pandas as pd
@@ -10,55 +14,246 @@ import pandas as pd
 
 BASE_DIR = Path(__file__).resolve().parent
 
+# Characters read from songs.json per chunk while streaming.
+READ_CHUNK_CHARS = 1 << 20
+# Songs per DataFrame chunk while streaming.
+FRAME_CHUNK_ROWS = 50_000
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
 
 def load_songs(json_path: str | Path | None = None) -> List[dict[str, Any]]:
     """
-    Load songs from a JSON file.
+    Load songs from a JSON array or NDJSON file (see ``iter_songs``).
 
     Parameters
     ----------
     json_path:
         Path to the JSON file. If None, defaults to ``songs.json`` next to this file.
     """
+    return list(iter_songs(json_path))
+
+
+def iter_songs(
+    json_path: str | Path | None = None, chunk_chars: int = READ_CHUNK_CHARS
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield songs one at a time from a JSON array or an NDJSON file.
+
+    The file is read ``chunk_chars`` characters at a time, so memory use does
+    not grow with the file size. A file whose first non-blank character is
+    ``[`` is parsed as a JSON array of song objects; anything else is parsed
+    as NDJSON (one song object per line).
+    """
     path = Path(json_path) if json_path is not None else BASE_DIR / "songs.json"
 
     with path.open("r", encoding="utf-8") as f:
-        songs = json.load(f)
-
-    if not isinstance(songs, list):
-        raise ValueError("Expected songs.json to contain a list of song objects.")
+        buffer = f.read(chunk_chars)
+        pos = _WHITESPACE.match(buffer).end()
+        while pos == len(buffer):
+            more = f.read(chunk_chars)
+            if not more:
+                return
+            buffer = more
+            pos = _WHITESPACE.match(buffer).end()
+
+        if buffer[pos] == "[":
+            yield from _iter_json_array(f, buffer, pos + 1, chunk_chars)
+        else:
+            rest = iter(lambda: f.read(chunk_chars), "")
+            yield from _iter_ndjson(chain([buffer[pos:]], rest))
+
+
+def _iter_json_array(
+    f: Any, buffer: str, pos: int, chunk_chars: int
+) -> Iterator[dict[str, Any]]:
+    """
+    Incrementally decode the elements of a JSON array whose opening ``[`` ends
+    just before ``buffer[pos]``; ``f`` supplies the rest of the text.
+    """
+    decoder = json.JSONDecoder()
+    eof = False
+
+    def skip_whitespace() -> None:
+        nonlocal buffer, pos, eof
+        while True:
+            pos = _WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) or eof:
+                return
+            buffer, pos = f.read(chunk_chars), 0
+            eof = not buffer
+
+    def read_more() -> None:
+        nonlocal buffer, pos, eof
+        more = f.read(chunk_chars)
+        eof = not more
+        buffer, pos = buffer[pos:] + more, 0
+
+    skip_whitespace()
+    if buffer[pos : pos + 1] == "]":
+        return
+
+    while True:
+        while True:
+            try:
+                song, pos = decoder.raw_decode(buffer, pos)
+                break
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The value is split across chunks: read more and retry.
+                read_more()
+
+        if not isinstance(song, dict):
+            raise ValueError("Expected songs.json to contain a list of song objects.")
+        yield song
+
+        skip_whitespace()
+        separator = buffer[pos : pos + 1]
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError(
+                f"Malformed songs.json: expected ',' or ']' but found {separator!r}"
+            )
+        pos += 1
+        skip_whitespace()
+
+
+def _iter_ndjson(chunks: Iterable[str]) -> Iterator[dict[str, Any]]:
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + chunk).split("\n")
+        pending = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield _ndjson_record(line)
+    if pending.strip():
+        yield _ndjson_record(pending)
+
+
+def _ndjson_record(line: str) -> dict[str, Any]:
+    song = json.loads(line)
+    if not isinstance(song, dict):
+        raise ValueError("Expected each NDJSON line to hold one song object.")
+    return song
+
+
+def load_songs_frame(
+    json_path: str | Path | None = None, chunk_rows: int = FRAME_CHUNK_ROWS
+) -> pd.DataFrame:
+    """
+    Stream songs into a flat DataFrame, ``chunk_rows`` songs at a time.
 
-    return songs
+    Equivalent to ``songs_to_dataframe(load_songs(json_path))``, but only one
+    chunk of song dictionaries is alive at a time instead of the whole file.
+    """
+    songs = iter_songs(json_path)
+    frames: list[pd.DataFrame] = []
+    with _gc_paused():
+        while True:
+            chunk = list(islice(songs, chunk_rows))
+            if not chunk:
+                break
+            frames.append(songs_to_dataframe(chunk))
+
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+@contextmanager
+def _gc_paused() -> Iterator[None]:
+    """
+    Pause the cyclic garbage collector. Bulk parsing allocates millions of
+    long-lived containers (and no cycles), which otherwise triggers repeated
+    full collections that rescan everything loaded so far.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
 
 
 def songs_to_dataframe(songs: Iterable[dict[str, Any]]) -> pd.DataFrame:
     """
     Convert a list of song dictionaries to a pandas DataFrame.
+
+    Nested objects are flattened into dotted columns (``audio_feature.tempo``,
+    ``_id.$oid``) exactly like ``pd.json_normalize``, but the values are
+    collected column by column instead of building one flat dict per song.
+    Each column records the rows it has a value for and is filled in once at
+    the end, so sparse columns cost nothing on the songs that lack them.
     """
-    data = pd.json_normalize(list(songs))
-    return data
+    columns: dict[str, tuple[list[int], list[Any]]] = {}
+    row = 0
+
+    def collect(record: dict[str, Any], prefix: str) -> None:
+        for key, value in record.items():
+            name = f"{prefix}{key}"
+            if isinstance(value, dict):
+                collect(value, f"{name}.")
+                continue
+            column = columns.get(name)
+            if column is None:
+                column = columns[name] = ([], [])
+            column[0].append(row)
+            column[1].append(value)
+
+    for song in songs:
+        # Like json_normalize: a song's top-level values come before its
+        # flattened nested objects.
+        collect({k: v for k, v in song.items() if not isinstance(v, dict)}, "")
+        collect({k: v for k, v in song.items() if isinstance(v, dict)}, "")
+        row += 1
+
+    data: dict[str, list[Any]] = {}
+    for name, (rows, values) in columns.items():
+        if len(rows) == row:
+            data[name] = values
+            continue
+        filled: list[Any] = [np.nan] * row
+        for position, value in zip(rows, values):
+            filled[position] = value
+        data[name] = filled
+    return pd.DataFrame(data, index=pd.RangeIndex(row))
 
 
 def one_hot_encode_genres(data: pd.DataFrame) -> pd.DataFrame:
     """
     One-hot encode the ``genre`` list column into separate ``genre_*`` columns.
 
-    The original ``genre`` column is preserved.
+    The original ``genre`` column is preserved. All indicator columns are
+    filled in one vectorized multi-hot pass and stored as ``uint8``.
     """
-    df = data.copy()
-
-    if "genre" not in df.columns:
-        return df
-
-    df["genre"] = df["genre"].apply(lambda x: x if isinstance(x, list) else [])
-
-    all_genres = sorted({g for genre_list in df["genre"] for g in genre_list})
-
-    for g in all_genres:
-        col_name = f"genre_{g}"
-        df[col_name] = df["genre"].apply(lambda genre_list: int(g in genre_list))
-
-    return df
+    if "genre" not in data.columns:
+        return data
+
+    genre_lists = [x if isinstance(x, list) else [] for x in data["genre"]]
+    lengths = np.fromiter(map(len, genre_lists), dtype=np.int64, count=len(genre_lists))
+    codes, all_genres = pd.factorize(
+        np.fromiter(chain.from_iterable(genre_lists), dtype=object, count=lengths.sum()),
+        sort=True,
+    )
+
+    rows = np.repeat(np.arange(len(genre_lists)), lengths)
+    valid = codes >= 0  # factorize codes missing values (None) as -1
+    multi_hot = np.zeros((len(genre_lists), len(all_genres)), dtype=np.uint8)
+    multi_hot[rows[valid], codes[valid]] = 1
+    one_hot = pd.DataFrame(
+        multi_hot,
+        index=data.index,
+        columns=[f"genre_{g}" for g in all_genres],
+    )
+
+    # assign / concat build new frames, so the caller's frame is untouched.
+    df = data.assign(genre=pd.Series(genre_lists, index=data.index, dtype=object))
+    return pd.concat([df, one_hot], axis=1)
 
 
 def set_track_index(data: pd.DataFrame) -> pd.DataFrame:
@@ -70,21 +265,29 @@ def set_track_index(data: pd.DataFrame) -> pd.DataFrame:
     return data.set_index("track_id")
 
 
-def validate_and_clean_data(data: pd.DataFrame) -> pd.DataFrame:
+def validate_and_clean_data(
+    data: pd.DataFrame, keep: Iterable[str] = ()
+) -> pd.DataFrame:
     """
     Apply basic validation and cleaning steps similar to the notebook:
 
     - Drop clearly irrelevant columns for recommendations (e.g. ``s3_url``)
     - Ensure numeric dtypes for audio feature columns
     - Remove duplicate rows (excluding list-type columns such as ``genre``)
+
+    Columns in ``keep`` are carried through as they are: never dropped, and
+    ignored when looking for duplicates.
     """
-    df = data.copy()
+    keep = set(keep)
+    # Every step below returns a new frame (no up-front defensive copy), so
+    # the caller's frame is never modified.
+    df = data
 
     # Drop irrelevant columns
     columns_to_drop: list[str] = []
     if "_id" in df.columns and "_id.$oid" not in df.columns:
         columns_to_drop.append("_id")
-    if "s3_url" in df.columns:
+    if "s3_url" in df.columns and "s3_url" not in keep:
         columns_to_drop.append("s3_url")
 
     if columns_to_drop:
@@ -92,18 +295,27 @@ def validate_and_clean_data(data: pd.DataFrame) -> pd.DataFrame:
 
     # Ensure numerical feature columns are numeric dtype
     audio_feature_cols = [col for col in df.columns if col.startswith("audio_feature.")]
-    for col in audio_feature_cols:
-        if not np.issubdtype(df[col].dtype, np.number):
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-
-    # Remove duplicate rows (excluding list columns)
+    converted = {
+        col: pd.to_numeric(df[col], errors="coerce")
+        for col in audio_feature_cols
+        if not np.issubdtype(df[col].dtype, np.number)
+    }
+    if converted:
+        df = df.assign(**converted)
+
+    # Remove duplicate rows (excluding list columns). Only object columns can
+    # hold lists, so numeric and string columns are not sampled.
     list_columns: list[str] = []
     for col in df.columns:
+        if df[col].dtype != object:
+            continue
         sample_values = df[col].dropna().head(100)
         if len(sample_values) > 0 and any(isinstance(val, list) for val in sample_values):
             list_columns.append(col)
 
-    columns_to_check = [col for col in df.columns if col not in list_columns]
+    columns_to_check = [
+        col for col in df.columns if col not in list_columns and col not in keep
+    ]
     if columns_to_check:
         df = df.drop_duplicates(subset=columns_to_check)
 
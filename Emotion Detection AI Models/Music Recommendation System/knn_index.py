@@ -0,0 +1,329 @@
+from __future__ import annotations
+
+from typing import Iterable, Protocol
+
+import numpy as np
+
+
+class NeighborIndex(Protocol):
+    """
+    Cosine nearest-neighbor search restricted to one KMeans cluster.
+
+    ``query`` returns row positions and cosine similarities, best first, and
+    never returns a position listed in ``exclude``.
+    """
+
+    def cluster_size(self, cluster: int) -> int: ...
+
+    def query(
+        self,
+        vector: np.ndarray,
+        cluster: int,
+        n: int,
+        exclude: Iterable[int] = (),
+    ) -> tuple[np.ndarray, np.ndarray]: ...
+
+    def query_batch(
+        self,
+        vectors: np.ndarray,
+        clusters: np.ndarray,
+        n: int,
+        exclude: np.ndarray,
+    ) -> list[tuple[np.ndarray, np.ndarray]]: ...
+
+
+def l2_normalize(X: np.ndarray) -> np.ndarray:
+    """
+    Scale each row of ``X`` to unit length; all-zero rows are left as zeros.
+
+    float32 input stays float32; anything else is computed in float64.
+    """
+    X = np.asarray(X)
+    X = X.astype(np.float32 if X.dtype == np.float32 else np.float64)
+    norms = np.linalg.norm(X, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return X / norms
+
+
+def _top_k(
+    members: np.ndarray, scores: np.ndarray, n: int, exclude: Iterable[int]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Drop ``exclude`` from the candidates and return the ``n`` best, best first.
+    """
+    excluded = np.isin(members, np.fromiter(exclude, dtype=np.int64))
+    if excluded.any():
+        members = members[~excluded]
+        scores = scores[~excluded]
+
+    k = min(n, len(members))
+    if k == 0:
+        return members[:0], scores[:0]
+    if k < len(members):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(members))
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return members[top], scores[top]
+
+
+def partition_by_cluster(
+    features: np.ndarray, clusters: np.ndarray, n_clusters: int | None = None
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Group L2-normalized feature rows by cluster.
+
+    Returns ``(positions, offsets, blocks)``: cluster ``c`` owns
+    ``positions[offsets[c]:offsets[c + 1]]`` (row positions in the catalogue)
+    and the matching rows of ``blocks``. The arrays are what the model artifact
+    stores, so indexes can be memory-mapped instead of rebuilt.
+
+    ``n_clusters`` defaults to the largest label + 1; pass it explicitly so
+    that trailing empty clusters still get an (empty) slot.
+    """
+    clusters = np.asarray(clusters)
+    if n_clusters is None:
+        n_clusters = int(clusters.max()) + 1 if len(clusters) else 0
+
+    positions = np.argsort(clusters, kind="stable")
+    offsets = np.zeros(n_clusters + 1, dtype=np.int64)
+    np.cumsum(np.bincount(clusters, minlength=n_clusters), out=offsets[1:])
+    blocks = l2_normalize(features)[positions]
+    return positions, offsets, blocks
+
+
+class ClusterPartitionedIndex:
+    """
+    Exact cosine nearest-neighbor search restricted to one KMeans cluster.
+
+    Rows are L2-normalized and stored contiguously per cluster, so scoring a
+    query is a single dense matrix-vector product over the seed's cluster and
+    the cost of a query scales with the cluster size, not the catalogue size.
+    The arrays come from :func:`partition_by_cluster` and are never modified,
+    so they may be read-only memory maps shared between processes.
+    """
+
+    def __init__(
+        self, positions: np.ndarray, offsets: np.ndarray, blocks: np.ndarray
+    ) -> None:
+        self.positions = positions
+        self.offsets = offsets
+        self.blocks = blocks
+
+    def cluster_size(self, cluster: int) -> int:
+        if not 0 <= cluster < len(self.offsets) - 1:
+            return 0
+        return int(self.offsets[cluster + 1] - self.offsets[cluster])
+
+    def query(
+        self,
+        vector: np.ndarray,
+        cluster: int,
+        n: int,
+        exclude: Iterable[int] = (),
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Return the row positions and cosine similarities of the ``n`` songs in
+        ``cluster`` most similar to ``vector``, best first.
+
+        Positions in ``exclude`` are never returned, so the result holds exactly
+        ``min(n, cluster_size - excluded members)`` items.
+        """
+        if self.cluster_size(cluster) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        start, end = self.offsets[cluster], self.offsets[cluster + 1]
+        scores = self.blocks[start:end] @ l2_normalize(vector)
+        return _top_k(self.positions[start:end], scores, n, exclude)
+
+    def query_batch(
+        self,
+        vectors: np.ndarray,
+        clusters: np.ndarray,
+        n: int,
+        exclude: np.ndarray,
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        """
+        Run :meth:`query` for many rows at once.
+
+        Rows are grouped by cluster and each group is scored with one
+        matrix-matrix product, so the BLAS call is shared across the batch.
+        ``exclude[i]`` is the single position to skip for row ``i`` (typically
+        the seed itself; use -1 for none). Results are returned in row order.
+        """
+        unit = l2_normalize(vectors)
+        clusters = np.asarray(clusters)
+        exclude = np.asarray(exclude, dtype=np.int64)
+        results: list[tuple[np.ndarray, np.ndarray]] = [
+            (np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64))
+        ] * len(unit)
+
+        for cluster in np.unique(clusters):
+            size = self.cluster_size(int(cluster))
+            if size == 0:
+                continue
+
+            rows = np.flatnonzero(clusters == cluster)
+            start, end = self.offsets[cluster], self.offsets[cluster + 1]
+            members = self.positions[start:end]
+
+            scores = unit[rows] @ self.blocks[start:end].T
+            scores[members[None, :] == exclude[rows, None]] = -np.inf
+
+            k = min(n + 1, size)
+            if k < size:
+                top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            else:
+                top = np.broadcast_to(np.arange(size), (len(rows), size))
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1, kind="stable")
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+            for i, row in enumerate(rows):
+                valid = np.isfinite(top_scores[i])
+                results[row] = (members[top[i][valid]][:n], top_scores[i][valid][:n])
+
+        return results
+
+
+def _spherical_kmeans(
+    X: np.ndarray,
+    k: int,
+    rng: np.random.Generator,
+    iterations: int = 10,
+    sample_size: int = 20000,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Cluster unit-length rows by cosine similarity with a few Lloyd iterations
+    on a sample. Returns ``(centroids, labels)`` with labels for every row.
+    """
+    if k <= 1:
+        centroid = l2_normalize(X.mean(axis=0, keepdims=True))
+        return centroid, np.zeros(len(X), dtype=np.int64)
+
+    sample_size = min(len(X), max(sample_size, 40 * k))
+    sample = X[rng.choice(len(X), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, k, replace=False)]
+
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        nonempty = np.bincount(labels, minlength=k) > 0
+        centroids[nonempty] = l2_normalize(sums[nonempty])
+
+    labels = np.empty(len(X), dtype=np.int64)
+    for start in range(0, len(X), 65536):
+        chunk = X[start : start + 65536]
+        labels[start : start + len(chunk)] = np.argmax(chunk @ centroids.T, axis=1)
+    return centroids, labels
+
+
+class IVFClusterIndex(ClusterPartitionedIndex):
+    """
+    Approximate variant of :class:`ClusterPartitionedIndex` for very large
+    catalogues.
+
+    Each KMeans cluster is further split into cells of roughly ``cell_size``
+    songs (spherical k-means on the normalized rows), stored contiguously.
+    A query scores the cluster's cell centroids, then only the ``nprobe`` best
+    cells, probing further cells only when needed to fill ``n`` results.
+    Raising ``nprobe`` trades latency for recall; probing every cell is exact.
+    """
+
+    def __init__(
+        self,
+        positions: np.ndarray,
+        offsets: np.ndarray,
+        blocks: np.ndarray,
+        cell_size: int = 1024,
+        nprobe: int = 4,
+        seed: int = 0,
+    ) -> None:
+        # Rows are reordered by cell below, so work on private copies.
+        super().__init__(np.array(positions), offsets, np.array(blocks))
+        self.nprobe = nprobe
+        self.cell_offsets: list[np.ndarray] = []
+        self.cell_centroids: list[np.ndarray] = []
+
+        rng = np.random.default_rng(seed)
+        for cluster in range(len(self.offsets) - 1):
+            start, end = self.offsets[cluster], self.offsets[cluster + 1]
+            block = self.blocks[start:end]
+            if len(block) == 0:
+                centroids = np.zeros((0, self.blocks.shape[1]), self.blocks.dtype)
+                labels = np.zeros(0, dtype=np.int64)
+            else:
+                n_cells = -(-len(block) // cell_size)
+                centroids, labels = _spherical_kmeans(block, n_cells, rng)
+
+            order = np.argsort(labels, kind="stable")
+            self.blocks[start:end] = block[order]
+            self.positions[start:end] = self.positions[start:end][order]
+
+            cell_offsets = np.full(len(centroids) + 1, start, dtype=np.int64)
+            cell_offsets[1:] += np.cumsum(np.bincount(labels, minlength=len(centroids)))
+            self.cell_offsets.append(cell_offsets)
+            self.cell_centroids.append(centroids)
+
+    def query(
+        self,
+        vector: np.ndarray,
+        cluster: int,
+        n: int,
+        exclude: Iterable[int] = (),
+    ) -> tuple[np.ndarray, np.ndarray]:
+        if self.cluster_size(cluster) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        q = l2_normalize(vector)
+        exclude = np.fromiter(exclude, dtype=np.int64)
+        cell_offsets = self.cell_offsets[cluster]
+
+        cells = np.argsort(-(self.cell_centroids[cluster] @ q))
+        covered = np.cumsum(np.diff(cell_offsets)[cells])
+        enough = int(np.searchsorted(covered, n + len(exclude))) + 1
+        cells = cells[: max(self.nprobe, enough)]
+
+        rows = np.concatenate(
+            [np.arange(cell_offsets[c], cell_offsets[c + 1]) for c in cells]
+        )
+        return _top_k(self.positions[rows], self.blocks[rows] @ q, n, exclude)
+
+    def query_batch(
+        self,
+        vectors: np.ndarray,
+        clusters: np.ndarray,
+        n: int,
+        exclude: np.ndarray,
+    ) -> list[tuple[np.ndarray, np.ndarray]]:
+        # Each row probes different cells, so there is no shared product here.
+        return [
+            self.query(vector, int(cluster), n, (int(skip),) if skip >= 0 else ())
+            for vector, cluster, skip in zip(vectors, clusters, exclude)
+        ]
+
+
+INDEX_BACKENDS = ("exact", "ivf")
+
+
+def build_index(
+    partition: tuple[np.ndarray, np.ndarray, np.ndarray],
+    backend: str = "exact",
+    nprobe: int = 4,
+    cell_size: int = 1024,
+) -> NeighborIndex:
+    """
+    Build the neighbor index for ``backend`` ("exact" or "ivf") from the
+    ``(positions, offsets, blocks)`` returned by :func:`partition_by_cluster`.
+
+    ``nprobe`` and ``cell_size`` only apply to the IVF backend.
+    """
+    if backend == "exact":
+        return ClusterPartitionedIndex(*partition)
+    if backend == "ivf":
+        return IVFClusterIndex(*partition, cell_size=cell_size, nprobe=nprobe)
+    raise ValueError(
+        f"Unknown index backend '{backend}', expected one of {INDEX_BACKENDS}"
+    )
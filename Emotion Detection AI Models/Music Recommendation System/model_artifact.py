@@ -0,0 +1,1179 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import re
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Iterable, List
+
+import numpy as np
+
+from clustering import CLUSTERS, JOBS, RANDOM_STATE, assign_clusters, fit_clusters
+from knn_index import partition_by_cluster
+
+# pandas, scikit-learn and data_utils (which needs pandas) are imported by
+# the functions that build or update artifacts, so a worker that only serves
+# a prebuilt artifact never loads them.
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+# Bump whenever the on-disk layout or the fitting procedure changes so that
+# older artifacts are rejected instead of being misread.
+ARTIFACT_FORMAT_VERSION = 3
+
+DEFAULT_SONGS_PATH = Path(
+    os.environ.get("RECOMMENDER_SONGS_PATH", BASE_DIR / "songs.json")
+)
+DEFAULT_ARTIFACT_DIR = Path(
+    os.environ.get("RECOMMENDER_ARTIFACT_DIR", BASE_DIR / "artifacts")
+)
+MANIFEST_NAME = "manifest.json"
+LATEST_POINTER_NAME = "LATEST"
+
+# Every build, update and refit writes a full copy of the catalogue, so
+# superseded builds are deleted after each write: all but the ARTIFACT_KEEP
+# newest (0 keeps everything) once they are ARTIFACT_GRACE seconds old. The
+# grace period covers workers that resolved LATEST just before it moved and
+# have not mapped their build yet; builds already mapped stay readable after
+# deletion on POSIX systems.
+ARTIFACT_KEEP = int(os.environ.get("RECOMMENDER_ARTIFACT_KEEP", "3"))
+ARTIFACT_GRACE = float(os.environ.get("RECOMMENDER_ARTIFACT_GRACE", "600"))
+
+# Large arrays are stored as individual .npy files so they can be memory-mapped
+# read-only and shared between worker processes through the page cache.
+_ARRAY_FILES = (
+    "features",
+    "clusters",
+    "index_positions",
+    "index_offsets",
+    "index_blocks",
+    "genre_indptr",
+    "genre_codes",
+    "title_keys",
+    "title_rows",
+    "track_keys",
+    "track_rows",
+)
+# Each string column is stored as UTF-8 bytes plus an offsets array.
+_STRING_COLUMNS = ("track_ids", "titles", "artists", "oids")
+# Every other flat songs.json column (s3_url, cover_url, duration, the raw
+# audio features, ...) is kept as per-track metadata that responses can
+# select: text packed like the string columns, numbers as float64 with NaN
+# where missing. Their files are numbered in manifest["metadata_columns"] order.
+_STORED_COLUMNS = ("title", "artist", "genre", "_id.$oid")
+_PARAMS_FILE = "params.npz"
+# Fitted preprocessing / clustering parameters, stored together in _PARAMS_FILE.
+_PARAM_NAMES = ("imputer_statistics", "scaler_mean", "scaler_scale", "centroids")
+
+
+class StaleArtifactError(RuntimeError):
+    """Raised when an artifact does not match the current songs.json or format."""
+
+
+def normalize_title(title: str) -> str:
+    """
+    Normalize a title for case-insensitive lookup.
+    """
+    return title.lower()
+
+
+def _key_hash(key: str) -> int:
+    """
+    Stable 64-bit hash of a lookup key (Python's ``hash`` is salted per process).
+    """
+    return int.from_bytes(
+        hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little"
+    )
+
+
+class PackedStrings:
+    """
+    A read-only column of strings packed as one UTF-8 buffer plus offsets.
+
+    String ``i`` is ``data[offsets[i]:offsets[i + 1]]``. Unlike a fixed-width
+    ``<U`` array, storage is proportional to the total text length, and both
+    buffers can be memory-mapped.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray) -> None:
+        self.data = data
+        self.offsets = offsets
+
+    @classmethod
+    def pack(cls, values: Iterable[str]) -> "PackedStrings":
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(data, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, position: int) -> str:
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.data[start:end].tobytes().decode("utf-8")
+
+    def take(self, positions: np.ndarray) -> List[str]:
+        """
+        Decode the strings at ``positions``.
+        """
+        starts = self.offsets[positions].tolist()
+        ends = self.offsets[np.asarray(positions) + 1].tolist()
+        # Slicing a memoryview is much cheaper than slicing the ndarray.
+        data = memoryview(self.data)
+        return [str(data[start:end], "utf-8") for start, end in zip(starts, ends)]
+
+    def tolist(self) -> List[str]:
+        raw = self.data.tobytes()
+        bounds = self.offsets.tolist()
+        return [
+            raw[start:end].decode("utf-8") for start, end in zip(bounds, bounds[1:])
+        ]
+
+
+@dataclass(frozen=True)
+class RecommendationArtifact:
+    """
+    Everything the recommender needs at serving time, loaded from disk.
+
+    Row ``i`` of every per-track array refers to the same track.
+    Missing strings (e.g. a song without a title) are stored as ``""``.
+
+    ``features`` is the float32 scaled feature matrix, and ``index_*`` hold the
+    same rows L2-normalized and grouped by cluster (see
+    ``knn_index.partition_by_cluster``). Genres are CSR-encoded integer codes
+    into ``genre_vocab``. ``*_keys`` / ``*_rows`` are lookup tables: 64-bit key
+    hashes sorted ascending with the row position each one belongs to.
+    ``metadata`` holds the remaining songs.json columns by name.
+    """
+
+    path: Path
+    manifest: dict[str, Any]
+    features: np.ndarray
+    clusters: np.ndarray
+    index_positions: np.ndarray
+    index_offsets: np.ndarray
+    index_blocks: np.ndarray
+    track_ids: PackedStrings
+    titles: PackedStrings
+    artists: PackedStrings
+    oids: PackedStrings
+    genre_indptr: np.ndarray
+    genre_codes: np.ndarray
+    genre_vocab: List[str]
+    title_keys: np.ndarray
+    title_rows: np.ndarray
+    track_keys: np.ndarray
+    track_rows: np.ndarray
+    imputer_statistics: np.ndarray
+    scaler_mean: np.ndarray
+    scaler_scale: np.ndarray
+    centroids: np.ndarray
+    metadata: dict[str, PackedStrings | np.ndarray]
+
+    @property
+    def build_id(self) -> str:
+        return str(self.manifest["build_id"])
+
+    def genres_at(self, position: int) -> List[str]:
+        """
+        Return the genre list of the track at ``position``.
+        """
+        start, end = self.genre_indptr[position], self.genre_indptr[position + 1]
+        return [self.genre_vocab[code] for code in self.genre_codes[start:end]]
+
+    def genres_for(self, positions: np.ndarray) -> List[List[str]]:
+        """
+        Return the genre lists of the tracks at ``positions``.
+        """
+        starts = self.genre_indptr[positions].tolist()
+        ends = self.genre_indptr[positions + 1].tolist()
+        vocab = self.genre_vocab
+        return [
+            [vocab[code] for code in self.genre_codes[start:end].tolist()]
+            for start, end in zip(starts, ends)
+        ]
+
+    def metadata_for(self, name: str, positions: np.ndarray) -> List[Any]:
+        """
+        Return the values of metadata column ``name`` at ``positions``, with
+        None where a track has no value or the catalogue has no such column.
+        """
+        column = self.metadata.get(name)
+        if column is None:
+            return [None] * len(positions)
+        if isinstance(column, PackedStrings):
+            return [value or None for value in column.take(positions)]
+        return [None if math.isnan(v) else v for v in column[positions].tolist()]
+
+    def positions_for_title(self, title: str) -> List[int]:
+        """
+        Return the row positions of every track titled ``title`` (case-insensitive),
+        in dataset order.
+        """
+        key = normalize_title(title)
+        candidates = _lookup(self.title_keys, self.title_rows, _key_hash(key))
+        return [p for p in candidates if normalize_title(self.titles[p]) == key]
+
+    def position_for_track_id(self, track_id: str) -> int | None:
+        """
+        Return the row position of ``track_id``, or None if it is unknown.
+        """
+        candidates = _lookup(self.track_keys, self.track_rows, _key_hash(track_id))
+        for position in candidates:
+            if self.track_ids[position] == track_id:
+                return position
+        return None
+
+    def positions_for_track_ids(self, track_ids: Iterable[str]) -> np.ndarray:
+        """
+        Return the row position of each of ``track_ids``, -1 for unknown ones:
+        one vectorized search of the key table instead of one per ID.
+        """
+        track_ids = list(track_ids)
+        hashes = np.fromiter(
+            map(_key_hash, track_ids), dtype=np.uint64, count=len(track_ids)
+        )
+        starts = np.searchsorted(self.track_keys, hashes, side="left")
+        ends = np.searchsorted(self.track_keys, hashes, side="right")
+
+        # Hash collisions are rare: check unique hits in one pass, the rest
+        # one by one.
+        positions = np.full(len(track_ids), -1, dtype=np.int64)
+        unique = np.flatnonzero(ends - starts == 1)
+        rows = self.track_rows[starts[unique]]
+        stored = self.track_ids.take(rows)
+        for i, row, stored_id in zip(unique.tolist(), rows.tolist(), stored):
+            if stored_id == track_ids[i]:
+                positions[i] = row
+        for i in np.flatnonzero(ends - starts > 1).tolist():
+            position = self.position_for_track_id(track_ids[i])
+            if position is not None:
+                positions[i] = position
+        return positions
+
+
+def _lookup(keys: np.ndarray, rows: np.ndarray, key_hash: int) -> List[int]:
+    """
+    Return the rows whose key hash equals ``key_hash`` (hash collisions included).
+    """
+    start = np.searchsorted(keys, np.uint64(key_hash), side="left")
+    end = np.searchsorted(keys, np.uint64(key_hash), side="right")
+    return rows[start:end].tolist()
+
+
+def _key_table(keys: Iterable[str]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Build a ``(sorted key hashes, row positions)`` lookup table; empty keys are
+    skipped. Rows sharing a key stay in dataset order.
+    """
+    hashes: list[int] = []
+    rows: list[int] = []
+    for position, key in enumerate(keys):
+        if key:
+            hashes.append(_key_hash(key))
+            rows.append(position)
+    hash_array = np.asarray(hashes, dtype=np.uint64)
+    row_array = np.asarray(rows, dtype=np.int64)
+    order = np.argsort(hash_array, kind="stable")
+    return hash_array[order], row_array[order]
+
+
+# ── Fingerprinting ────────────────────────────────────────────────────────────
+
+def songs_fingerprint(json_path: str | Path) -> str:
+    """
+    Return the SHA-256 hex digest of a songs.json file.
+    """
+    digest = hashlib.sha256()
+    with Path(json_path).open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _file_stamp(path: Path) -> dict[str, int]:
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def is_artifact_current(manifest: dict[str, Any], songs_path: str | Path) -> bool:
+    """
+    Check whether ``manifest`` was built from the current ``songs_path``.
+
+    The cheap size/mtime stamp is compared first; the file is only re-hashed
+    when the stamp differs (e.g. after a copy that preserved the content).
+    """
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        return False
+
+    path = Path(songs_path)
+    if not path.exists():
+        # Serving from a prebuilt artifact without the source file is allowed.
+        return True
+
+    if manifest.get("songs_stamp") == _file_stamp(path):
+        return True
+    return manifest.get("songs_sha256") == songs_fingerprint(path)
+
+
+# ── Building ──────────────────────────────────────────────────────────────────
+
+def select_feature_columns(data: pd.DataFrame) -> List[str]:
+    """
+    Return the numerical ``audio_feature.*`` columns used for clustering / KNN.
+    """
+    exclude_cols = ["artist", "title", "genre", "cluster", "_id", "s3_url"]
+    genre_cols = [col for col in data.columns if col.startswith("genre_")]
+    exclude_cols.extend(genre_cols)
+
+    all_numeric = data.select_dtypes(include=[np.number])
+    return [col for col in all_numeric.columns if col not in exclude_cols]
+
+
+def _clean_strings(values: pd.Series | pd.Index) -> List[str]:
+    import pandas as pd
+
+    return ["" if pd.isna(v) else str(v) for v in values]
+
+
+def _metadata_columns(data: pd.DataFrame) -> dict[str, PackedStrings | np.ndarray]:
+    """
+    Collect the songs.json columns not stored otherwise as metadata columns;
+    columns holding lists are skipped.
+    """
+    import pandas as pd
+
+    metadata: dict[str, PackedStrings | np.ndarray] = {}
+    for name in data.columns:
+        if name in _STORED_COLUMNS or name.startswith("genre_"):
+            continue
+        values = data[name]
+        if pd.api.types.is_numeric_dtype(values) and values.dtype != bool:
+            metadata[name] = values.to_numpy(dtype=np.float64)
+        elif not any(isinstance(v, list) for v in values.dropna().head(100)):
+            metadata[name] = PackedStrings.pack(_clean_strings(values))
+    return metadata
+
+
+def _metadata_kinds(metadata: dict[str, PackedStrings | np.ndarray]) -> dict[str, str]:
+    return {
+        name: "str" if isinstance(column, PackedStrings) else "float"
+        for name, column in metadata.items()
+    }
+
+
+def _encode_genres(
+    genres: Iterable[List[str]], vocab: List[str] | None = None
+) -> tuple[np.ndarray, np.ndarray, List[str]]:
+    """
+    Encode a column of genre lists as CSR-style ``(indptr, codes, vocab)``.
+
+    Genres not already in ``vocab`` are appended to (a copy of) it in sorted
+    order, so existing codes stay valid. Codes are uint16 while the vocabulary
+    fits, which it does by a wide margin.
+    """
+    genres = list(genres)
+    known = list(vocab) if vocab is not None else []
+    vocab = known + sorted({g for genre_list in genres for g in genre_list} - set(known))
+    code_dtype = np.uint16 if len(vocab) <= np.iinfo(np.uint16).max else np.int32
+    code_of = {g: i for i, g in enumerate(vocab)}
+
+    lengths = np.fromiter((len(g) for g in genres), dtype=np.int64, count=len(genres))
+    indptr = np.zeros(len(genres) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    codes = np.fromiter(
+        (code_of[g] for genre_list in genres for g in genre_list),
+        dtype=code_dtype,
+        count=int(indptr[-1]),
+    )
+    return indptr, codes, vocab
+
+
+def build_artifact(
+    json_path: str | Path | None = None,
+    artifact_dir: str | Path | None = None,
+    n_clusters: int = CLUSTERS,
+    cluster_jobs: int = JOBS,
+) -> Path:
+    """
+    Fit the recommendation pipeline on songs.json and persist it to disk.
+
+    The artifact is written to ``<artifact_dir>/<build_id>/`` and the
+    ``LATEST`` pointer is switched to it atomically once every file is in place.
+    Returns the path of the new build directory.
+
+    ``n_clusters`` of 0 lets :func:`clustering.fit_clusters` choose the count,
+    scoring candidates in up to ``cluster_jobs`` processes; clustering
+    warm-starts from the centroids of the artifact being replaced.
+    """
+    import pandas as pd
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import StandardScaler
+
+    from data_utils import (
+        load_songs_frame,
+        one_hot_encode_genres,
+        set_track_index,
+        validate_and_clean_data,
+    )
+
+    songs_path = Path(json_path) if json_path is not None else DEFAULT_SONGS_PATH
+    root = Path(artifact_dir) if artifact_dir is not None else DEFAULT_ARTIFACT_DIR
+
+    songs_sha256 = songs_fingerprint(songs_path)
+    songs_stamp = _file_stamp(songs_path)
+
+    data = load_songs_frame(songs_path)
+    data = one_hot_encode_genres(data)
+    data = set_track_index(data)
+    data = validate_and_clean_data(data, keep=("s3_url",))
+
+    feature_cols = select_feature_columns(data)
+    X = data[feature_cols]
+
+    imputer = SimpleImputer(strategy="median")
+    X_imputed = imputer.fit_transform(X)
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X_imputed)
+
+    # The notebook fits imputer -> scaler -> KMeans as one pipeline; the first
+    # two steps are identical to the ones above, so cluster the scaled matrix.
+    previous = _previous_centroids(root, feature_cols, scaler.mean_, scaler.scale_)
+    fit = fit_clusters(X_scaled, n_clusters, previous, jobs=cluster_jobs)
+    clusters = fit.labels
+
+    genres = data["genre"] if "genre" in data.columns else pd.Series([[]] * len(data))
+    genre_indptr, genre_codes, genre_vocab = _encode_genres(genres)
+
+    def column(name: str) -> pd.Series:
+        if name in data.columns:
+            return data[name]
+        return pd.Series([None] * len(data), index=data.index)
+
+    features = X_scaled.astype(np.float32)
+    index_positions, index_offsets, index_blocks = partition_by_cluster(
+        features, clusters, fit.n_clusters
+    )
+
+    titles = _clean_strings(column("title"))
+    track_ids = _clean_strings(data.index)
+    title_keys, title_rows = _key_table(normalize_title(t) for t in titles)
+    track_keys, track_rows = _key_table(track_ids)
+    metadata = _metadata_columns(data)
+
+    arrays = {
+        "features": features,
+        "clusters": clusters,
+        "index_positions": index_positions,
+        "index_offsets": index_offsets,
+        "index_blocks": index_blocks,
+        "genre_indptr": genre_indptr,
+        "genre_codes": genre_codes,
+        "title_keys": title_keys,
+        "title_rows": title_rows,
+        "track_keys": track_keys,
+        "track_rows": track_rows,
+        "track_ids": PackedStrings.pack(track_ids),
+        "titles": PackedStrings.pack(titles),
+        "artists": PackedStrings.pack(_clean_strings(column("artist"))),
+        "oids": PackedStrings.pack(_clean_strings(column("_id.$oid"))),
+        "imputer_statistics": imputer.statistics_,
+        "scaler_mean": scaler.mean_,
+        "scaler_scale": scaler.scale_,
+        "centroids": fit.centroids,
+        "metadata": metadata,
+    }
+
+    # The fitted centroids identify the clustering: builds of one songs.json
+    # with another cluster count or warm start must not reuse each other's
+    # directory, while identical builds by concurrent processes still do.
+    fit_id = hashlib.blake2b(
+        np.ascontiguousarray(fit.centroids).tobytes(), digest_size=4
+    ).hexdigest()
+    manifest = {
+        "build_id": f"v{ARTIFACT_FORMAT_VERSION}-{songs_sha256[:12]}-{fit_id}",
+        "format_version": ARTIFACT_FORMAT_VERSION,
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "songs_path": str(songs_path),
+        "songs_sha256": songs_sha256,
+        "songs_stamp": songs_stamp,
+        "n_tracks": int(X_scaled.shape[0]),
+        "feature_columns": feature_cols,
+        "n_clusters": fit.n_clusters,
+        "random_state": RANDOM_STATE,
+        "clustering": fit.info,
+        "genre_vocab": genre_vocab,
+        "metadata_columns": _metadata_kinds(metadata),
+        "revision": 0,
+        "incremental": _fresh_incremental(int(X_scaled.shape[0])),
+    }
+    return _write_build(root, manifest, arrays)
+
+
+def _previous_centroids(
+    root: Path,
+    feature_cols: List[str],
+    scaler_mean: np.ndarray,
+    scaler_scale: np.ndarray,
+) -> np.ndarray | None:
+    """
+    Centroids of the latest artifact under ``root``, moved into the space of
+    the new scaler, or None if there is no usable artifact (none yet, an
+    incomplete one, or one built on other feature columns).
+    """
+    try:
+        build_dir = resolve_latest(root)
+        with (build_dir / MANIFEST_NAME).open("r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        with np.load(build_dir / _PARAMS_FILE, allow_pickle=False) as params:
+            centroids = params["centroids"]
+            mean, scale = params["scaler_mean"], params["scaler_scale"]
+    except (OSError, KeyError, ValueError):
+        return None
+    if manifest.get("feature_columns") != list(feature_cols):
+        return None
+    return _rescale(centroids, mean, scale, scaler_mean, scaler_scale)
+
+
+def _rescale(
+    X: np.ndarray,
+    old_mean: np.ndarray,
+    old_scale: np.ndarray,
+    new_mean: np.ndarray,
+    new_scale: np.ndarray,
+) -> np.ndarray:
+    """
+    Re-express rows standardized with one scaler in terms of another.
+    """
+    return (X.astype(np.float64) * old_scale + old_mean - new_mean) / new_scale
+
+
+def _fresh_incremental(fitted_rows: int) -> dict[str, int]:
+    return {"fitted_rows": fitted_rows, "added": 0, "removed": 0, "updates": 0}
+
+
+def _write_build(root: Path, manifest: dict[str, Any], arrays: dict[str, Any]) -> Path:
+    """
+    Write ``arrays`` and ``manifest`` to ``<root>/<build_id>/`` and point
+    ``LATEST`` at it. Returns the build directory.
+
+    Files are written to a private temporary directory that is renamed into
+    place, so a build directory other processes may have memory-mapped is
+    never rewritten. If ``<build_id>`` already exists (another process built
+    the same thing first) the existing one is kept. Raises ``FileExistsError``
+    only when ``manifest["build_id"]`` must be unique (``revision`` > 0).
+    """
+    build_id = manifest["build_id"]
+    build_dir = root / build_id
+    root.mkdir(parents=True, exist_ok=True)
+    tmp_dir = Path(tempfile.mkdtemp(prefix=f".{build_id}.", dir=root))
+    # mkdtemp / mkstemp create owner-only entries; keep artifacts world-readable.
+    os.chmod(tmp_dir, 0o755)
+    try:
+        _write_files(tmp_dir, manifest, arrays)
+        try:
+            os.rename(tmp_dir, build_dir)
+        except OSError:
+            if not (build_dir / MANIFEST_NAME).exists() or manifest.get("revision"):
+                raise FileExistsError(f"Model artifact {build_dir} already exists")
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    fd, pointer_tmp = tempfile.mkstemp(prefix=f".{LATEST_POINTER_NAME}.", dir=root)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(build_id)
+    os.chmod(pointer_tmp, 0o644)
+    os.replace(pointer_tmp, root / LATEST_POINTER_NAME)
+
+    prune_builds(root)
+    return build_dir
+
+
+def prune_builds(
+    root: Path, keep: int = ARTIFACT_KEEP, grace: float = ARTIFACT_GRACE
+) -> List[str]:
+    """
+    Delete build directories under ``root`` other than the one ``LATEST``
+    points to, the ``keep`` newest and any written less than ``grace``
+    seconds ago, plus temporary directories abandoned that long ago by
+    interrupted writes. Returns the names deleted; ``keep`` <= 0 deletes
+    nothing.
+    """
+    if keep <= 0:
+        return []
+    try:
+        latest = (root / LATEST_POINTER_NAME).read_text(encoding="utf-8").strip()
+    except OSError:
+        return []
+
+    cutoff = time.time() - grace
+    builds: List[tuple[float, Path]] = []
+    stale: List[Path] = []
+    for entry in root.iterdir():
+        if not entry.is_dir() or entry.name == latest:
+            continue
+        try:
+            written = (entry / MANIFEST_NAME).stat().st_mtime
+        except OSError:
+            # A temporary directory, or a build another process is writing.
+            written = entry.stat().st_mtime
+            if entry.name.startswith(".") and written < cutoff:
+                stale.append(entry)
+            continue
+        builds.append((written, entry))
+
+    builds.sort(reverse=True)
+    # LATEST counts towards ``keep``.
+    stale += [path for written, path in builds[keep - 1 :] if written < cutoff]
+    for path in stale:
+        shutil.rmtree(path, ignore_errors=True)
+    return [path.name for path in stale]
+
+
+def _write_files(
+    build_dir: Path, manifest: dict[str, Any], arrays: dict[str, Any]
+) -> None:
+    for name in _ARRAY_FILES:
+        np.save(build_dir / f"{name}.npy", arrays[name], allow_pickle=False)
+    for name in _STRING_COLUMNS:
+        packed = arrays[name]
+        np.save(build_dir / f"{name}_data.npy", packed.data, allow_pickle=False)
+        np.save(build_dir / f"{name}_offsets.npy", packed.offsets, allow_pickle=False)
+
+    for i, name in enumerate(manifest["metadata_columns"]):
+        column = arrays["metadata"][name]
+        prefix = build_dir / f"metadata_{i}"
+        if isinstance(column, PackedStrings):
+            np.save(f"{prefix}_data.npy", column.data, allow_pickle=False)
+            np.save(f"{prefix}_offsets.npy", column.offsets, allow_pickle=False)
+        else:
+            np.save(f"{prefix}.npy", column, allow_pickle=False)
+
+    np.savez(
+        build_dir / _PARAMS_FILE,
+        **{name: arrays[name] for name in _PARAM_NAMES},
+    )
+
+    # The manifest is written last: a build directory without one is incomplete.
+    with (build_dir / MANIFEST_NAME).open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+
+# ── Incremental updates ───────────────────────────────────────────────────────
+
+def _filter_ragged(
+    indptr: np.ndarray, values: np.ndarray, keep: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Drop the rows of a CSR-style ``(indptr, values)`` pair where ``keep`` is false.
+    """
+    lengths = np.diff(indptr)
+    kept_indptr = np.zeros(int(keep.sum()) + 1, dtype=np.int64)
+    np.cumsum(lengths[keep], out=kept_indptr[1:])
+    return kept_indptr, values[np.repeat(keep, lengths)]
+
+
+def _append_ragged(
+    indptr: np.ndarray,
+    values: np.ndarray,
+    more_indptr: np.ndarray,
+    more_values: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    return (
+        np.concatenate([indptr, more_indptr[1:] + indptr[-1]]),
+        np.concatenate([values, more_values]),
+    )
+
+
+def _update_strings(
+    column: PackedStrings, keep: np.ndarray, values: List[str]
+) -> PackedStrings:
+    offsets, data = _filter_ragged(column.offsets, column.data, keep)
+    more = PackedStrings.pack(values)
+    offsets, data = _append_ragged(offsets, data, more.offsets, more.data)
+    return PackedStrings(data, offsets)
+
+
+def _update_metadata(
+    column: PackedStrings | np.ndarray, keep: np.ndarray, values: Any
+) -> PackedStrings | np.ndarray:
+    if isinstance(column, PackedStrings):
+        return _update_strings(column, keep, values)
+    return np.concatenate([column[keep], values])
+
+
+def _update_key_table(
+    keys: np.ndarray, rows: np.ndarray, keep: np.ndarray, new_keys: Iterable[str]
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Drop the rows where ``keep`` is false from a lookup table, renumbering the
+    survivors, and add ``new_keys`` for rows appended after them.
+    """
+    renumber = np.cumsum(keep) - 1
+    kept = keep[rows]
+    added_keys, added_rows = _key_table(new_keys)
+    hashes = np.concatenate([keys[kept], added_keys])
+    positions = np.concatenate([renumber[rows[kept]], added_rows + int(keep.sum())])
+    # Stable, so rows sharing a key stay in dataset order (old rows first).
+    order = np.argsort(hashes, kind="stable")
+    return hashes[order], positions[order]
+
+
+def _prepare_rows(
+    artifact: RecommendationArtifact, songs: List[dict[str, Any]]
+) -> dict[str, Any]:
+    """
+    Turn songs.json-style records into artifact rows using the fitted
+    imputer / scaler statistics and KMeans centroids (nothing is refit).
+    """
+    import pandas as pd
+
+    from data_utils import set_track_index, songs_to_dataframe
+
+    data = songs_to_dataframe(songs)
+    if "track_id" not in data.columns or data["track_id"].isna().any():
+        raise ValueError("Every added track needs a track_id")
+    data["track_id"] = data["track_id"].astype(str)
+    # A track listed twice in one call keeps its last version.
+    data = set_track_index(data.drop_duplicates(subset="track_id", keep="last"))
+
+    feature_cols = artifact.manifest["feature_columns"]
+    X = data.reindex(columns=feature_cols).apply(pd.to_numeric, errors="coerce")
+    X = np.array(X, dtype=np.float64)
+    missing = np.isnan(X)
+    X[missing] = np.broadcast_to(artifact.imputer_statistics, X.shape)[missing]
+    X_scaled = (X - artifact.scaler_mean) / artifact.scaler_scale
+
+    def column(name: str) -> List[str]:
+        if name in data.columns:
+            return _clean_strings(data[name])
+        return [""] * len(data)
+
+    metadata: dict[str, Any] = {}
+    for name, stored in artifact.metadata.items():
+        if isinstance(stored, PackedStrings):
+            metadata[name] = column(name)
+        elif name in data.columns:
+            metadata[name] = pd.to_numeric(data[name], errors="coerce").to_numpy(
+                dtype=np.float64
+            )
+        else:
+            metadata[name] = np.full(len(data), np.nan)
+
+    genres = data["genre"] if "genre" in data.columns else [[]] * len(data)
+    return {
+        "track_ids": _clean_strings(data.index),
+        "titles": column("title"),
+        "artists": column("artist"),
+        "oids": column("_id.$oid"),
+        "genres": [g if isinstance(g, list) else [] for g in genres],
+        "features": X_scaled.astype(np.float32),
+        "clusters": assign_clusters(X_scaled, artifact.centroids),
+        "metadata": metadata,
+    }
+
+
+def _artifact_arrays(artifact: RecommendationArtifact) -> dict[str, Any]:
+    names = _ARRAY_FILES + _STRING_COLUMNS + _PARAM_NAMES
+    return {name: getattr(artifact, name) for name in names} | {
+        "metadata": artifact.metadata
+    }
+
+
+def _incremental_stats(
+    previous: dict[str, Any], features: np.ndarray, added: int, removed: int
+) -> dict[str, Any]:
+    """
+    Accumulate how far the catalogue has moved since the last full fit.
+
+    ``changed_fraction`` is the share of rows added or removed relative to the
+    fitted catalogue; ``mean_shift`` is the RMS of the per-feature mean of the
+    scaled features, which is 0 right after a fit.
+    """
+    stats = dict(previous)
+    stats["added"] = int(stats.get("added", 0)) + added
+    stats["removed"] = int(stats.get("removed", 0)) + removed
+    stats["updates"] = int(stats.get("updates", 0)) + 1
+    fitted_rows = max(int(stats.get("fitted_rows", 0)), 1)
+    stats["changed_fraction"] = (stats["added"] + stats["removed"]) / fitted_rows
+    if len(features):
+        column_means = features.mean(axis=0, dtype=np.float64)
+        stats["mean_shift"] = float(np.sqrt(np.mean(column_means**2)))
+    else:
+        stats["mean_shift"] = 0.0
+    return stats
+
+
+def _write_revision(
+    artifact: RecommendationArtifact,
+    root: Path,
+    arrays: dict[str, Any],
+    **manifest_changes: Any,
+) -> Path:
+    """
+    Write ``arrays`` as the next revision of ``artifact``'s build.
+
+    Revisions keep the songs.json fingerprint of their parent, so they stay
+    current for the same source file, and are named after its base build.
+    """
+    base_id = re.sub(r"-r\d+$", "", artifact.build_id)
+    revision = int(artifact.manifest.get("revision", 0)) + 1
+    while True:
+        while (root / f"{base_id}-r{revision}").exists():
+            revision += 1
+
+        manifest = dict(
+            artifact.manifest,
+            build_id=f"{base_id}-r{revision}",
+            built_at=datetime.now(timezone.utc).isoformat(),
+            n_tracks=int(len(arrays["clusters"])),
+            revision=revision,
+            parent_build_id=artifact.build_id,
+        )
+        manifest.update(manifest_changes)
+        try:
+            return _write_build(root, manifest, arrays)
+        except FileExistsError:
+            # Another process wrote this revision concurrently; take the next.
+            revision += 1
+
+
+def update_artifact(
+    artifact: RecommendationArtifact,
+    add: Iterable[dict[str, Any]] = (),
+    remove: Iterable[str] = (),
+    artifact_dir: str | Path | None = None,
+) -> tuple[Path, dict[str, Any]]:
+    """
+    Add and / or remove tracks without refitting, writing the result as a new
+    revision next to ``artifact`` and switching ``LATEST`` to it.
+
+    Added songs use the songs.json record format. They are imputed and scaled
+    with the fitted statistics and assigned to the nearest existing KMeans
+    centroid; every other track keeps its features and cluster, so
+    recommendations for untouched seeds do not change. Adding a track_id that
+    already exists replaces that track.
+
+    Returns the new build directory and a summary with the ``added``,
+    ``replaced`` and ``removed`` counts and the ``missing`` track_ids that
+    were asked to be removed but are not in the catalogue.
+    """
+    root = Path(artifact_dir) if artifact_dir is not None else artifact.path.parent
+    songs = list(add)
+    new = _prepare_rows(artifact, songs) if songs else None
+
+    keep = np.ones(len(artifact.clusters), dtype=bool)
+    missing: List[str] = []
+    for track_id in dict.fromkeys(remove):
+        position = artifact.position_for_track_id(track_id)
+        if position is None:
+            missing.append(track_id)
+        else:
+            keep[position] = False
+    removed = int((~keep).sum())
+
+    replaced = 0
+    for track_id in new["track_ids"] if new else ():
+        position = artifact.position_for_track_id(track_id)
+        if position is not None and keep[position]:
+            keep[position] = False
+            replaced += 1
+
+    if new is None:
+        new = {
+            "track_ids": [],
+            "titles": [],
+            "artists": [],
+            "oids": [],
+            "genres": [],
+            "features": np.zeros((0, artifact.features.shape[1]), dtype=np.float32),
+            "clusters": np.zeros(0, dtype=np.int32),
+            "metadata": {
+                name: [] if isinstance(column, PackedStrings) else np.zeros(0)
+                for name, column in artifact.metadata.items()
+            },
+        }
+
+    arrays = _artifact_arrays(artifact)
+    features = np.concatenate([artifact.features[keep], new["features"]])
+    clusters = np.concatenate([artifact.clusters[keep], new["clusters"]])
+    n_clusters = int(artifact.manifest["n_clusters"])
+    index_positions, index_offsets, index_blocks = partition_by_cluster(
+        features, clusters, n_clusters
+    )
+
+    genre_indptr, genre_codes = _filter_ragged(
+        artifact.genre_indptr, artifact.genre_codes, keep
+    )
+    new_indptr, new_codes, genre_vocab = _encode_genres(
+        new["genres"], artifact.genre_vocab
+    )
+    genre_indptr, genre_codes = _append_ragged(
+        genre_indptr, genre_codes, new_indptr, new_codes
+    )
+
+    title_keys, title_rows = _update_key_table(
+        artifact.title_keys,
+        artifact.title_rows,
+        keep,
+        (normalize_title(t) for t in new["titles"]),
+    )
+    track_keys, track_rows = _update_key_table(
+        artifact.track_keys, artifact.track_rows, keep, new["track_ids"]
+    )
+
+    arrays.update(
+        features=features,
+        clusters=clusters,
+        index_positions=index_positions,
+        index_offsets=index_offsets,
+        index_blocks=index_blocks,
+        genre_indptr=genre_indptr,
+        genre_codes=genre_codes,
+        title_keys=title_keys,
+        title_rows=title_rows,
+        track_keys=track_keys,
+        track_rows=track_rows,
+    )
+    for name in _STRING_COLUMNS:
+        arrays[name] = _update_strings(getattr(artifact, name), keep, new[name])
+    arrays["metadata"] = {
+        name: _update_metadata(column, keep, new["metadata"][name])
+        for name, column in artifact.metadata.items()
+    }
+
+    added = len(new["track_ids"])
+    incremental = _incremental_stats(
+        artifact.manifest.get("incremental", _fresh_incremental(len(keep))),
+        features,
+        added=added,
+        removed=removed + replaced,
+    )
+    build_dir = _write_revision(
+        artifact, root, arrays, genre_vocab=genre_vocab, incremental=incremental
+    )
+    summary = {
+        "added": added - replaced,
+        "replaced": replaced,
+        "removed": removed,
+        "missing": missing,
+    }
+    return build_dir, summary
+
+
+def refit_artifact(
+    artifact: RecommendationArtifact,
+    artifact_dir: str | Path | None = None,
+    n_clusters: int = CLUSTERS,
+    cluster_jobs: int = JOBS,
+) -> Path:
+    """
+    Refit the scaler and clustering on the artifact's current catalogue,
+    including tracks added incrementally, and write the result as a new
+    revision. Clustering warm-starts from the artifact's centroids.
+
+    The unscaled features are recovered from the stored scaled ones, so this
+    does not need songs.json. Missing values were already imputed, so the new
+    imputer medians are taken over the imputed features.
+    """
+    from sklearn.preprocessing import StandardScaler
+
+    root = Path(artifact_dir) if artifact_dir is not None else artifact.path.parent
+
+    X = artifact.features.astype(np.float64) * artifact.scaler_scale
+    X += artifact.scaler_mean
+
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    previous = _rescale(
+        artifact.centroids,
+        artifact.scaler_mean,
+        artifact.scaler_scale,
+        scaler.mean_,
+        scaler.scale_,
+    )
+    fit = fit_clusters(X_scaled, n_clusters, previous, jobs=cluster_jobs)
+    clusters = fit.labels
+
+    features = X_scaled.astype(np.float32)
+    index_positions, index_offsets, index_blocks = partition_by_cluster(
+        features, clusters, fit.n_clusters
+    )
+
+    arrays = _artifact_arrays(artifact)
+    arrays.update(
+        features=features,
+        clusters=clusters,
+        index_positions=index_positions,
+        index_offsets=index_offsets,
+        index_blocks=index_blocks,
+        imputer_statistics=np.median(X, axis=0),
+        scaler_mean=scaler.mean_,
+        scaler_scale=scaler.scale_,
+        centroids=fit.centroids,
+    )
+    return _write_revision(
+        artifact,
+        root,
+        arrays,
+        n_clusters=fit.n_clusters,
+        clustering=fit.info,
+        incremental=_fresh_incremental(len(features)),
+    )
+
+
+# ── Loading ───────────────────────────────────────────────────────────────────
+
+def resolve_latest(artifact_dir: str | Path | None = None) -> Path:
+    """
+    Return the build directory the ``LATEST`` pointer refers to.
+    """
+    root = Path(artifact_dir) if artifact_dir is not None else DEFAULT_ARTIFACT_DIR
+    pointer = root / LATEST_POINTER_NAME
+    if not pointer.exists():
+        raise FileNotFoundError(f"No model artifact found under {root}")
+    return root / pointer.read_text(encoding="utf-8").strip()
+
+
+def load_artifact(
+    artifact_dir: str | Path | None = None,
+    json_path: str | Path | None = None,
+    mmap: bool = True,
+    check_songs: bool = True,
+) -> RecommendationArtifact:
+    """
+    Load the latest artifact under ``artifact_dir``.
+
+    Large arrays are memory-mapped read-only when ``mmap`` is true, so loading
+    is independent of catalogue size. Raises ``StaleArtifactError`` when the
+    artifact was built by an older format or, if ``check_songs`` is true,
+    from a different songs.json.
+    """
+    build_dir = resolve_latest(artifact_dir)
+    manifest_path = build_dir / MANIFEST_NAME
+    if not manifest_path.exists():
+        raise FileNotFoundError(f"Incomplete model artifact at {build_dir}")
+
+    with manifest_path.open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    songs_path = Path(json_path) if json_path is not None else DEFAULT_SONGS_PATH
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise StaleArtifactError(
+            f"Model artifact {manifest.get('build_id')} has format "
+            f"{manifest.get('format_version')}, expected {ARTIFACT_FORMAT_VERSION}; "
+            "rebuild it with `python model_artifact.py build`"
+        )
+    if check_songs and not is_artifact_current(manifest, songs_path):
+        raise StaleArtifactError(
+            f"Model artifact {manifest.get('build_id')} does not match {songs_path}; "
+            "rebuild it with `python model_artifact.py build`"
+        )
+
+    # np.asarray drops the np.memmap subclass (whose Python-level __getitem__
+    # is slow on hot paths) while still sharing the mapped buffer.
+    mmap_mode = "r" if mmap else None
+
+    def load(name: str) -> np.ndarray:
+        return np.asarray(
+            np.load(build_dir / f"{name}.npy", mmap_mode=mmap_mode, allow_pickle=False)
+        )
+
+    arrays: dict[str, Any] = {name: load(name) for name in _ARRAY_FILES}
+    for name in _STRING_COLUMNS:
+        arrays[name] = PackedStrings(load(f"{name}_data"), load(f"{name}_offsets"))
+    metadata: dict[str, PackedStrings | np.ndarray] = {}
+    for i, (name, kind) in enumerate(manifest["metadata_columns"].items()):
+        if kind == "str":
+            metadata[name] = PackedStrings(
+                load(f"metadata_{i}_data"), load(f"metadata_{i}_offsets")
+            )
+        else:
+            metadata[name] = load(f"metadata_{i}")
+
+    with np.load(build_dir / _PARAMS_FILE, allow_pickle=False) as params:
+        small = {key: params[key] for key in params.files}
+
+    return RecommendationArtifact(
+        path=build_dir,
+        manifest=manifest,
+        genre_vocab=list(manifest["genre_vocab"]),
+        metadata=metadata,
+        **arrays,
+        **small,
+    )
+
+
+# ── Command line ──────────────────────────────────────────────────────────────
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Build or inspect the persisted recommendation model artifact."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="Fit models and write an artifact")
+    build_parser.add_argument("--songs", default=None, help="Path to songs.json")
+    build_parser.add_argument("--out", default=None, help="Artifact root directory")
+    build_parser.add_argument(
+        "--clusters", type=int, default=CLUSTERS, help="Cluster count (0: choose)"
+    )
+
+    refit_parser = subparsers.add_parser(
+        "refit", help="Refit the latest artifact, keeping incrementally added tracks"
+    )
+    refit_parser.add_argument("--songs", default=None, help="Path to songs.json")
+    refit_parser.add_argument("--out", default=None, help="Artifact root directory")
+    refit_parser.add_argument(
+        "--clusters", type=int, default=CLUSTERS, help="Cluster count (0: choose)"
+    )
+
+    info_parser = subparsers.add_parser("info", help="Show the latest artifact manifest")
+    info_parser.add_argument("--out", default=None, help="Artifact root directory")
+
+    prune_parser = subparsers.add_parser(
+        "prune", help="Delete superseded builds (also done after every write)"
+    )
+    prune_parser.add_argument("--out", default=None, help="Artifact root directory")
+    prune_parser.add_argument(
+        "--keep", type=int, default=ARTIFACT_KEEP, help="Newest builds to keep"
+    )
+    prune_parser.add_argument(
+        "--grace", type=float, default=ARTIFACT_GRACE, help="Keep builds this recent (s)"
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        build_dir = build_artifact(args.songs, args.out, args.clusters)
+        print(f"Wrote model artifact to {build_dir}")
+    elif args.command == "refit":
+        artifact = load_artifact(args.out, args.songs, mmap=False)
+        build_dir = refit_artifact(artifact, n_clusters=args.clusters)
+        print(f"Wrote model artifact to {build_dir}")
+    elif args.command == "prune":
+        root = Path(args.out) if args.out is not None else DEFAULT_ARTIFACT_DIR
+        for name in prune_builds(root, args.keep, args.grace):
+            print(f"Deleted {root / name}")
+    else:
+        with (resolve_latest(args.out) / MANIFEST_NAME).open("r", encoding="utf-8") as f:
+            print(f.read())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Mapping, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from scipy.spatial import cKDTree
+
+
+# Same classes, in the same order, as the facial emotion service's
+# EMOTION_CLASSES, so its probability vector can be passed through as is.
+EMOTION_CLASSES = ("angry", "disgust", "fear", "happy", "neutral", "sad", "surprise")
+
+# Where music matching each emotion sits in audio-feature space, in raw
+# audio_feature units (valence and energy 0..1, tempo in BPM). The values
+# follow the valence / arousal circumplex: e.g. sad is low valence, low
+# energy and slow; angry is low valence, high energy and fast.
+EMOTION_TARGETS: dict[str, dict[str, float]] = {
+    "angry": {"valence": 0.25, "energy": 0.90, "tempo": 140.0},
+    "disgust": {"valence": 0.25, "energy": 0.60, "tempo": 115.0},
+    "fear": {"valence": 0.20, "energy": 0.65, "tempo": 120.0},
+    "happy": {"valence": 0.85, "energy": 0.75, "tempo": 125.0},
+    "neutral": {"valence": 0.50, "energy": 0.50, "tempo": 110.0},
+    "sad": {"valence": 0.20, "energy": 0.25, "tempo": 80.0},
+    "surprise": {"valence": 0.70, "energy": 0.80, "tempo": 130.0},
+}
+MOOD_FEATURES = ("valence", "energy", "tempo")
+
+
+def emotion_weights(probabilities: Mapping[str, float] | Sequence[float]) -> np.ndarray:
+    """
+    Normalize emotion probabilities, given by class name or as a vector in
+    ``EMOTION_CLASSES`` order, to weights summing to one.
+
+    Raises ValueError for unknown classes, a wrong length, negative values
+    or an all-zero input.
+    """
+    if isinstance(probabilities, Mapping):
+        unknown = set(probabilities) - set(EMOTION_CLASSES)
+        if unknown:
+            raise ValueError(f"Unknown emotion classes: {sorted(unknown)}")
+        values = [float(probabilities.get(label, 0.0)) for label in EMOTION_CLASSES]
+    else:
+        values = [float(p) for p in probabilities]
+        if len(values) != len(EMOTION_CLASSES):
+            raise ValueError(
+                f"Expected {len(EMOTION_CLASSES)} probabilities "
+                f"({', '.join(EMOTION_CLASSES)}), got {len(values)}"
+            )
+
+    weights = np.asarray(values, dtype=np.float64)
+    if not np.isfinite(weights).all() or (weights < 0).any():
+        raise ValueError("Emotion probabilities must be finite and non-negative")
+    total = weights.sum()
+    if total <= 0:
+        raise ValueError("Emotion probabilities must not all be zero")
+    return weights / total
+
+
+@dataclass(frozen=True)
+class MoodTable:
+    """
+    The per-emotion targets of ``EMOTION_TARGETS`` in a snapshot's scaled
+    feature space, plus every track's mood features as one contiguous
+    ``(n_tracks, n_dims)`` block, so scoring touches a few bytes per track,
+    and a KD-tree over them for catalogue-wide searches (with only three
+    dimensions it finds the nearest tracks exactly in microseconds).
+
+    Distances are in standard deviations of the catalogue, so each mood
+    feature counts equally whatever its raw unit.
+    """
+
+    columns: tuple[str, ...]
+    targets: np.ndarray
+    features: np.ndarray
+    tree: cKDTree
+
+    def target(self, weights: np.ndarray) -> np.ndarray:
+        """
+        The mood target of an emotion mix: the probability-weighted average
+        of the per-emotion targets.
+        """
+        return weights @ self.targets
+
+    def _score(self, squared_distance: np.ndarray) -> np.ndarray:
+        return np.exp(-0.5 * squared_distance / len(self.columns))
+
+    def scores(self, positions: np.ndarray, target: np.ndarray) -> np.ndarray:
+        """
+        How well the tracks at ``positions`` match ``target``: 1 on it,
+        falling off with the (RMS, in standard deviations) distance.
+        """
+        diff = self.features[positions] - target.astype(np.float32)
+        return self._score(np.einsum("ij,ij->i", diff, diff))
+
+    def nearest(self, target: np.ndarray, n: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The positions and scores of the ``n`` tracks best matching ``target``
+        over the whole catalogue, best first.
+        """
+        k = min(n, len(self.features))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        distances, positions = self.tree.query(target, k=[*range(1, k + 1)])
+        return positions.astype(np.int64), self._score(distances**2)
+
+
+def build_mood_table(artifact: Any) -> MoodTable | None:
+    """
+    Precompute the mood table of a ``RecommendationArtifact``, or return None
+    if its catalogue has none of the ``MOOD_FEATURES``.
+    """
+    feature_cols = artifact.manifest["feature_columns"]
+    dims = [
+        i
+        for i, col in enumerate(feature_cols)
+        if col.removeprefix("audio_feature.") in MOOD_FEATURES
+    ]
+    if not dims:
+        return None
+
+    # scipy.spatial takes a few hundred milliseconds to import, so the API
+    # (which only needs EMOTION_CLASSES and emotion_weights) does not pay for
+    # it before a snapshot is published.
+    from scipy.spatial import cKDTree
+
+    columns = tuple(feature_cols[i].removeprefix("audio_feature.") for i in dims)
+    raw = np.array(
+        [[EMOTION_TARGETS[label][col] for col in columns] for label in EMOTION_CLASSES]
+    )
+    targets = (raw - artifact.scaler_mean[dims]) / artifact.scaler_scale[dims]
+    features = np.ascontiguousarray(artifact.features[:, dims], dtype=np.float32)
+    return MoodTable(
+        columns=columns,
+        targets=targets,
+        features=features,
+        # An unbalanced tree builds in about half the time and queries as fast.
+        tree=cKDTree(features, balanced_tree=False, compact_nodes=False),
+    )
@@ -1,331 +1,1189 @@
 from __future__ import annotations
 
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Iterable, List
+from typing import Any, Callable, Iterable, List, Mapping, Sequence
 
 import numpy as np
-import pandas as pd
-from sklearn.cluster import KMeans
-from sklearn.impute import SimpleImputer
-from sklearn.neighbors import NearestNeighbors
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import StandardScaler
-
-from data_utils import (
+
+import shared_path  # noqa: F401  (before service_common)
+from clustering import CLUSTERS
+from knn_index import NeighborIndex, build_index, l2_normalize
+from model_artifact import (
     BASE_DIR,
-    load_songs,
-    one_hot_encode_genres,
-    set_track_index,
-    validate_and_clean_data,
-    songs_to_dataframe,
+    DEFAULT_ARTIFACT_DIR,
+    DEFAULT_SONGS_PATH,
+    LATEST_POINTER_NAME,
+    RecommendationArtifact,
+    StaleArtifactError,
+    build_artifact,
+    load_artifact,
+    normalize_title,
+    refit_artifact,
+    update_artifact,
 )
+from mood import MoodTable, build_mood_table, emotion_weights
+from result_cache import RedisResultStore, ResultCache
+from service_common.metrics import set_gauge, stage
 
 
-# ── Model preparation on import ────────────────────────────────────────────────
+logger = logging.getLogger(__name__)
 
-_DATA: pd.DataFrame | None = None
-_X_SCALED: np.ndarray | None = None
-_KNN_MODEL: NearestNeighbors | None = None
 
+# ── Model snapshots ───────────────────────────────────────────────────────────
 
-def _prepare_models() -> None:
+# What to do when the persisted artifact is missing or was built from a
+# different songs.json: "rebuild" refits in the background, "refuse" raises.
+ARTIFACT_POLICY = os.environ.get("RECOMMENDER_ARTIFACT_POLICY", "rebuild")
+
+# Neighbor index backend: "exact" (default) or "ivf" (approximate, for very
+# large catalogues; recall is tuned with the probe count and cell size).
+INDEX_BACKEND = os.environ.get("RECOMMENDER_INDEX_BACKEND", "exact")
+IVF_NPROBE = int(os.environ.get("RECOMMENDER_IVF_NPROBE", "4"))
+IVF_CELL_SIZE = int(os.environ.get("RECOMMENDER_IVF_CELL_SIZE", "1024"))
+
+# Incremental catalogue updates schedule a full refit once the catalogue has
+# drifted past either threshold: the share of rows added / removed since the
+# last fit, or the RMS shift of the scaled feature means (0 right after a fit).
+REFIT_CHANGED_FRACTION = float(
+    os.environ.get("RECOMMENDER_REFIT_CHANGED_FRACTION", "0.2")
+)
+REFIT_MEAN_SHIFT = float(os.environ.get("RECOMMENDER_REFIT_MEAN_SHIFT", "0.25"))
+
+# Seconds between checks of songs.json and the artifact's LATEST pointer;
+# 0 disables the watcher.
+WATCH_INTERVAL = float(os.environ.get("RECOMMENDER_WATCH_INTERVAL", "5"))
+
+# Recent results are cached per (model version, seed, n): at most
+# CACHE_SIZE of them (0 disables), each for CACHE_TTL seconds (0: until
+# evicted or the model changes). With a redis:// CACHE_URL, worker
+# processes also share their results, which Redis keeps for at most a day
+# (see RedisResultStore.max_ttl).
+CACHE_SIZE = int(os.environ.get("RECOMMENDER_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.environ.get("RECOMMENDER_CACHE_TTL", "3600"))
+CACHE_URL = os.environ.get("RECOMMENDER_CACHE_URL")
+
+# Track IDs, most played first, one per line. Whenever a model snapshot is
+# loaded, the first CACHE_WARM_COUNT of them get their top CACHE_WARM_N
+# recommendations computed into the cache in the background.
+CACHE_WARM_PATH = Path(
+    os.environ.get("RECOMMENDER_CACHE_WARM_PATH", BASE_DIR / "popular_tracks.txt")
+)
+CACHE_WARM_COUNT = int(os.environ.get("RECOMMENDER_CACHE_WARM_COUNT", "1000"))
+CACHE_WARM_N = int(os.environ.get("RECOMMENDER_CACHE_WARM_N", "5"))
+
+# Emotion-conditioned recommendations with a seed rerank this many of the
+# seed's nearest neighbors by how well they fit the mood.
+MOOD_CANDIDATES = int(os.environ.get("RECOMMENDER_MOOD_CANDIDATES", "200"))
+
+# A per-artist cap or a diversity weight reranks the best RERANK_POOL (at
+# least 4 * n) candidates, widening the pool only when it cannot fill n.
+RERANK_POOL = int(os.environ.get("RECOMMENDER_RERANK_POOL", "100"))
+
+
+@dataclass(frozen=True)
+class ModelSnapshot:
     """
-    Build the full recommendation pipeline:
-    - Load songs
-    - Build DataFrame
-    - One-hot encode genres
-    - Validate / clean
-    - Select numerical audio features
-    - Cluster with KMeans
-    - Scale features
-    - Train KNN model
+    The artifact and the neighbor index built over it, served together, with
+    the mood table precomputed from it (None if the catalogue has no mood
+    features).
 
-    This closely mirrors the logic in the original notebook but is organized
-    for reuse from backend / API code.
+    Snapshots are immutable and replaced as a whole, so a request that took a
+    snapshot at its start keeps using it to the end even if a rebuild swaps in
+    a new one meanwhile.
     """
-    global _DATA, _X_SCALED, _KNN_MODEL
 
-    if _DATA is not None and _X_SCALED is not None and _KNN_MODEL is not None:
-        return
+    artifact: RecommendationArtifact
+    index: NeighborIndex
+    mood: MoodTable | None
+    loaded_at: str
 
-    # Load and normalize raw songs data
-    songs = load_songs()  # defaults to songs.json next to this file
-    data = songs_to_dataframe(songs)
+    @property
+    def version(self) -> str:
+        return self.artifact.build_id
 
-    # One-hot encode genres and set index
-    data = one_hot_encode_genres(data)
-    data = set_track_index(data)
 
-    # Validation / cleaning (drop irrelevant cols, numeric enforcement, dedup)
-    data = validate_and_clean_data(data)
+_SNAPSHOT: ModelSnapshot | None = None
+_READY = threading.Event()
+_LOAD_ERROR: BaseException | None = None
+# The artifact the last full rebuild in this process wrote.
+_LAST_BUILD: dict[str, str] | None = None
 
-    # Feature selection (numerical audio_feature.* columns only)
-    exclude_cols = ["artist", "title", "genre", "cluster", "_id", "s3_url"]
-    genre_cols = [col for col in data.columns if col.startswith("genre_")]
-    exclude_cols.extend(genre_cols)
+# Set once ``_prepare_models`` has run (successfully or not), so the first
+# load happens once per process whoever triggers it.
+_PREPARE_LOCK = threading.Lock()
+_PREPARED = False
 
-    all_numeric = data.select_dtypes(include=[np.number])
-    feature_cols = [col for col in all_numeric.columns if col not in exclude_cols]
-    X = all_numeric[feature_cols]
+# Serializes artifact writes (builds, updates, refits) within this process.
+_UPDATE_LOCK = threading.Lock()
+_BACKGROUND_LOCK = threading.Lock()
+_BACKGROUND: threading.Thread | None = None
+_WATCHER: threading.Thread | None = None
 
-    # KMeans clustering
-    cluster_pipeline: Pipeline = Pipeline(
-        [
-            ("imputer", SimpleImputer(strategy="median")),
-            ("scaler", StandardScaler()),
-            ("kmeans", KMeans(n_clusters=40, random_state=42)),
-        ]
+_CACHE = ResultCache(
+    CACHE_SIZE, CACHE_TTL, RedisResultStore(CACHE_URL) if CACHE_URL else None
+)
+
+
+def _publish(artifact: RecommendationArtifact) -> ModelSnapshot:
+    """
+    Build the neighbor index over ``artifact`` and swap in the new snapshot.
+    """
+    global _SNAPSHOT, _LOAD_ERROR
+
+    # Cosine KNN, partitioned by KMeans cluster
+    index = build_index(
+        (artifact.index_positions, artifact.index_offsets, artifact.index_blocks),
+        backend=INDEX_BACKEND,
+        nprobe=IVF_NPROBE,
+        cell_size=IVF_CELL_SIZE,
+    )
+    snapshot = ModelSnapshot(
+        artifact=artifact,
+        index=index,
+        mood=build_mood_table(artifact),
+        loaded_at=datetime.now(timezone.utc).isoformat(),
     )
-    cluster_pipeline.fit(X)
-    data["cluster"] = cluster_pipeline.predict(X)
+    # A single reference assignment, so readers see the old or the new
+    # snapshot, never a mix.
+    _SNAPSHOT = snapshot
+    _LOAD_ERROR = None
+    _READY.set()
+    set_gauge("model_tracks", len(artifact.clusters))
+    set_gauge("model_published_timestamp_seconds", time.time())
+
+    # Results of the previous snapshot can no longer be hit; free them.
+    _CACHE.invalidate(snapshot.version)
+    if CACHE_WARM_COUNT > 0 and CACHE_WARM_PATH.exists():
+        threading.Thread(
+            target=_warm_cache_from_file,
+            args=(snapshot,),
+            name="recommender-cache-warm",
+            daemon=True,
+        ).start()
+    return snapshot
+
+
+def _run_in_background(target: Callable[[], Any], name: str) -> bool:
+    """
+    Run ``target`` on a background thread unless another background job
+    (build, rebuild or refit) is still running. Returns whether it started.
 
-    # Feature scaling for KNN
-    imputer = SimpleImputer(strategy="median")
-    X_imputed = imputer.fit_transform(X)
+    Requests keep being served from the current snapshot meanwhile.
+    """
+    global _BACKGROUND
+
+    def run() -> None:
+        global _LOAD_ERROR
+        try:
+            target()
+        except Exception as exc:
+            _LOAD_ERROR = exc
+            logger.exception("Background %s failed", name)
+        finally:
+            # Wake requests waiting for a first snapshot even on failure.
+            _READY.set()
+
+    with _BACKGROUND_LOCK:
+        if _BACKGROUND is not None and _BACKGROUND.is_alive():
+            return False
+        _BACKGROUND = threading.Thread(target=run, name=name, daemon=True)
+        _BACKGROUND.start()
+    return True
+
+
+def _serving_clusters() -> int:
+    """
+    Cluster count for builds and refits inside a serving worker:
+    RECOMMENDER_CLUSTERS if set, else the live snapshot's count. Choosing it
+    automatically is left to the offline ``model_artifact.py build``; only a
+    worker without any snapshot yet does so, in its own process (0).
+    """
+    snapshot = _SNAPSHOT
+    if CLUSTERS > 0 or snapshot is None:
+        return CLUSTERS
+    return int(snapshot.artifact.manifest["n_clusters"])
+
+
+def _rebuild() -> None:
+    global _LAST_BUILD
+    with _UPDATE_LOCK:
+        start = time.perf_counter()
+        build_dir = build_artifact(
+            n_clusters=_serving_clusters(), cluster_jobs=1
+        )
+        artifact = load_artifact()
+        if artifact.build_id != build_dir.name:
+            logger.warning(
+                "Rebuilt %s but LATEST points to %s", build_dir.name, artifact.build_id
+            )
+        _publish(artifact)
+        set_gauge("model_build_seconds", time.perf_counter() - start)
+        _LAST_BUILD = {
+            "build_id": build_dir.name,
+            "finished_at": datetime.now(timezone.utc).isoformat(),
+        }
 
-    scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X_imputed)
 
-    # Train KNN model
-    knn_model = NearestNeighbors(
-        metric="cosine",
-        algorithm="auto",
-        n_neighbors=50,
-    )
-    knn_model.fit(X_scaled)
+def rebuild_models() -> bool:
+    """
+    Refit the models on songs.json in the background and hot-swap them in.
 
-    _DATA = data
-    _X_SCALED = X_scaled
-    _KNN_MODEL = knn_model
+    Returns False when a background job is already running. Tracks added
+    through ``add_tracks`` but missing from songs.json are not kept, as
+    songs.json is the source of truth for a full rebuild.
+    """
+    return _run_in_background(_rebuild, "recommender-rebuild")
 
 
-def _ensure_ready() -> tuple[pd.DataFrame, np.ndarray, NearestNeighbors]:
+def _reload_latest() -> None:
     """
-    Ensure that the global models / data are prepared and return them.
+    Serve the artifact ``LATEST`` points to if it differs from the live one,
+    e.g. after another worker process updated or rebuilt it.
     """
-    if _DATA is None or _X_SCALED is None or _KNN_MODEL is None:
-        _prepare_models()
-    assert _DATA is not None and _X_SCALED is not None and _KNN_MODEL is not None
-    return _DATA, _X_SCALED, _KNN_MODEL
+    with _UPDATE_LOCK:
+        start = time.perf_counter()
+        artifact = load_artifact()
+        if _SNAPSHOT is None or artifact.build_id != _SNAPSHOT.version:
+            _publish(artifact)
+            set_gauge("model_load_seconds", time.perf_counter() - start)
 
 
-# ── Public recommendation functions ───────────────────────────────────────────
+def _watch(interval: float) -> None:
+    """
+    Poll songs.json and the artifact's ``LATEST`` pointer every ``interval``
+    seconds. A changed songs.json triggers a background rebuild (unless the
+    artifact policy is "refuse"); a moved pointer is picked up directly.
+    """
+    songs_stamp = _stamp(DEFAULT_SONGS_PATH)
+    pointer_stamp = _stamp(DEFAULT_ARTIFACT_DIR / LATEST_POINTER_NAME)
+
+    while True:
+        time.sleep(interval)
+        try:
+            current = _stamp(DEFAULT_SONGS_PATH)
+            if current != songs_stamp:
+                songs_stamp = current
+                try:
+                    _reload_latest()
+                except StaleArtifactError:
+                    if ARTIFACT_POLICY != "refuse":
+                        rebuild_models()
+                continue
+
+            current = _stamp(DEFAULT_ARTIFACT_DIR / LATEST_POINTER_NAME)
+            if current != pointer_stamp:
+                pointer_stamp = current
+                _reload_latest()
+        except Exception:
+            logger.exception("Model watcher check failed")
+
+
+def _stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _start_watcher() -> None:
+    global _WATCHER
+
+    if WATCH_INTERVAL <= 0 or _WATCHER is not None:
+        return
+    _WATCHER = threading.Thread(
+        target=_watch, args=(WATCH_INTERVAL,), name="recommender-watch", daemon=True
+    )
+    _WATCHER.start()
 
-def recommend_songs(song_title: str, n: int = 5) -> pd.DataFrame:
+
+def _prepare_models() -> None:
+    """
+    Load the recommendation models from the persisted artifact.
+
+    The expensive steps (loading songs, one-hot encoding genres, cleaning,
+    KMeans clustering and feature scaling) run offline in
+    ``python model_artifact.py build``. Here the artifact is memory-mapped
+    and the neighbor index is built over its per-cluster feature blocks.
+    Features, metadata and the title / track_id lookup tables all stay in
+    the read-only mapped arrays, so every worker process serving the same
+    artifact shares one copy of them through the page cache.
+
+    If the artifact is stale it keeps being served while a fresh one is
+    built in the background; if it is missing, the build runs in the
+    background and requests wait for it. With
+    ``RECOMMENDER_ARTIFACT_POLICY=refuse`` both cases raise instead, and
+    neither pandas nor scikit-learn is ever imported.
+
+    Runs once per process: later calls return at once.
+    """
+    global _LOAD_ERROR, _PREPARED
+
+    with _PREPARE_LOCK:
+        if _PREPARED:
+            return
+        try:
+            _load_or_build()
+        except Exception as exc:
+            _LOAD_ERROR = exc
+            _READY.set()
+            raise
+        finally:
+            _PREPARED = True
+            # Also after a failure: an artifact published later is picked up.
+            _start_watcher()
+
+
+def _load_or_build() -> None:
+    try:
+        start = time.perf_counter()
+        _publish(load_artifact())
+        set_gauge("model_load_seconds", time.perf_counter() - start)
+    except FileNotFoundError:
+        if ARTIFACT_POLICY == "refuse":
+            raise
+        rebuild_models()
+    except StaleArtifactError:
+        if ARTIFACT_POLICY == "refuse":
+            raise
+        try:
+            _publish(load_artifact(check_songs=False))
+        except StaleArtifactError:
+            pass  # Built by an older format: nothing usable to serve meanwhile.
+        rebuild_models()
+
+
+def load_models_in_background() -> None:
+    """
+    Start loading the models on a background thread and return at once, so
+    a worker can accept connections (and answer its readiness probe) while
+    they load. ``model_status`` reports when the first snapshot is live.
     """
-    Recommend songs based on a given song title using KNN within the same cluster.
 
-    Returns a DataFrame containing:
-    - $oid: MongoDB ObjectId (if present)
-    - title
-    - artist
-    - genre
-    - similarity_score
+    def run() -> None:
+        try:
+            _prepare_models()
+        except Exception:
+            logger.exception("Loading the recommendation models failed")
+
+    threading.Thread(target=run, name="recommender-load", daemon=True).start()
+
+
+def _ensure_ready() -> ModelSnapshot:
     """
-    data, X_scaled, knn_model = _ensure_ready()
+    Return the live model snapshot, loading or waiting for the first one if
+    necessary.
+
+    Callers should take the snapshot once per request and pass it along.
+    """
+    snapshot = _SNAPSHOT
+    if snapshot is None:
+        _prepare_models()
+        _READY.wait()
+        snapshot = _SNAPSHOT
+    if snapshot is None:
+        raise RuntimeError(f"Recommendation models are unavailable: {_LOAD_ERROR}")
+    return snapshot
 
-    song_mask = data["title"].str.lower() == song_title.lower()
-    song_indices = data[song_mask].index.tolist()
 
-    if len(song_indices) == 0:
+def model_status() -> dict[str, Any]:
+    """
+    Describe the live snapshot and whether a background job is running.
+    """
+    snapshot = _SNAPSHOT
+    busy = _BACKGROUND is not None and _BACKGROUND.is_alive()
+    status: dict[str, Any] = {
+        "status": "ok" if snapshot is not None else "loading",
+        "rebuilding": busy,
+    }
+    if snapshot is not None:
+        status["snapshot"] = {
+            "version": snapshot.version,
+            "loaded_at": snapshot.loaded_at,
+            "built_at": snapshot.artifact.manifest.get("built_at"),
+            "n_tracks": len(snapshot.artifact.clusters),
+            "metadata_fields": list(snapshot.artifact.metadata),
+        }
+    if _LAST_BUILD is not None:
+        status["last_build"] = _LAST_BUILD
+    if _LOAD_ERROR is not None:
+        status["last_error"] = str(_LOAD_ERROR)
+    return status
+
+
+def _positions_for_title(
+    artifact: RecommendationArtifact, song_title: str
+) -> list[int]:
+    """
+    Return the row positions of every song with the given title (case-insensitive).
+    """
+    with stage("recommend.lookup"):
+        positions = artifact.positions_for_title(song_title)
+    if not positions:
         raise ValueError(f"Song '{song_title}' not found in the dataset")
+    return positions
 
-    song_idx = song_indices[0]
-    song_cluster = data.loc[song_idx, "cluster"]
-    song_position = data.index.get_loc(song_idx)
 
-    distances, indices = knn_model.kneighbors(
-        X_scaled[song_position : song_position + 1],
-        n_neighbors=min(100, len(X_scaled)),
-    )
+def _position_for_track_id(artifact: RecommendationArtifact, track_id: str) -> int:
+    """
+    Return the row position of the given track_id.
+    """
+    with stage("recommend.lookup"):
+        position = artifact.position_for_track_id(track_id)
+    if position is None:
+        raise ValueError(f"Track ID '{track_id}' not found in the dataset")
+    return position
 
-    neighbor_indices = indices[0]
-    neighbor_distances = distances[0]
 
-    filtered_recommendations: list[dict[str, Any]] = []
-    for idx, dist in zip(neighbor_indices, neighbor_distances):
-        neighbor_track_id = data.index[idx]
+def _same_cluster_neighbors(
+    index: NeighborIndex,
+    query: np.ndarray,
+    cluster: int,
+    exclude: Iterable[int],
+    n: int,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Return the positions and similarity scores of the ``n`` nearest neighbors
+    of ``query`` that belong to ``cluster``, skipping the ``exclude`` positions.
+
+    Only the members of ``cluster`` are scored, so the result is never
+    under-filled: it holds ``min(n, cluster members not excluded)`` items.
+    """
+    with stage("recommend.neighbors"):
+        return index.query(query, cluster, n, exclude)
+
+
+# Keys every response record has; metadata fields never overwrite them.
+_RECORD_KEYS = frozenset(
+    (
+        "$oid",
+        "track_id",
+        "title",
+        "artist",
+        "genre",
+        "similarity_score",
+        "mood_score",
+        "seed_track_id",
+    )
+)
 
-        if neighbor_track_id == song_idx:
-            continue
 
-        if data.loc[neighbor_track_id, "cluster"] == song_cluster:
-            similarity_score = 1 - float(dist)
-            filtered_recommendations.append(
-                {"track_id": neighbor_track_id, "similarity_score": similarity_score}
+def _track_records(
+    artifact: RecommendationArtifact, positions: np.ndarray
+) -> List[dict[str, Any]]:
+    """
+    Gather the records of ``positions`` from the artifact's column arrays.
+    """
+    with stage("recommend.records"):
+        oids = artifact.oids.take(positions)
+        track_ids = artifact.track_ids.take(positions)
+        titles = artifact.titles.take(positions)
+        artists = artifact.artists.take(positions)
+        genres = artifact.genres_for(positions)
+
+        return [
+            {
+                "$oid": oid or None,
+                "track_id": track_id,
+                "title": title or None,
+                "artist": artist or None,
+                "genre": genre,
+            }
+            for oid, track_id, title, artist, genre in zip(
+                oids, track_ids, titles, artists, genres
             )
+        ]
 
-        if len(filtered_recommendations) >= n:
-            break
 
-    if not filtered_recommendations:
-        raise ValueError(f"No songs found in the same cluster as '{song_title}'")
+def _to_records(
+    artifact: RecommendationArtifact, positions: np.ndarray, scores: np.ndarray
+) -> List[dict[str, Any]]:
+    """
+    Gather response records for ``positions``, each with its similarity score.
+    """
+    records = _track_records(artifact, positions)
+    for record, score in zip(records, scores.tolist()):
+        record["similarity_score"] = score
+    return records
+
+
+def _add_fields(
+    artifact: RecommendationArtifact,
+    records: List[dict[str, Any]],
+    positions: np.ndarray,
+    fields: Iterable[str],
+) -> None:
+    """
+    Set the metadata ``fields`` (songs.json columns such as ``s3_url``) on the
+    records of ``positions``, one column gather per field. Tracks without a
+    value, and fields the catalogue does not have, get None.
+    """
+    names = [name for name in dict.fromkeys(fields) if name not in _RECORD_KEYS]
+    if not names:
+        return
+    with stage("recommend.fields"):
+        for name in names:
+            for record, value in zip(records, artifact.metadata_for(name, positions)):
+                record[name] = value
 
-    result_data: list[dict[str, Any]] = []
-    for rec in filtered_recommendations:
-        track_id = rec["track_id"]
-        oid_value = data.loc[track_id, "_id.$oid"] if "_id.$oid" in data.columns else None
-        result_data.append(
-            {
-                "$oid": oid_value,
-                "title": data.loc[track_id, "title"],
-                "artist": data.loc[track_id, "artist"],
-                "genre": data.loc[track_id, "genre"],
-                "similarity_score": rec["similarity_score"],
-            }
-        )
 
-    return pd.DataFrame(result_data)
+def _with_fields(
+    artifact: RecommendationArtifact,
+    records: List[dict[str, Any]],
+    fields: Iterable[str],
+) -> List[dict[str, Any]]:
+    """
+    Add the metadata ``fields`` to (possibly cached) records, finding their
+    rows by track_id, so cached results serve any choice of fields.
+    """
+    fields = list(fields)
+    if fields and records:
+        positions = artifact.positions_for_track_ids(r["track_id"] for r in records)
+        _add_fields(artifact, records, positions, fields)
+    return records
+
+
+def _recommend_for_position(
+    snapshot: ModelSnapshot,
+    song_position: int,
+    n: int,
+    label: str,
+    selection: Selection | None = None,
+) -> List[dict[str, Any]]:
+    """
+    Recommend up to ``n`` songs in the same cluster as the song at ``song_position``.
+
+    ``label`` describes the seed in error messages.
+    """
+    artifact, index = snapshot.artifact, snapshot.index
+    selection = selection or _NO_SELECTION
+    query = artifact.features[song_position]
+    cluster = int(artifact.clusters[song_position])
+    exclude = selection.exclude | {song_position}
+
+    positions, scores = _select(
+        artifact,
+        lambda k: _same_cluster_neighbors(index, query, cluster, exclude, k),
+        n,
+        selection,
+    )
+    if len(positions) == 0:
+        raise ValueError(f"No songs found in the same cluster as {label}")
+
+    return _to_records(artifact, positions, scores)
 
 
-def recommend_by_track_id(track_id: str, n: int = 5) -> pd.DataFrame:
+# ── Result selection ──────────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class Selection:
     """
-    Recommend songs based on track_id, mirroring the notebook's logic.
+    Per-request rules for which candidates make the top ``n``.
+
+    ``exclude`` holds positions never to return (e.g. tracks the listener has
+    already played), ``max_per_artist`` caps the songs by any one artist, and
+    ``diversity`` (0 to 1) is the max-marginal-relevance weight: 0 ranks by
+    score alone, higher values penalize songs similar to those already picked.
     """
-    data, X_scaled, knn_model = _ensure_ready()
 
-    if track_id not in data.index:
-        raise ValueError(f"Track ID '{track_id}' not found in the dataset")
+    exclude: frozenset[int] = frozenset()
+    max_per_artist: int | None = None
+    diversity: float = 0.0
+
+    @property
+    def reranks(self) -> bool:
+        return self.max_per_artist is not None or self.diversity > 0
+
+    @property
+    def is_default(self) -> bool:
+        return not self.exclude and not self.reranks
+
+
+_NO_SELECTION = Selection()
 
-    song_cluster = data.loc[track_id, "cluster"]
-    song_position = data.index.get_loc(track_id)
 
-    distances, indices = knn_model.kneighbors(
-        X_scaled[song_position : song_position + 1],
-        n_neighbors=min(100, len(X_scaled)),
+def _selection(
+    artifact: RecommendationArtifact,
+    exclude_track_ids: Iterable[str],
+    max_per_artist: int | None,
+    diversity: float,
+) -> Selection:
+    """
+    Validate the selection parameters of a request. Unknown excluded
+    track_ids are ignored: they can never be recommended anyway.
+    """
+    if max_per_artist is not None and max_per_artist < 1:
+        raise ValueError("max_per_artist must be at least 1")
+    if not 0.0 <= diversity <= 1.0:
+        raise ValueError("diversity must be between 0 and 1")
+    positions = artifact.positions_for_track_ids(exclude_track_ids)
+    return Selection(
+        exclude=frozenset(positions[positions >= 0].tolist()),
+        max_per_artist=max_per_artist,
+        diversity=diversity,
     )
 
-    neighbor_indices = indices[0]
-    neighbor_distances = distances[0]
 
-    filtered_recommendations: list[dict[str, Any]] = []
-    for idx, dist in zip(neighbor_indices, neighbor_distances):
-        neighbor_track_id = data.index[idx]
+def _artist_codes(
+    artifact: RecommendationArtifact, positions: np.ndarray
+) -> np.ndarray:
+    """
+    An integer label per artist of ``positions``. Songs without an artist
+    each get a label of their own, so the per-artist cap never groups them.
+    """
+    labels: dict[Any, int] = {}
+    return np.fromiter(
+        (
+            labels.setdefault(artist or (None, i), len(labels))
+            for i, artist in enumerate(artifact.artists.take(positions))
+        ),
+        dtype=np.int64,
+        count=len(positions),
+    )
 
-        if neighbor_track_id == track_id:
-            continue
 
-        if data.loc[neighbor_track_id, "cluster"] == song_cluster:
-            similarity_score = 1 - float(dist)
-            filtered_recommendations.append(
-                {"track_id": neighbor_track_id, "similarity_score": similarity_score}
-            )
+def _rerank(
+    artifact: RecommendationArtifact,
+    positions: np.ndarray,
+    scores: np.ndarray,
+    n: int,
+    selection: Selection,
+) -> np.ndarray:
+    """
+    Pick up to ``n`` of the candidates (``positions``, best first) under the
+    per-artist cap and the diversity weight; returns indices into
+    ``positions`` in the order picked.
+    """
+    cap = selection.max_per_artist
+    codes = _artist_codes(artifact, positions) if cap is not None else None
+
+    if selection.diversity <= 0:
+        # Candidates come best first, so the cap keeps each artist's first
+        # ``cap`` songs: rank every song within its artist and filter.
+        order = np.argsort(codes, kind="stable")
+        grouped = codes[order]
+        starts = np.r_[True, grouped[1:] != grouped[:-1]]
+        first = np.maximum.accumulate(np.where(starts, np.arange(len(order)), 0))
+        rank = np.empty(len(order), dtype=np.int64)
+        rank[order] = np.arange(len(order)) - first
+        return np.flatnonzero(rank < cap)[:n]
+
+    # Greedy max-marginal relevance: each pick maximizes
+    # (1 - diversity) * score - diversity * (max cosine to the songs picked).
+    # Rows are scaled by sqrt(diversity) so ``unit @ unit[pick]`` is already
+    # the weighted cosine; picked or capped candidates are held at -inf.
+    unit = selection.diversity**0.5 * l2_normalize(artifact.features[positions])
+    value = (1.0 - selection.diversity) * scores.astype(np.float64)
+    redundancy = np.zeros(len(positions))
+    per_artist = np.zeros(len(positions), dtype=np.int64)
+    chosen: list[int] = []
+    while len(chosen) < min(n, len(positions)):
+        pick = int(np.argmax(value - redundancy))
+        if value[pick] == -np.inf:
+            break
+        chosen.append(pick)
+        value[pick] = -np.inf
+        if codes is not None:
+            per_artist[codes[pick]] += 1
+            if per_artist[codes[pick]] >= cap:
+                value[codes == codes[pick]] = -np.inf
+        np.maximum(redundancy, unit @ unit[pick], out=redundancy)
+    return np.asarray(chosen, dtype=np.int64)
+
+
+def _select(
+    artifact: RecommendationArtifact,
+    candidates: Callable[[int], tuple[np.ndarray, np.ndarray]],
+    n: int,
+    selection: Selection,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The top ``n`` positions and scores under ``selection``.
+
+    ``candidates(k)`` returns at least the ``k`` best candidates (fewer only
+    once none are left), best first and without the excluded positions. The
+    cap and diversity need more than ``n`` of them: the pool starts at
+    ``RERANK_POOL`` and grows fourfold until ``n`` songs qualify, so the call
+    returns exactly ``n`` whenever the cluster holds that many eligible songs.
+    """
+    if not selection.reranks:
+        positions, scores = candidates(n)
+        return positions[:n], scores[:n]
+
+    k = max(RERANK_POOL, 4 * n)
+    while True:
+        positions, scores = candidates(k)
+        with stage("recommend.rerank"):
+            chosen = _rerank(artifact, positions, scores, n, selection)
+        if len(chosen) >= n or len(positions) < k:
+            return positions[chosen], scores[chosen]
+        k *= 4
+
+
+# ── Result cache ──────────────────────────────────────────────────────────────
+
+def _cached(
+    key: tuple, compute: Callable[[], List[dict[str, Any]]]
+) -> List[dict[str, Any]]:
+    """
+    Return the cached records for ``key``, computing and caching them on a miss.
+
+    Keys start with the snapshot version, so a rebuilt model never serves
+    results of the one before it. Errors (unknown seeds) are not cached.
+    """
+    with stage("recommend.cache"):
+        records = _CACHE.get(key)
+    if records is None:
+        records = compute()
+        with stage("recommend.cache"):
+            _CACHE.put(key, records)
+    return records
+
+
+def _track_key(snapshot: ModelSnapshot, track_id: str, n: int) -> tuple:
+    return (snapshot.version, "track", track_id, n)
+
 
-        if len(filtered_recommendations) >= n:
+def _warm_cache(snapshot: ModelSnapshot, track_ids: List[str], n: int) -> int:
+    """
+    Compute recommendations for ``track_ids`` into the cache, in chunks so a
+    newer snapshot swapped in meanwhile stops the work early. Returns how
+    many seeds were cached.
+    """
+    warmed = 0
+    for start in range(0, len(track_ids), 256):
+        if _SNAPSHOT is not snapshot:
             break
+        results = _recommend_batch(snapshot, track_ids[start : start + 256], n)
+        warmed += sum("items" in result for result in results)
+    return warmed
+
+
+def _warm_cache_from_file(snapshot: ModelSnapshot) -> None:
+    try:
+        with CACHE_WARM_PATH.open("r", encoding="utf-8") as f:
+            track_ids = [line.strip() for line in f if line.strip()]
+        start = time.perf_counter()
+        warmed = _warm_cache(snapshot, track_ids[:CACHE_WARM_COUNT], CACHE_WARM_N)
+        logger.info(
+            "Cached recommendations for %d popular tracks in %.2fs",
+            warmed,
+            time.perf_counter() - start,
+        )
+    except Exception:
+        logger.exception("Warming the recommendation cache failed")
 
-    if not filtered_recommendations:
-        raise ValueError(
-            f"No songs found in the same cluster as track ID '{track_id}'"
+
+def warm_cache(track_ids: Iterable[str], n: int = 5) -> int:
+    """
+    Precompute the top-``n`` recommendations of ``track_ids`` (e.g. the most
+    played tracks) into the cache. Returns how many seeds were cached.
+    """
+    return _warm_cache(_ensure_ready(), list(track_ids), n)
+
+
+def cache_stats() -> dict[str, Any]:
+    """
+    Hit, miss, eviction and expiry counters of the result cache.
+    """
+    return _CACHE.stats()
+
+
+# ── Public recommendation functions ───────────────────────────────────────────
+
+def recommend_songs(
+    song_title: str,
+    n: int = 5,
+    all_matches: bool = False,
+    exclude_track_ids: Iterable[str] = (),
+    max_per_artist: int | None = None,
+    diversity: float = 0.0,
+    fields: Iterable[str] = (),
+) -> List[dict[str, Any]]:
+    """
+    Recommend songs based on a given song title using KNN within the same cluster.
+
+    When several songs share the title only the first one is used as the seed,
+    unless ``all_matches`` is true: then every matching song is used and each
+    result record carries the ``seed_track_id`` it was recommended for.
+
+    ``exclude_track_ids`` are never recommended, at most ``max_per_artist``
+    songs by one artist are, and ``diversity`` (0 to 1) trades similarity to
+    the seed for variety among the results. These are applied while picking
+    the top ``n``, so the result is only short if the cluster runs out.
+
+    Returns a list of JSON-serializable records containing:
+    - $oid: MongoDB ObjectId (if present)
+    - track_id
+    - title
+    - artist
+    - genre
+    - similarity_score
+    - seed_track_id (only with ``all_matches``)
+    - each of ``fields``: other songs.json columns such as s3_url (None if unset)
+    """
+    snapshot = _ensure_ready()
+    artifact = snapshot.artifact
+    selection = _selection(artifact, exclude_track_ids, max_per_artist, diversity)
+    if not selection.is_default:
+        records = _recommend_for_title(
+            snapshot, song_title, n, all_matches, selection
         )
+        return _with_fields(artifact, records, fields)
 
-    result_data: list[dict[str, Any]] = []
-    for rec in filtered_recommendations:
-        rec_track_id = rec["track_id"]
-        oid_value = (
-            data.loc[rec_track_id, "_id.$oid"] if "_id.$oid" in data.columns else None
+    key = (snapshot.version, "title", normalize_title(song_title), n, all_matches)
+    records = _cached(
+        key, lambda: _recommend_for_title(snapshot, song_title, n, all_matches)
+    )
+    return _with_fields(artifact, records, fields)
+
+
+def _recommend_for_title(
+    snapshot: ModelSnapshot,
+    song_title: str,
+    n: int,
+    all_matches: bool,
+    selection: Selection | None = None,
+) -> List[dict[str, Any]]:
+    artifact = snapshot.artifact
+
+    song_positions = _positions_for_title(artifact, song_title)
+    if not all_matches:
+        return _recommend_for_position(
+            snapshot, song_positions[0], n, f"'{song_title}'", selection
         )
-        result_data.append(
-            {
-                "$oid": oid_value,
-                "title": data.loc[rec_track_id, "title"],
-                "artist": data.loc[rec_track_id, "artist"],
-                "genre": data.loc[rec_track_id, "genre"],
-                "similarity_score": rec["similarity_score"],
-            }
+
+    result_data: List[dict[str, Any]] = []
+    for song_position in song_positions:
+        seed_track_id = artifact.track_ids[song_position]
+        for rec in _recommend_for_position(
+            snapshot, song_position, n, f"'{song_title}'", selection
+        ):
+            rec["seed_track_id"] = seed_track_id
+            result_data.append(rec)
+
+    return result_data
+
+
+def recommend_by_track_id(
+    track_id: str,
+    n: int = 5,
+    exclude_track_ids: Iterable[str] = (),
+    max_per_artist: int | None = None,
+    diversity: float = 0.0,
+    fields: Iterable[str] = (),
+) -> List[dict[str, Any]]:
+    """
+    Recommend songs based on track_id, mirroring the notebook's logic.
+
+    The selection parameters and ``fields`` are those of ``recommend_songs``.
+    """
+    snapshot = _ensure_ready()
+    selection = _selection(
+        snapshot.artifact, exclude_track_ids, max_per_artist, diversity
+    )
+
+    def compute() -> List[dict[str, Any]]:
+        song_position = _position_for_track_id(snapshot.artifact, track_id)
+        return _recommend_for_position(
+            snapshot, song_position, n, f"track ID '{track_id}'", selection
         )
 
-    return pd.DataFrame(result_data)
+    if not selection.is_default:
+        records = compute()
+    else:
+        records = _cached(_track_key(snapshot, track_id, n), compute)
+    return _with_fields(snapshot.artifact, records, fields)
 
 
 def recommend_from_multiple_songs(
-    song_titles: Iterable[str], n: int = 5
-) -> pd.DataFrame:
+    song_titles: Iterable[str],
+    n: int = 5,
+    all_matches: bool = False,
+    exclude_track_ids: Iterable[str] = (),
+    max_per_artist: int | None = None,
+    diversity: float = 0.0,
+    fields: Iterable[str] = (),
+) -> List[dict[str, Any]]:
     """
     Recommend songs based on multiple input songs by averaging their feature vectors.
+
+    With ``all_matches`` every song sharing one of the titles contributes to the
+    average, instead of only the first match per title. The selection
+    parameters and ``fields`` are those of ``recommend_songs``.
     """
     titles = list(song_titles)
     if not titles:
         raise ValueError("song_titles list cannot be empty")
 
-    data, X_scaled, knn_model = _ensure_ready()
+    snapshot = _ensure_ready()
+    artifact, index = snapshot.artifact, snapshot.index
+    selection = _selection(artifact, exclude_track_ids, max_per_artist, diversity)
 
     song_positions: list[int] = []
-    song_clusters: list[int] = []
-
     for song_title in titles:
-        song_mask = data["title"].str.lower() == song_title.lower()
-        song_indices = data[song_mask].index.tolist()
-
-        if len(song_indices) == 0:
-            raise ValueError(f"Song '{song_title}' not found in the dataset")
-
-        song_idx = song_indices[0]
-        song_position = data.index.get_loc(song_idx)
-        song_positions.append(song_position)
-        song_clusters.append(int(data.loc[song_idx, "cluster"]))
-
-    from collections import Counter
+        matches = _positions_for_title(artifact, song_title)
+        song_positions.extend(matches if all_matches else matches[:1])
 
-    cluster_counts = Counter(song_clusters)
+    cluster_counts = Counter(artifact.clusters[song_positions].tolist())
     target_cluster = cluster_counts.most_common(1)[0][0]
 
-    feature_vectors = X_scaled[song_positions]
-    averaged_vector = feature_vectors.mean(axis=0).reshape(1, -1)
+    averaged_vector = artifact.features[song_positions].mean(axis=0)
+    exclude = selection.exclude | set(song_positions)
 
-    distances, indices = knn_model.kneighbors(
-        averaged_vector,
-        n_neighbors=min(100, len(X_scaled)),
+    positions, scores = _select(
+        artifact,
+        lambda k: _same_cluster_neighbors(
+            index, averaged_vector, target_cluster, exclude, k
+        ),
+        n,
+        selection,
     )
+    if len(positions) == 0:
+        raise ValueError(
+            f"No songs found in cluster {target_cluster} matching the input songs"
+        )
 
-    input_track_ids = {data.index[pos] for pos in song_positions}
+    records = _to_records(artifact, positions, scores)
+    _add_fields(artifact, records, positions, fields)
+    return records
 
-    filtered_recommendations: list[dict[str, Any]] = []
-    for idx, dist in zip(indices[0], distances[0]):
-        neighbor_track_id = data.index[idx]
 
-        if neighbor_track_id in input_track_ids:
+def recommend_batch(
+    track_ids: Iterable[str], n: int = 5, fields: Iterable[str] = ()
+) -> List[dict[str, Any]]:
+    """
+    Recommend songs for many seed track_ids in one call.
+
+    All valid seeds are scored together (one matrix product per distinct
+    cluster) instead of one neighbor query per seed. Returns one entry per
+    input track_id, in order, holding either ``items`` (as returned by
+    ``recommend_by_track_id``) or an ``error`` message for that seed alone.
+    Seeds cached by earlier calls are not scored again. ``fields`` are those
+    of ``recommend_songs``.
+    """
+    snapshot = _ensure_ready()
+    results = _recommend_batch(snapshot, list(track_ids), n)
+    for result in results:
+        if "items" in result:
+            _with_fields(snapshot.artifact, result["items"], fields)
+    return results
+
+
+def _recommend_batch(
+    snapshot: ModelSnapshot, seeds: List[str], n: int
+) -> List[dict[str, Any]]:
+    artifact, index = snapshot.artifact, snapshot.index
+    results: List[dict[str, Any]] = [{"track_id": track_id} for track_id in seeds]
+
+    valid: list[int] = []
+    positions: list[int] = []
+    for i, track_id in enumerate(seeds):
+        cached = _CACHE.get(_track_key(snapshot, track_id, n))
+        if cached is not None:
+            results[i]["items"] = cached
             continue
+        try:
+            positions.append(_position_for_track_id(artifact, track_id))
+        except ValueError as exc:
+            results[i]["error"] = str(exc)
+        else:
+            valid.append(i)
+
+    if not positions:
+        return results
+
+    seed_positions = np.asarray(positions, dtype=np.int64)
+    with stage("recommend.neighbors_batch"):
+        neighbors = index.query_batch(
+            artifact.features[seed_positions],
+            artifact.clusters[seed_positions],
+            n,
+            exclude=seed_positions,
+        )
 
-        if data.loc[neighbor_track_id, "cluster"] == target_cluster:
-            similarity_score = 1 - float(dist)
-            filtered_recommendations.append(
-                {"track_id": neighbor_track_id, "similarity_score": similarity_score}
+    for i, (rec_positions, scores) in zip(valid, neighbors):
+        if len(rec_positions) == 0:
+            results[i]["error"] = (
+                f"No songs found in the same cluster as track ID '{seeds[i]}'"
+            )
+        else:
+            results[i]["items"] = _to_records(artifact, rec_positions, scores)
+            _CACHE.put(_track_key(snapshot, seeds[i], n), results[i]["items"])
+
+    return results
+
+
+def recommend_by_emotion(
+    probabilities: Mapping[str, float] | Sequence[float],
+    track_id: str | None = None,
+    title: str | None = None,
+    n: int = 5,
+    mood_weight: float = 0.5,
+    exclude_track_ids: Iterable[str] = (),
+    max_per_artist: int | None = None,
+    diversity: float = 0.0,
+    fields: Iterable[str] = (),
+) -> List[dict[str, Any]]:
+    """
+    Recommend songs for a listener's emotion, optionally around a seed song.
+
+    ``probabilities`` is the emotion distribution from the facial emotion
+    service, by class name or in ``mood.EMOTION_CLASSES`` order. It is mapped
+    to a target valence / energy / tempo (the probability-weighted average of
+    the per-emotion targets in ``mood.EMOTION_TARGETS``).
+
+    With a seed (``track_id``, else the first song titled ``title``) its
+    ``MOOD_CANDIDATES`` nearest same-cluster neighbors are reranked by
+    ``(1 - mood_weight) * similarity + mood_weight * mood_score``; without one
+    the whole catalogue is ranked by mood alone. Records are those of
+    ``recommend_songs``, with ``similarity_score`` holding the ranking score
+    and ``mood_score`` (0 to 1) how well the song fits the mood. The
+    selection parameters and ``fields`` are those of ``recommend_songs``.
+    """
+    if not 0.0 <= mood_weight <= 1.0:
+        raise ValueError("mood_weight must be between 0 and 1")
+    weights = emotion_weights(probabilities)
+
+    snapshot = _ensure_ready()
+    artifact, mood = snapshot.artifact, snapshot.mood
+    if mood is None:
+        raise ValueError("The catalogue has no valence, energy or tempo features")
+    target = mood.target(weights)
+    selection = _selection(artifact, exclude_track_ids, max_per_artist, diversity)
+    excluded = np.fromiter(selection.exclude, dtype=np.int64)
+
+    if track_id is None and title is None:
+
+        def candidates(k: int) -> tuple[np.ndarray, np.ndarray]:
+            with stage("recommend.mood_search"):
+                positions, scores = mood.nearest(target, k + len(excluded))
+            keep = ~np.isin(positions, excluded)
+            return positions[keep][:k], scores[keep][:k]
+
+    else:
+        if track_id is not None:
+            seed = _position_for_track_id(artifact, track_id)
+        else:
+            seed = _positions_for_title(artifact, title)[0]
+        exclude = selection.exclude | {seed}
+
+        def candidates(k: int) -> tuple[np.ndarray, np.ndarray]:
+            positions, similarities = _same_cluster_neighbors(
+                snapshot.index,
+                artifact.features[seed],
+                int(artifact.clusters[seed]),
+                exclude,
+                max(k, MOOD_CANDIDATES),
             )
+            with stage("recommend.mood_rerank"):
+                mood_scores = mood.scores(positions, target)
+                blended = (1.0 - mood_weight) * similarities + mood_weight * mood_scores
+                order = np.lexsort((positions, -blended))
+            return positions[order], blended[order]
+
+    positions, scores = _select(artifact, candidates, n, selection)
+    if len(positions) == 0:
+        raise ValueError("No songs found for this emotion")
+
+    records = _to_records(artifact, positions, scores)
+    mood_scores = mood.scores(positions, target)
+    for record, mood_score in zip(records, mood_scores.tolist()):
+        record["mood_score"] = mood_score
+    _add_fields(artifact, records, positions, fields)
+    return records
+
+
+def lookup_tracks(
+    track_ids: Iterable[str], fields: Iterable[str] = ()
+) -> dict[str, Any]:
+    """
+    Resolve many track_ids to their records in one call: one vectorized
+    search of the track_id table and one gather per column.
 
-        if len(filtered_recommendations) >= n:
-            break
+    Returns ``items`` in request order, as in ``recommend_songs`` but without
+    a score, and the ``missing`` track_ids that are not in the catalogue.
+    """
+    artifact = _ensure_ready().artifact
+    track_ids = list(track_ids)
+    positions = artifact.positions_for_track_ids(track_ids)
+    found = positions >= 0
 
-    if not filtered_recommendations:
-        raise ValueError(
-            f"No songs found in cluster {target_cluster} matching the input songs"
-        )
+    records = _track_records(artifact, positions[found])
+    _add_fields(artifact, records, positions[found], fields)
+    missing = [t for t, known in zip(track_ids, found.tolist()) if not known]
+    return {"items": records, "missing": missing}
 
-    result_data: list[dict[str, Any]] = []
-    for rec in filtered_recommendations:
-        track_id = rec["track_id"]
-        oid_value = data.loc[track_id, "_id.$oid"] if "_id.$oid" in data.columns else None
-        result_data.append(
-            {
-                "$oid": oid_value,
-                "title": data.loc[track_id, "title"],
-                "artist": data.loc[track_id, "artist"],
-                "genre": data.loc[track_id, "genre"],
-                "similarity_score": rec["similarity_score"],
-            }
-        )
 
-    return pd.DataFrame(result_data)
+# ── Catalogue updates ─────────────────────────────────────────────────────────
+
+def _needs_refit(manifest: dict[str, Any]) -> bool:
+    stats = manifest.get("incremental", {})
+    return (
+        stats.get("changed_fraction", 0.0) > REFIT_CHANGED_FRACTION
+        or stats.get("mean_shift", 0.0) > REFIT_MEAN_SHIFT
+    )
+
 
+def _refit() -> None:
+    with _UPDATE_LOCK:
+        refit_artifact(
+            load_artifact(), n_clusters=_serving_clusters(), cluster_jobs=1
+        )
+        _publish(load_artifact())
+
+
+def _update_catalogue(
+    add: Iterable[dict[str, Any]] = (), remove: Iterable[str] = ()
+) -> dict[str, Any]:
+    # Wait for the first snapshot outside the lock: its build holds the lock.
+    _ensure_ready()
+    with _UPDATE_LOCK:
+        # Start from the newest artifact on disk rather than the one in memory,
+        # so updates made through other worker processes are not lost.
+        _, summary = update_artifact(load_artifact(), add=add, remove=remove)
+        artifact = _publish(load_artifact()).artifact
+
+    refit_scheduled = _needs_refit(artifact.manifest) and _run_in_background(
+        _refit, "recommender-refit"
+    )
+    return {
+        **summary,
+        "build_id": artifact.build_id,
+        "n_tracks": len(artifact.clusters),
+        "drift": artifact.manifest["incremental"],
+        "refit_scheduled": refit_scheduled,
+    }
 
-def to_response_list(df: pd.DataFrame) -> List[dict[str, Any]]:
+
+def add_tracks(songs: Iterable[dict[str, Any]]) -> dict[str, Any]:
     """
-    Convert a recommendation DataFrame into a list of dictionaries,
-    ready to be serialized as JSON in an API response.
+    Add songs (songs.json record format) to the live catalogue without a refit.
+
+    New tracks are scaled with the fitted statistics and assigned to the
+    nearest existing KMeans cluster; adding a known track_id replaces it. The
+    change is persisted as a new artifact revision. Once the accumulated drift
+    crosses ``REFIT_CHANGED_FRACTION`` or ``REFIT_MEAN_SHIFT`` a full refit is
+    scheduled in the background.
+
+    Returns a summary of the update, including the new ``build_id`` and the
+    ``drift`` statistics.
     """
-    return df.to_dict(orient="records")
+    return _update_catalogue(add=songs)
 
 
-# Prepare models at import so the first API call is fast.
-_prepare_models()
+def remove_tracks(track_ids: Iterable[str]) -> dict[str, Any]:
+    """
+    Remove tracks from the live catalogue without a refit.
 
+    Unknown track_ids are reported under ``missing`` rather than failing the
+    call. Returns the same summary as ``add_tracks``.
+    """
+    return _update_catalogue(remove=track_ids)
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, List
+
+
+logger = logging.getLogger(__name__)
+
+Records = List[dict[str, Any]]
+
+
+class ResultCache:
+    """
+    Bounded LRU of recommendation results with an optional time-to-live.
+
+    Keys carry the model version, so results computed by an older snapshot
+    are never returned for a newer one; ``invalidate`` also drops them to
+    free the memory. An optional ``shared`` backend (see
+    :class:`RedisResultStore`) is consulted on a local miss, so worker
+    processes share each other's results. ``max_entries <= 0`` disables the
+    local tier. Safe to use from several threads.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float = 0.0,
+        shared: RedisResultStore | None = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        # key -> (expires_at, records); expires_at is inf without a TTL.
+        self._entries: "OrderedDict[tuple, tuple[float, Records]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple) -> Records | None:
+        """
+        Return a copy of the cached records for ``key``, or None.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return [dict(record) for record in entry[1]]
+
+        records = self.shared.get(key) if self.shared is not None else None
+        with self._lock:
+            if records is None:
+                self.misses += 1
+                return None
+            self.shared_hits += 1
+        self._store(key, records)
+        return [dict(record) for record in records]
+
+    def put(self, key: tuple, records: Records) -> None:
+        """
+        Cache ``records`` (copied, so callers may go on to modify theirs).
+        """
+        records = [dict(record) for record in records]
+        self._store(key, records)
+        if self.shared is not None:
+            self.shared.put(key, records, self.ttl)
+
+    def _store(self, key: tuple, records: Records) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else float("inf")
+        with self._lock:
+            self._entries[key] = (expires_at, records)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, version: str) -> int:
+        """
+        Drop every local entry not computed by model ``version``; returns how
+        many were dropped. Shared entries expire on their own: every one is
+        written with an expiry, at most ``RedisResultStore.max_ttl``.
+        """
+        with self._lock:
+            stale = [key for key in self._entries if key[0] != version]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits = self.hits + self.shared_hits
+            lookups = hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "shared_backend": self.shared.url if self.shared else None,
+                "shared_errors": self.shared.errors if self.shared else 0,
+            }
+
+
+class RedisResultStore:
+    """
+    Results shared between worker processes through Redis.
+
+    Values are JSON with the cache TTL as Redis expiry, capped at
+    ``max_ttl`` seconds. The cap also applies without a TTL, so results of
+    model versions that are no longer served do not stay in Redis forever.
+    Redis being down never fails a request: errors are logged and count as
+    misses.
+    """
+
+    def __init__(
+        self, url: str, prefix: str = "recommender", max_ttl: float = 86400.0
+    ) -> None:
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError(
+                "RECOMMENDER_CACHE_URL needs the redis package: pip install redis"
+            ) from exc
+        self.url = url
+        self.prefix = prefix
+        self.max_ttl = max_ttl
+        self.errors = 0
+        self._client = redis.Redis.from_url(url, socket_timeout=0.1)
+
+    def _key(self, key: tuple) -> str:
+        return f"{self.prefix}:{json.dumps(key)}"
+
+    def get(self, key: tuple) -> Records | None:
+        try:
+            value = self._client.get(self._key(key))
+        except Exception:
+            self.errors += 1
+            logger.warning("Shared cache read failed", exc_info=True)
+            return None
+        return json.loads(value) if value is not None else None
+
+    def put(self, key: tuple, records: Records, ttl: float) -> None:
+        try:
+            self._client.set(
+                self._key(key),
+                json.dumps(records),
+                ex=max(1, round(min(ttl, self.max_ttl) if ttl > 0 else self.max_ttl)),
+            )
+        except Exception:
+            self.errors += 1
+            logger.warning("Shared cache write failed", exc_info=True)
@@ -0,0 +1,13 @@
+"""
+Make the ``service_common`` package next to this service importable: import
+this module before ``service_common`` when the service runs from its own
+directory.
+"""
+import sys
+from pathlib import Path
+
+
+_ROOT_DIR = str(Path(__file__).resolve().parent.parent)
+if _ROOT_DIR not in sys.path:
+    # Appended, so the service's own modules still win any name clash.
+    sys.path.append(_ROOT_DIR)
@@ -0,0 +1,25 @@
+"""
+Benchmarks for the Emotion Detection AI services.
+
+Run from the ``Emotion Detection AI Models`` directory, e.g.::
+
+    python -m benchmarks.bench_recommend --rows 20000
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+MUSIC_DIR = ROOT_DIR / "Music Recommendation System"
+FACIAL_DIR = ROOT_DIR / "Facial Recognition System"
+
+
+def use_service(service_dir: Path) -> None:
+    """
+    Make a service's flat modules (``api``, ``recommendation``, ...) importable.
+    """
+    path = str(service_dir)
+    if path not in sys.path:
+        sys.path.insert(0, path)
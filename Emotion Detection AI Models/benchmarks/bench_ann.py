@@ -0,0 +1,131 @@
+"""
+Recall@n versus latency of the approximate (IVF) neighbor index against the
+exact cluster-partitioned index, on a synthetic catalogue of several million
+rows::
+
+    python -m benchmarks.bench_ann --rows 3000000 --nprobe 1 2 4 8 16
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from benchmarks import MUSIC_DIR, use_service
+from benchmarks.synthetic import generate_feature_matrix
+
+
+def _cluster(X: np.ndarray, n_clusters: int, seed: int) -> np.ndarray:
+    """
+    Standardize ``X`` in place and assign KMeans labels fitted on a sample.
+    """
+    from sklearn.cluster import KMeans
+
+    X -= X.mean(axis=0)
+    X /= X.std(axis=0)
+    rng = np.random.default_rng(seed)
+    sample = X[rng.choice(len(X), min(len(X), 200_000), replace=False)]
+    kmeans = KMeans(n_clusters=n_clusters, n_init=1, random_state=seed).fit(sample)
+    return kmeans.predict(X).astype(np.int32)
+
+
+def _run_queries(index, X, clusters, seeds, n) -> tuple[List[np.ndarray], dict]:
+    results: List[np.ndarray] = []
+    samples: List[float] = []
+    for seed in seeds:
+        start = time.perf_counter()
+        positions, _ = index.query(X[seed], int(clusters[seed]), n, (int(seed),))
+        samples.append((time.perf_counter() - start) * 1e6)
+        results.append(positions)
+    samples.sort()
+    return results, {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p99_us": samples[min(len(samples) - 1, int(0.99 * len(samples)))],
+    }
+
+
+def run(
+    rows: int, queries: int, n: int, nprobes: List[int], cell_size: int, seed: int
+) -> dict:
+    use_service(MUSIC_DIR)
+    from knn_index import build_index, partition_by_cluster
+
+    X = generate_feature_matrix(rows, seed=seed)
+    clusters = _cluster(X, 40, seed)
+    seeds = np.random.default_rng(seed + 1).choice(rows, queries, replace=False)
+
+    X = X.astype(np.float32)
+    start = time.perf_counter()
+    partition = partition_by_cluster(X, clusters)
+    exact = build_index(partition, backend="exact")
+    exact_build = time.perf_counter() - start
+    truth, exact_latency = _run_queries(exact, X, clusters, seeds, n)
+    del exact
+
+    report = {
+        "rows": rows,
+        "queries": queries,
+        "n": n,
+        "cell_size": cell_size,
+        "exact": {"build_seconds": exact_build, **exact_latency, "recall": 1.0},
+        "ivf": [],
+    }
+
+    start = time.perf_counter()
+    ivf = build_index(partition, backend="ivf", cell_size=cell_size)
+    ivf_build = time.perf_counter() - start
+    for nprobe in nprobes:
+        ivf.nprobe = nprobe
+        found, latency = _run_queries(ivf, X, clusters, seeds, n)
+        hits = sum(len(np.intersect1d(a, b)) for a, b in zip(truth, found))
+        report["ivf"].append(
+            {
+                "nprobe": nprobe,
+                "build_seconds": ivf_build,
+                **latency,
+                "recall": hits / sum(len(t) for t in truth),
+            }
+        )
+    return report
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=3_000_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument(
+        "--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32]
+    )
+    parser.add_argument("--cell-size", type=int, default=1024)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.rows, args.queries, args.n, args.nprobe, args.cell_size, args.seed
+    )
+
+    exact = report["exact"]
+    print(f"rows={report['rows']} queries={report['queries']} n={report['n']} "
+          f"cell_size={report['cell_size']}")
+    print(f"  exact          build={exact['build_seconds']:6.1f}s  "
+          f"mean={exact['mean_us']:8.1f}us  p99={exact['p99_us']:8.1f}us  "
+          "recall=1.000")
+    for r in report["ivf"]:
+        print(f"  ivf nprobe={r['nprobe']:<3} build={r['build_seconds']:6.1f}s  "
+              f"mean={r['mean_us']:8.1f}us  p99={r['p99_us']:8.1f}us  "
+              f"recall={r['recall']:.3f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
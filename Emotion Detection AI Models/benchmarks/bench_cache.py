@@ -0,0 +1,128 @@
+"""
+Effect of the recommendation result cache on skewed traffic.
+
+Seeds are drawn from a Zipf distribution over the catalogue, as popular
+tracks dominate real traffic. Each endpoint is timed with the cache
+disabled, cold, and after warming the most popular tracks::
+
+    python -m benchmarks.bench_cache --rows 100000 --requests 5000
+
+Calls the FastAPI handler functions directly (no HTTP).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+from benchmarks import MUSIC_DIR, use_service
+from benchmarks.bench_recommend import _time_calls
+from benchmarks.synthetic import write_songs_json
+
+
+def zipf_picks(
+    songs: List[dict], requests: int, exponent: float, seed: int
+) -> List[dict]:
+    """
+    ``requests`` songs drawn with probability proportional to ``1 / rank**exponent``.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(songs) + 1) ** exponent
+    ranks = rng.choice(len(songs), size=requests, p=weights / weights.sum())
+    return [songs[i] for i in ranks]
+
+
+def run(
+    songs_path: Path,
+    artifact_dir: Path,
+    requests: int,
+    n: int,
+    exponent: float,
+    warm: int,
+    seed: int,
+) -> dict:
+    os.environ["RECOMMENDER_SONGS_PATH"] = str(songs_path)
+    os.environ["RECOMMENDER_ARTIFACT_DIR"] = str(artifact_dir)
+    os.environ["RECOMMENDER_WATCH_INTERVAL"] = "0"
+    use_service(MUSIC_DIR)
+
+    import api  # noqa: E402
+    import recommendation  # noqa: E402
+
+    recommendation._ensure_ready()
+    cache = recommendation._CACHE
+    size = cache.max_entries
+
+    with songs_path.open("r", encoding="utf-8") as f:
+        songs = [s for s in json.load(f) if s.get("title")]
+    picks = zipf_picks(songs, requests, exponent, seed)
+    by_title = [api.RecommendByTitleRequest(title=s["title"], n=n) for s in picks]
+    by_track = [api.RecommendByTrackIdRequest(track_id=s["track_id"], n=n) for s in picks]
+
+    results: dict = {"rows": len(songs), "requests": requests, "zipf": exponent}
+    for label in ("off", "cold", "warm"):
+        cache.clear()
+        cache.max_entries = 0 if label == "off" else size
+        if label == "warm":
+            start = time.perf_counter()
+            recommendation.warm_cache([s["track_id"] for s in songs[:warm]], n=n)
+            results["warm_seconds"] = time.perf_counter() - start
+        before = cache.stats()
+        results[label] = {
+            "by_track_id": _time_calls(api.api_recommend_by_track_id, by_track),
+            "by_title": _time_calls(api.api_recommend_by_title, by_title),
+        }
+        after = cache.stats()
+        hits = after["hits"] - before["hits"]
+        lookups = hits + after["misses"] - before["misses"]
+        results[label]["hit_rate"] = hits / lookups if lookups else 0.0
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--songs", default=None, help="Use an existing songs.json")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--n", type=int, default=5)
+    parser.add_argument("--zipf", type=float, default=1.1, help="Popularity skew")
+    parser.add_argument("--warm", type=int, default=1000, help="Tracks to precompute")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        songs_path = Path(args.songs) if args.songs else write_songs_json(
+            Path(tmp) / "songs.json", args.rows, seed=args.seed
+        )
+        results = run(
+            songs_path,
+            Path(tmp) / "artifacts",
+            args.requests,
+            args.n,
+            args.zipf,
+            args.warm,
+            args.seed,
+        )
+
+    print(f"rows={results['rows']} requests={results['requests']} "
+          f"zipf={results['zipf']} warm={results['warm_seconds']:.2f}s")
+    for label in ("off", "cold", "warm"):
+        r = results[label]
+        print(f"  cache={label:<5} hit_rate={r['hit_rate']:.2f}  " + "  ".join(
+            f"{name}: mean={r[name]['mean_us']:7.1f}us p50={r[name]['p50_us']:7.1f}us"
+            for name in ("by_track_id", "by_title")
+        ))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
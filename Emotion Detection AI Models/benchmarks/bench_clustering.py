@@ -0,0 +1,112 @@
+"""
+Cost and quality of the clustering stage of the artifact build.
+
+For each catalogue size a fresh subprocess builds the artifact, builds it
+again (a rebuild that can warm-start from the first one) and refits it, then
+scores the clustering it ended up with: inertia per row over the whole
+catalogue, silhouette on a fixed sample, and how many rows a query scans on
+average (each query searches its seed's whole cluster)::
+
+    python -m benchmarks.bench_clustering --rows 100000 1000000
+    python -m benchmarks.bench_clustering --service-dir "/old/Music Recommendation System"
+
+Environment variables such as ``RECOMMENDER_CLUSTERS`` or
+``RECOMMENDER_CLUSTER_JOBS`` pass through to the builds.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, List
+
+from benchmarks import MUSIC_DIR
+from benchmarks.synthetic import write_songs_json
+
+
+# Run inside each subprocess with the music service as working directory.
+_WORKER = r"""
+import json, sys, time
+import numpy as np
+from sklearn.metrics import silhouette_score
+from model_artifact import build_artifact, load_artifact, refit_artifact
+
+songs, out = sys.argv[1], sys.argv[2]
+timings = {}
+for name in ("build_seconds", "rebuild_seconds"):
+    start = time.perf_counter()
+    build_artifact(songs, out)
+    timings[name] = time.perf_counter() - start
+start = time.perf_counter()
+refit_artifact(load_artifact(out, songs, mmap=False))
+timings["refit_seconds"] = time.perf_counter() - start
+
+artifact = load_artifact(out, songs, mmap=False)
+X = artifact.features.astype(np.float64)
+labels = artifact.clusters
+inertia = 0.0
+for i in range(0, len(X), 65536):
+    diff = X[i : i + 65536] - artifact.centroids[labels[i : i + 65536]]
+    inertia += float((diff**2).sum())
+sizes = np.bincount(labels)
+print(json.dumps({
+    "rows": len(X),
+    "n_clusters": int(artifact.manifest["n_clusters"]),
+    **timings,
+    "inertia_per_row": inertia / len(X),
+    "silhouette": float(
+        silhouette_score(X, labels, sample_size=min(5000, len(X)), random_state=0)
+    ),
+    "scanned_rows_per_query": float((sizes**2).sum() / len(X)),
+    "largest_cluster": int(sizes.max()),
+    "clustering": artifact.manifest.get("clustering"),
+}))
+"""
+
+
+def measure(service_dir: Path, rows: int, workdir: Path, seed: int) -> dict[str, Any]:
+    songs_path = write_songs_json(workdir / f"songs_{rows}.json", rows, seed=seed)
+    result = subprocess.run(
+        [sys.executable, "-c", _WORKER, str(songs_path), str(workdir / f"art_{rows}")],
+        cwd=service_dir,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument(
+        "--service-dir",
+        default=str(MUSIC_DIR),
+        help="Music Recommendation System checkout to measure (e.g. an older tree)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            r = measure(Path(args.service_dir), rows, Path(tmp), args.seed)
+            results.append(r)
+            print(f"rows={r['rows']:<8} k={r['n_clusters']:<4} "
+                  f"build={r['build_seconds']:6.2f}s "
+                  f"rebuild={r['rebuild_seconds']:6.2f}s "
+                  f"refit={r['refit_seconds']:6.2f}s  "
+                  f"inertia/row={r['inertia_per_row']:.3f} "
+                  f"silhouette={r['silhouette']:.4f} "
+                  f"scanned/query={r['scanned_rows_per_query']:.0f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
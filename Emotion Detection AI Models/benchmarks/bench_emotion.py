@@ -0,0 +1,163 @@
+"""
+Throughput and latency of /emotion/predict under concurrent load.
+
+Runs closed-loop clients against the inference path in-process (no HTTP):
+each client awaits one prediction, then immediately sends the next. Compares
+the original handler, which called ``model.predict`` directly inside the
+event loop, with the micro-batching path at several batch limits::
+
+    python -m benchmarks.bench_emotion --concurrency 1 8 32 --requests 512
+
+Without ``--weights`` the model from ``model.json`` runs with random weights,
+which is enough for timing. The prediction cache is disabled.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, List
+
+import numpy as np
+
+from benchmarks import FACIAL_DIR, use_service
+
+
+def random_weights(path: Path) -> Path:
+    """
+    Save randomly initialised weights for model.json to ``path``.
+    """
+    from tensorflow.keras.models import model_from_json
+
+    model = model_from_json((FACIAL_DIR / "model.json").read_text(encoding="utf-8"))
+    model.save_weights(str(path))
+    return path
+
+
+def synthetic_images(n: int, size: int = 96, seed: int = 0) -> List[bytes]:
+    """
+    Encode ``n`` random ``size`` x ``size`` grayscale JPEGs.
+    """
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    images = []
+    for _ in range(n):
+        pixels = rng.integers(0, 256, (size, size), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels, mode="L").save(buffer, format="JPEG", quality=90)
+        images.append(buffer.getvalue())
+    return images
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _closed_loop(
+    handler: Callable[[bytes], Awaitable[Any]],
+    images: List[bytes],
+    concurrency: int,
+    requests: int,
+) -> dict[str, float]:
+    latencies: List[float] = []
+    counter = iter(range(requests))
+
+    async def client() -> None:
+        for i in counter:
+            start = time.perf_counter()
+            # Yield once so time spent queued behind a blocking handler counts.
+            await asyncio.sleep(0)
+            await handler(images[i % len(images)])
+            latencies.append((time.perf_counter() - start) * 1e3)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "images_per_second": requests / elapsed,
+        "mean_ms": statistics.fmean(latencies),
+        "p50_ms": _percentile(latencies, 0.50),
+        "p99_ms": _percentile(latencies, 0.99),
+    }
+
+
+def run(
+    concurrency: List[int], requests: int, batch_sizes: List[int], wait_ms: float
+) -> List[dict[str, Any]]:
+    use_service(FACIAL_DIR)
+    import emotion_model_utils as emu  # noqa: E402
+
+    images = synthetic_images(64)
+    model = emu.load_emotion_model()
+
+    async def legacy(image_bytes: bytes) -> Any:
+        # The original handler: a blocking model.predict inside `async def`.
+        return model.predict(emu.preprocess_image_bytes(image_bytes), verbose=0)
+
+    # Warm up both paths so graph tracing is not measured.
+    asyncio.run(legacy(images[0]))
+    emu.get_batcher().close()
+    emu.warm_up_model()
+
+    results = []
+    for clients in concurrency:
+        stats = asyncio.run(_closed_loop(legacy, images, clients, requests))
+        results.append({"mode": "legacy", "concurrency": clients, **stats})
+
+        for batch_size in batch_sizes:
+            emu._BATCHER = emu.InferenceBatcher(
+                emu.predict_probabilities, max_batch_size=batch_size, max_wait_ms=wait_ms
+            )
+            stats = asyncio.run(
+                _closed_loop(emu.predict_emotion_async, images, clients, requests)
+            )
+            batcher = emu._BATCHER.stats()
+            emu._BATCHER.close()
+            results.append(
+                {
+                    "mode": f"batched(max={batch_size})",
+                    "concurrency": clients,
+                    **stats,
+                    "mean_batch_size": batcher["mean_batch_size"],
+                }
+            )
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32])
+    parser.add_argument("--wait-ms", type=float, default=5.0)
+    parser.add_argument("--weights", default=None, help="Real model weights (.h5)")
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        weights = args.weights or random_weights(Path(tmp) / "random.weights.h5")
+        os.environ["EMOTION_MODEL_WEIGHTS_PATH"] = str(weights)
+        # The images repeat, so the prediction cache would answer most of them.
+        os.environ["EMOTION_CACHE_SIZE"] = "0"
+        results = run(args.concurrency, args.requests, args.batch_sizes, args.wait_ms)
+
+    for r in results:
+        batch = f"  batch={r['mean_batch_size']:5.1f}" if "mean_batch_size" in r else ""
+        print(f"{r['mode']:<18} clients={r['concurrency']:<3} "
+              f"{r['images_per_second']:7.1f} img/s  p50={r['p50_ms']:7.1f}ms  "
+              f"p99={r['p99_ms']:7.1f}ms{batch}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
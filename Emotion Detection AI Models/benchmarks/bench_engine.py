@@ -0,0 +1,203 @@
+"""
+Cold start, latency and memory of the emotion inference engines.
+
+Each engine runs in a fresh subprocess that imports ``emotion_model_utils``
+and loads the model (as the API does on start-up), then times single-image
+and batched predictions and reports its peak RSS::
+
+    python -m benchmarks.bench_engine --engines keras numpy tflite-int8 tflite-float16
+
+Without ``--weights`` the model from ``model.json`` runs with random weights,
+which is enough for timing. The NumPy export and the quantized TFLite models
+are produced from the same weights (int8 is calibrated on ``--calibration-dir``,
+or on synthetic images), and their predictions are compared with Keras. For
+accuracy on real faces use ``tflite_engine.py evaluate``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+from benchmarks import FACIAL_DIR
+from benchmarks.bench_emotion import random_weights, synthetic_images
+
+
+# Peak RSS comes from VmHWM: unlike ru_maxrss it is not inherited from the
+# (TensorFlow-importing) parent across exec.
+_WORKER = r"""
+import json, sys, time
+start = time.perf_counter()
+import emotion_model_utils as emu
+emu.load_inference_model()
+loaded = time.perf_counter()
+import numpy as np
+
+rng = np.random.default_rng(0)
+single = rng.random((1, 48, 48, 1), dtype=np.float32)
+batch = rng.random((int(sys.argv[2]), 48, 48, 1), dtype=np.float32)
+
+emu.warm_up_model()
+first = time.perf_counter()
+emu.predict_probabilities(single)
+first = time.perf_counter() - first
+
+latencies = []
+for _ in range(int(sys.argv[1])):
+    t = time.perf_counter()
+    emu.predict_probabilities(single)
+    latencies.append(time.perf_counter() - t)
+latencies.sort()
+
+t = time.perf_counter()
+for _ in range(3):
+    emu.predict_probabilities(batch)
+batch_seconds = (time.perf_counter() - t) / 3
+
+np.save(sys.argv[3], emu.predict_probabilities(batch))
+with open("/proc/self/status") as f:
+    peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM:"))
+print(json.dumps({
+    "import_seconds": loaded - start,
+    "first_predict_ms": first * 1e3,
+    "p50_ms": latencies[len(latencies) // 2] * 1e3,
+    "p99_ms": latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))] * 1e3,
+    "batch_images_per_second": len(batch) / batch_seconds,
+    "peak_rss_mb": peak_kb / 1024,
+    "tensorflow_imported": "tensorflow" in sys.modules,
+}))
+"""
+
+
+def export_numpy(weights: Path, out: Path) -> Path:
+    env = dict(os.environ, EMOTION_MODEL_WEIGHTS_PATH=str(weights))
+    subprocess.run(
+        [sys.executable, "numpy_engine.py", "export", "--out", str(out)],
+        cwd=FACIAL_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+    return out
+
+
+def quantize_tflite(
+    weights: Path, modes: List[str], calibration_dir: Path, out_dir: Path
+) -> None:
+    env = dict(os.environ, EMOTION_MODEL_WEIGHTS_PATH=str(weights))
+    subprocess.run(
+        [sys.executable, "tflite_engine.py", "quantize", "--modes", *modes,
+         "--calibration-dir", str(calibration_dir), "--out-dir", str(out_dir)],
+        cwd=FACIAL_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+    )
+
+
+def synthetic_image_folder(root: Path, per_class: int) -> Path:
+    """
+    Write ``per_class`` random JPEGs for every emotion class under ``root``.
+    """
+    for index, label in enumerate(
+        ["angry", "disgust", "fear", "happy", "neutral", "sad", "surprise"]
+    ):
+        (root / label).mkdir(parents=True, exist_ok=True)
+        for i, image in enumerate(synthetic_images(per_class, seed=index)):
+            (root / label / f"{i}.jpg").write_bytes(image)
+    return root
+
+
+def measure(
+    engine: str, env: dict, requests: int, batch_size: int, preds: Path
+) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _WORKER, str(requests), str(batch_size), str(preds)],
+        cwd=FACIAL_DIR,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return {"engine": engine, **json.loads(out.stdout.strip().splitlines()[-1])}
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=["keras", "numpy", "tflite-int8", "tflite-float16"],
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--weights", default=None, help="Real model weights (.h5)")
+    parser.add_argument(
+        "--calibration-dir",
+        default=None,
+        help="int8 calibration images, one folder per class (default: synthetic)",
+    )
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    import numpy as np
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        weights = Path(args.weights or random_weights(Path(tmp) / "random.weights.h5"))
+        env = dict(
+            os.environ,
+            EMOTION_MODEL_WEIGHTS_PATH=str(weights),
+            EMOTION_NUMPY_MODEL_PATH=str(Path(tmp) / "emotion_model.npz"),
+            TF_CPP_MIN_LOG_LEVEL="3",
+        )
+        if "numpy" in args.engines:
+            export_numpy(weights, Path(env["EMOTION_NUMPY_MODEL_PATH"]))
+        modes = [e.split("-", 1)[1] for e in args.engines if e.startswith("tflite-")]
+        if modes:
+            calibration = Path(args.calibration_dir or synthetic_image_folder(
+                Path(tmp) / "calibration", per_class=20
+            ))
+            quantize_tflite(weights, modes, calibration, Path(tmp))
+
+        outputs = {}
+        for engine in args.engines:
+            # "tflite-<mode>" serves the <mode> model written by quantize_tflite.
+            name, _, mode = engine.partition("-")
+            engine_env = dict(env, EMOTION_ENGINE=name)
+            if mode:
+                model_path = Path(tmp) / f"emotion_model_{mode}.tflite"
+                engine_env["EMOTION_TFLITE_MODEL_PATH"] = str(model_path)
+
+            preds = Path(tmp) / f"{engine}.npy"
+            results.append(
+                measure(engine, engine_env, args.requests, args.batch_size, preds)
+            )
+            outputs[engine] = np.load(preds)
+
+    reference = outputs.get("keras")
+    for r in results:
+        if reference is not None:
+            preds = outputs[r["engine"]]
+            r["max_abs_diff_vs_keras"] = float(np.abs(preds - reference).max())
+            r["top1_agreement_vs_keras"] = float(
+                (preds.argmax(axis=1) == reference.argmax(axis=1)).mean()
+            )
+        print(f"{r['engine']:<14} import+load={r['import_seconds']:5.2f}s  "
+              f"first={r['first_predict_ms']:6.1f}ms  p50={r['p50_ms']:6.1f}ms  "
+              f"p99={r['p99_ms']:6.1f}ms  batch={r['batch_images_per_second']:6.1f} img/s  "
+              f"peak_rss={r['peak_rss_mb']:6.1f}MB  "
+              f"max_diff={r.get('max_abs_diff_vs_keras', 0.0):.1e}  "
+              f"agreement={r.get('top1_agreement_vs_keras', 1.0):.3f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Cost of face detection in /emotion/predict, stage by stage.
+
+Each face detection mode runs in a fresh subprocess (the mode is read at
+import) that drives ``predict_emotion_async`` with closed-loop clients, the
+prediction cache disabled, and reports throughput plus the mean of the
+per-stage ``timings`` the service returns::
+
+    python -m benchmarks.bench_faces --image portrait.jpg --concurrency 1 8
+
+Without ``--image`` a synthetic photo is used; it contains no face, so the
+detector scans the whole frame and falls back to it, which is its worst
+case. Without ``--weights`` the model runs with random weights.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+from benchmarks import FACIAL_DIR
+from benchmarks.bench_emotion import random_weights
+from benchmarks.bench_preprocess import photo_jpeg
+
+
+STAGES = ("decode_ms", "detect_ms", "crop_ms", "inference_ms", "total_ms")
+
+_WORKER = r"""
+import asyncio, json, sys, time
+import emotion_model_utils as emu
+
+image = open(sys.argv[1], "rb").read()
+concurrency, requests = int(sys.argv[2]), int(sys.argv[3])
+
+async def main():
+    await emu.predict_emotion_async(image)  # warm up the batcher and the pool
+    results = []
+    counter = iter(range(requests))
+
+    async def client():
+        for _ in counter:
+            results.append(await emu.predict_emotion_async(image))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    stages = sorted({stage for r in results for stage in r["timings"]})
+    print(json.dumps({
+        "images_per_second": requests / elapsed,
+        "faces": len(results[0].get("faces", [])),
+        **{stage: sum(r["timings"].get(stage, 0.0) for r in results) / len(results)
+           for stage in stages},
+    }))
+
+asyncio.run(main())
+"""
+
+
+def measure(mode: str, env: dict, image: Path, concurrency: int, requests: int) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _WORKER, str(image), str(concurrency), str(requests)],
+        cwd=FACIAL_DIR,
+        env=dict(env, EMOTION_FACE_DETECTION=mode),
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    return {"mode": mode, "concurrency": concurrency, **result}
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", nargs="+", default=["off", "dominant", "all"])
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--image", default=None, help="A photo with faces")
+    parser.add_argument("--size", default="1280x720", help="Synthetic photo size")
+    parser.add_argument("--workers", type=int, default=None, help="Detection processes")
+    parser.add_argument("--weights", default=None, help="Real model weights (.h5)")
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        image = Path(args.image) if args.image else Path(tmp) / "photo.jpg"
+        if not args.image:
+            width, height = (int(v) for v in args.size.lower().split("x"))
+            image.write_bytes(photo_jpeg(width, height))
+        weights = args.weights or random_weights(Path(tmp) / "random.weights.h5")
+        env = dict(
+            os.environ,
+            EMOTION_MODEL_WEIGHTS_PATH=str(weights),
+            EMOTION_CACHE_SIZE="0",
+            TF_CPP_MIN_LOG_LEVEL="3",
+        )
+        if args.workers:
+            env["EMOTION_FACE_WORKERS"] = str(args.workers)
+        for mode in args.modes:
+            for concurrency in args.concurrency:
+                results.append(measure(mode, env, image, concurrency, args.requests))
+
+    for r in results:
+        stages = "  ".join(
+            f"{stage[:-3]}={r[stage]:6.1f}ms" for stage in STAGES if stage in r
+        )
+        print(f"{r['mode']:<9} c={r['concurrency']:<3} faces={r['faces']}  "
+              f"{r['images_per_second']:6.1f} img/s  {stages}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+HTTP latency of either service's FastAPI app under concurrent load.
+
+Drives the app in-process through httpx's ASGI transport, so each request
+pays for routing, validation, Starlette's thread pool (sync handlers),
+multipart parsing and JSON encoding, but not for sockets. ``--concurrency``
+closed-loop clients each send the next request as soon as the last one is
+answered::
+
+    python -m benchmarks.bench_http --service music --rows 100000
+    python -m benchmarks.bench_http --service facial --concurrency 1 8 32
+
+Latency and throughput count the requests answered with 200; those shed
+with 429 (more clients than ``SERVING_THREADS + SERVING_MAX_QUEUE``) are
+reported as ``rejected``. ``--rate`` adds open-loop runs, where requests
+arrive at a fixed rate however slowly they are answered, to see how the
+app behaves above its capacity.
+
+Both apps are modules named ``api``, so one run covers one service. Without
+``--weights`` the facial model from ``model.json`` runs with random weights,
+and its prediction cache is disabled so every request runs inference.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, List
+
+import numpy as np
+
+from benchmarks import FACIAL_DIR, MUSIC_DIR, use_service
+from benchmarks.bench_recommend import _percentile
+from benchmarks.synthetic import write_songs_json
+
+
+# A request as ``(path, keyword arguments for httpx.AsyncClient.post)``.
+Request = tuple[str, dict[str, Any]]
+
+
+async def _closed_loop(
+    app: Any,
+    make_request: Callable[[int], Request],
+    concurrency: int,
+    requests: int,
+    warmup: int,
+) -> dict[str, float]:
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+    # The transport does not run the lifespan, which sizes the thread pools.
+    async with app.router.lifespan_context(app), client:
+        for i in range(warmup):
+            path, kwargs = make_request(i)
+            await client.post(path, **kwargs)
+
+        responses: List[tuple[int, float]] = []
+        counter = iter(range(requests))
+
+        async def worker() -> None:
+            for i in counter:
+                responses.append(await _send(client, make_request(i)))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return _summary(responses, elapsed)
+
+
+async def _open_loop(
+    app: Any,
+    make_request: Callable[[int], Request],
+    rate: float,
+    requests: int,
+    warmup: int,
+) -> dict[str, float]:
+    """
+    Send ``requests`` at ``rate`` per second whatever the response times,
+    as independent users would; above capacity, requests pile up.
+    """
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    client = httpx.AsyncClient(transport=transport, base_url="http://bench")
+    async with app.router.lifespan_context(app), client:
+        for i in range(warmup):
+            path, kwargs = make_request(i)
+            await client.post(path, **kwargs)
+
+        tasks = []
+        start = time.perf_counter()
+        for i in range(requests):
+            await asyncio.sleep(max(0.0, start + i / rate - time.perf_counter()))
+            tasks.append(asyncio.ensure_future(_send(client, make_request(i))))
+        responses = await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+
+    return _summary(list(responses), elapsed)
+
+
+async def _send(client: Any, request: Request) -> tuple[int, float]:
+    path, kwargs = request
+    start = time.perf_counter()
+    response = await client.post(path, **kwargs)
+    return response.status_code, (time.perf_counter() - start) * 1e3
+
+
+def _summary(responses: List[tuple[int, float]], elapsed: float) -> dict[str, float]:
+    # Latencies and throughput are of the requests answered with 200.
+    latencies = [ms for status, ms in responses if status == 200]
+    served = latencies or [0.0]
+    return {
+        "requests_per_second": len(latencies) / elapsed,
+        "mean_ms": statistics.fmean(served),
+        "p50_ms": _percentile(served, 0.50),
+        "p99_ms": _percentile(served, 0.99),
+        "errors": sum(status not in (200, 429) for status, _ in responses),
+        "rejected": sum(status == 429 for status, _ in responses),
+    }
+
+
+def _music_requests(n: int, count: int, seed: int) -> tuple[Any, dict[str, Any]]:
+    use_service(MUSIC_DIR)
+    import api  # noqa: E402
+    import recommendation  # noqa: E402
+
+    artifact = recommendation._ensure_ready().artifact
+    rng = random.Random(seed)
+    rows = len(artifact.clusters)
+    titled: List[int] = []
+    while len(titled) < count:
+        i = rng.randrange(rows)
+        if artifact.titles[i]:
+            titled.append(i)
+    moods = np.random.default_rng(seed).dirichlet([0.3] * 7, count).tolist()
+
+    endpoints: dict[str, Callable[[int], Request]] = {
+        "by_track_id": lambda i: (
+            "/recommend/by-track-id",
+            {"json": {"track_id": artifact.track_ids[titled[i % count]], "n": n}},
+        ),
+        "by_title": lambda i: (
+            "/recommend/by-title",
+            {"json": {"title": artifact.titles[titled[i % count]], "n": n}},
+        ),
+        "by_emotion": lambda i: (
+            "/recommend/by-emotion",
+            {"json": {"probabilities": moods[i % count], "n": n}},
+        ),
+    }
+    return api.app, {"rows": rows, "endpoints": endpoints}
+
+
+def _facial_requests(count: int, seed: int) -> tuple[Any, dict[str, Any]]:
+    from benchmarks.bench_emotion import synthetic_images
+
+    os.environ["EMOTION_CACHE_SIZE"] = "0"
+    use_service(FACIAL_DIR)
+    import api  # noqa: E402  (the model loads with the first request)
+
+    images = synthetic_images(count, seed=seed)
+    endpoints: dict[str, Callable[[int], Request]] = {
+        "predict": lambda i: (
+            "/emotion/predict",
+            {"files": {"file": ("face.jpg", images[i % count], "image/jpeg")}},
+        ),
+    }
+    return api.app, {"endpoints": endpoints}
+
+
+def run(
+    service: str,
+    concurrency: List[int],
+    requests: int,
+    n: int,
+    seed: int,
+    warmup: int = 20,
+    rates: List[float] | None = None,
+) -> dict[str, Any]:
+    start = time.perf_counter()
+    if service == "music":
+        app, setup = _music_requests(n, min(requests, 4096), seed)
+    else:
+        app, setup = _facial_requests(min(requests, 256), seed)
+    load_seconds = time.perf_counter() - start
+
+    results: dict[str, Any] = {
+        "service": service,
+        "requests": requests,
+        "load_seconds": load_seconds,
+        **({"rows": setup["rows"], "n": n} if "rows" in setup else {}),
+        "endpoints": {},
+    }
+    for name, make_request in setup["endpoints"].items():
+        results["endpoints"][name] = {
+            f"c{clients}": asyncio.run(
+                _closed_loop(app, make_request, clients, requests, warmup)
+            )
+            for clients in concurrency
+        }
+        for rate in rates or ():
+            results["endpoints"][name][f"r{rate:g}"] = asyncio.run(
+                _open_loop(app, make_request, rate, requests, warmup)
+            )
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--service", choices=("music", "facial"), default="music")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument(
+        "--rate",
+        type=float,
+        nargs="*",
+        default=[],
+        help="Also send requests open-loop at these rates (per second)",
+    )
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument(
+        "--rows", type=int, default=20000, help="Synthetic catalogue size"
+    )
+    parser.add_argument("--songs", default=None, help="Use an existing songs.json")
+    parser.add_argument(
+        "--artifacts", default=None, help="Serve, or build into, this directory"
+    )
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--weights", default=None, help="Real model weights (.h5)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.service == "music":
+            songs_path = Path(args.songs) if args.songs else write_songs_json(
+                Path(tmp) / "songs.json", args.rows, seed=args.seed
+            )
+            os.environ["RECOMMENDER_SONGS_PATH"] = str(songs_path)
+            os.environ["RECOMMENDER_ARTIFACT_DIR"] = str(
+                args.artifacts or Path(tmp) / "artifacts"
+            )
+            os.environ["RECOMMENDER_WATCH_INTERVAL"] = "0"
+            # Measure the scoring path, not repeated cache hits.
+            os.environ["RECOMMENDER_CACHE_SIZE"] = "0"
+        else:
+            from benchmarks.bench_emotion import random_weights
+
+            weights = args.weights or random_weights(Path(tmp) / "random.weights.h5")
+            os.environ["EMOTION_MODEL_WEIGHTS_PATH"] = str(weights)
+        results = run(
+            args.service,
+            args.concurrency,
+            args.requests,
+            args.n,
+            args.seed,
+            rates=args.rate,
+        )
+
+    rows = f" rows={results['rows']}" if "rows" in results else ""
+    print(f"service={results['service']}{rows} requests={results['requests']} "
+          f"load={results['load_seconds']:.2f}s")
+    for name, levels in results["endpoints"].items():
+        for level, r in levels.items():
+            load = ("clients=" if level[0] == "c" else "rate=") + level[1:]
+            print(f"  {name:<12} {load:<11} "
+                  f"{r['requests_per_second']:8.1f} req/s  p50={r['p50_ms']:7.2f}ms  "
+                  f"p99={r['p99_ms']:7.2f}ms  errors={r['errors']}  "
+                  f"rejected={r['rejected']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
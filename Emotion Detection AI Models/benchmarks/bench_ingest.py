@@ -0,0 +1,122 @@
+"""
+Wall time and peak memory of songs.json ingestion.
+
+Runs the ingestion pipeline used by ``model_artifact.py build`` (loading,
+genre encoding, track index, validation / cleaning) in a fresh subprocess per
+catalogue size, so each peak RSS is measured in isolation::
+
+    python -m benchmarks.bench_ingest --rows 100000 1000000
+
+Point ``--service-dir`` at an older checkout to compare against it.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import List
+
+from benchmarks import MUSIC_DIR
+from benchmarks.synthetic import generate_songs, write_songs_json
+
+
+# Run inside each subprocess. Older trees have no streaming loader, so fall
+# back to the original load_songs -> songs_to_dataframe path there.
+_WORKER = r"""
+import json, resource, sys, time
+import data_utils
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+
+path = sys.argv[1]
+baseline = rss_mb()
+start = time.perf_counter()
+if hasattr(data_utils, "load_songs_frame"):
+    data = data_utils.load_songs_frame(path)
+else:
+    data = data_utils.songs_to_dataframe(data_utils.load_songs(path))
+loaded = time.perf_counter()
+data = data_utils.one_hot_encode_genres(data)
+encoded = time.perf_counter()
+data = data_utils.set_track_index(data)
+data = data_utils.validate_and_clean_data(data)
+end = time.perf_counter()
+
+print(json.dumps({
+    "rows": len(data),
+    "load_seconds": loaded - start,
+    "genres_seconds": encoded - loaded,
+    "clean_seconds": end - encoded,
+    "total_seconds": end - start,
+    "baseline_rss_mb": baseline,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+
+def write_songs_ndjson(path: Path, n: int, seed: int = 0) -> Path:
+    with path.open("w", encoding="utf-8") as f:
+        for song in generate_songs(n, seed=seed):
+            f.write(json.dumps(song))
+            f.write("\n")
+    return path
+
+
+def measure(service_dir: Path, songs_path: Path) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", _WORKER, str(songs_path)],
+        cwd=service_dir,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout)
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument(
+        "--ndjson", action="store_true", help="Also measure an NDJSON copy"
+    )
+    parser.add_argument(
+        "--service-dir",
+        default=str(MUSIC_DIR),
+        help="Music Recommendation System checkout to measure (e.g. an older tree)",
+    )
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            inputs = [("json", write_songs_json(Path(tmp) / f"songs_{rows}.json", rows))]
+            if args.ndjson:
+                inputs.append(
+                    ("ndjson", write_songs_ndjson(Path(tmp) / f"songs_{rows}.ndjson", rows))
+                )
+            for fmt, path in inputs:
+                result = {"format": fmt, **measure(Path(args.service_dir), path)}
+                result["rows_in"] = rows
+                results.append(result)
+                print(f"rows={rows:<8} {fmt:<6} total={result['total_seconds']:6.2f}s "
+                      f"(load {result['load_seconds']:.2f}s, "
+                      f"genres {result['genres_seconds']:.2f}s, "
+                      f"clean {result['clean_seconds']:.2f}s)  "
+                      f"peak_rss={result['peak_rss_mb']:7.1f}MB "
+                      f"(baseline {result['baseline_rss_mb']:.1f}MB)")
+                path.unlink()
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Cost of resolving track IDs to metadata with /tracks/lookup.
+
+Resolves the same random track IDs one per call (what a client does when it
+looks up each recommended track on its own) and in batches of increasing
+size, and reports the cost per track::
+
+    python -m benchmarks.bench_lookup --rows 1000000 --batch 1 20 100 500
+
+Calls the FastAPI handler functions directly (no HTTP), so the numbers
+exclude the round trip each separate call would add.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from benchmarks import MUSIC_DIR, use_service
+from benchmarks.synthetic import write_songs_json
+
+
+def run(
+    songs_path: Path,
+    artifact_dir: Path,
+    tracks: int,
+    batches: List[int],
+    fields: List[str],
+    seed: int,
+) -> dict:
+    os.environ["RECOMMENDER_SONGS_PATH"] = str(songs_path)
+    os.environ["RECOMMENDER_ARTIFACT_DIR"] = str(artifact_dir)
+    os.environ["RECOMMENDER_WATCH_INTERVAL"] = "0"
+    use_service(MUSIC_DIR)
+
+    import api  # noqa: E402
+    import recommendation  # noqa: E402
+
+    artifact = recommendation._ensure_ready().artifact
+    rng = random.Random(seed)
+    n_rows = len(artifact.clusters)
+    track_ids = [artifact.track_ids[rng.randrange(n_rows)] for _ in range(tracks)]
+
+    results: dict = {"rows": n_rows, "tracks": tracks, "fields": fields, "batch": {}}
+    for size in batches:
+        requests = [
+            api.TrackLookupRequest(track_ids=track_ids[i : i + size], fields=fields)
+            for i in range(0, tracks, size)
+        ]
+        start = time.perf_counter()
+        for request in requests:
+            api.api_lookup_tracks(request)
+        elapsed = time.perf_counter() - start
+        results["batch"][size] = {
+            "calls": len(requests),
+            "us_per_track": elapsed / tracks * 1e6,
+            "us_per_call": elapsed / len(requests) * 1e6,
+        }
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--songs", default=None, help="Use an existing songs.json")
+    parser.add_argument("--tracks", type=int, default=5000, help="IDs to resolve")
+    parser.add_argument("--batch", nargs="+", type=int, default=[1, 20, 100, 500])
+    parser.add_argument("--fields", nargs="*", default=["s3_url"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        songs_path = Path(args.songs) if args.songs else write_songs_json(
+            Path(tmp) / "songs.json", args.rows, seed=args.seed
+        )
+        results = run(
+            songs_path,
+            Path(tmp) / "artifacts",
+            args.tracks,
+            args.batch,
+            args.fields,
+            args.seed,
+        )
+
+    print(f"rows={results['rows']} tracks={results['tracks']} "
+          f"fields={','.join(results['fields']) or '-'}")
+    for size, r in results["batch"].items():
+        print(f"  batch={size:<5} calls={r['calls']:<6} "
+              f"{r['us_per_track']:7.2f}us/track  {r['us_per_call']:9.1f}us/call")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Resident memory of recommendation workers.
+
+Builds the model artifact for a synthetic catalogue, then starts several worker
+processes that each import ``recommendation`` (as a uvicorn worker would) and
+serve a few requests. Reports per-worker RSS, PSS (shared pages split between
+the processes mapping them) and USS (private memory) from
+``/proc/<pid>/smaps_rollup``, so Linux only::
+
+    python -m benchmarks.bench_memory --rows 100000 1000000 --workers 2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from benchmarks import MUSIC_DIR
+from benchmarks.synthetic import write_songs_json
+
+
+# Run inside each worker: load the model, serve some requests, report memory
+# once every worker is up so shared pages are counted against all of them.
+_WORKER = r"""
+import json, sys, time
+from pathlib import Path
+import recommendation
+
+artifact = recommendation._ensure_ready().artifact
+n_rows = len(artifact.clusters)
+for i in range(0, n_rows, max(n_rows // 200, 1)):
+    try:
+        recommendation.recommend_by_track_id(str(i), n=10)
+    except ValueError:
+        pass
+
+ready, go = Path(sys.argv[1]), Path(sys.argv[2])
+ready.write_text("ok")
+while not go.exists():
+    time.sleep(0.05)
+
+fields = {}
+with open("/proc/self/smaps_rollup") as f:
+    for line in f:
+        parts = line.split()
+        if len(parts) == 3 and parts[2] == "kB":
+            fields[parts[0].rstrip(":")] = int(parts[1])
+uss = fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)
+print(json.dumps({"rss_kb": fields["Rss"], "pss_kb": fields["Pss"], "uss_kb": uss}))
+"""
+
+
+def _build(service_dir: Path, songs_path: Path, artifact_dir: Path) -> float:
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "model_artifact.py", "build",
+         "--songs", str(songs_path), "--out", str(artifact_dir)],
+        cwd=service_dir,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def measure(service_dir: Path, rows: int, workers: int, workdir: Path) -> dict:
+    songs_path = write_songs_json(workdir / f"songs_{rows}.json", rows)
+    artifact_dir = workdir / f"artifacts_{rows}"
+    build_seconds = _build(service_dir, songs_path, artifact_dir)
+
+    env = dict(
+        os.environ,
+        RECOMMENDER_SONGS_PATH=str(songs_path),
+        RECOMMENDER_ARTIFACT_DIR=str(artifact_dir),
+        RECOMMENDER_ARTIFACT_POLICY="refuse",
+    )
+    go = workdir / f"go_{rows}"
+    procs = []
+    for i in range(workers):
+        ready = workdir / f"ready_{rows}_{i}"
+        procs.append(
+            (
+                ready,
+                subprocess.Popen(
+                    [sys.executable, "-c", _WORKER, str(ready), str(go)],
+                    cwd=service_dir,
+                    env=env,
+                    stdout=subprocess.PIPE,
+                    text=True,
+                ),
+            )
+        )
+    while not all(ready.exists() for ready, _ in procs):
+        if any(proc.poll() not in (None, 0) for _, proc in procs):
+            raise RuntimeError("worker failed to start")
+        time.sleep(0.1)
+    go.write_text("go")
+
+    samples = [json.loads(proc.communicate()[0]) for _, proc in procs]
+    mean = {
+        key: sum(s[key] for s in samples) / len(samples) / 1024
+        for key in ("rss_kb", "pss_kb", "uss_kb")
+    }
+    return {
+        "rows": rows,
+        "workers": workers,
+        "build_seconds": build_seconds,
+        "rss_mb": mean["rss_kb"],
+        "pss_mb": mean["pss_kb"],
+        "uss_mb": mean["uss_kb"],
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument(
+        "--service-dir",
+        default=str(MUSIC_DIR),
+        help="Music Recommendation System checkout to measure (e.g. an older tree)",
+    )
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in args.rows:
+            result = measure(Path(args.service_dir), rows, args.workers, Path(tmp))
+            results.append(result)
+            print(f"rows={result['rows']:<8} workers={result['workers']}  "
+                  f"rss={result['rss_mb']:7.1f}MB  pss={result['pss_mb']:7.1f}MB  "
+                  f"uss={result['uss_mb']:7.1f}MB  "
+                  f"(build {result['build_seconds']:.1f}s)")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
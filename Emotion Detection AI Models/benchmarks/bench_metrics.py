@@ -0,0 +1,128 @@
+"""
+Overhead of the stage timers in ``service_common/metrics.py``.
+
+Times an empty ``with stage(...)`` block with the timers on and off, then
+the recommendation handlers (result cache disabled, so every call runs the
+full lookup / neighbors / records path) with the timers toggled between
+alternating rounds, so machine noise hits both settings alike::
+
+    python -m benchmarks.bench_metrics --rows 100000 --requests 2000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, List
+
+from benchmarks import MUSIC_DIR, use_service
+from benchmarks.bench_recommend import _percentile
+from benchmarks.synthetic import write_songs_json
+
+
+def _stage_cost(metrics: Any, enabled: bool, loops: int) -> float:
+    """
+    Nanoseconds per ``with stage(...)`` block.
+    """
+    metrics.STAGE_TIMERS = enabled
+    stage = metrics.stage
+    start = time.perf_counter()
+    for _ in range(loops):
+        with stage("bench.empty"):
+            pass
+    return (time.perf_counter() - start) / loops * 1e9
+
+
+def _alternate(
+    metrics: Any, fn: Callable[[Any], Any], payloads: List[Any], rounds: int
+) -> dict[str, float]:
+    samples: dict[bool, List[float]] = {True: [], False: []}
+    for round_ in range(rounds):
+        for enabled in (round_ % 2 == 0, round_ % 2 == 1):
+            metrics.STAGE_TIMERS = enabled
+            for payload in payloads:
+                start = time.perf_counter()
+                fn(payload)
+                samples[enabled].append((time.perf_counter() - start) * 1e6)
+    return {
+        "on_p50_us": _percentile(samples[True], 0.50),
+        "off_p50_us": _percentile(samples[False], 0.50),
+        "on_p99_us": _percentile(samples[True], 0.99),
+        "off_p99_us": _percentile(samples[False], 0.99),
+    }
+
+
+def run(songs_path: Path, artifact_dir: Path, requests: int, rounds: int, seed: int):
+    os.environ["RECOMMENDER_SONGS_PATH"] = str(songs_path)
+    os.environ["RECOMMENDER_ARTIFACT_DIR"] = str(artifact_dir)
+    os.environ["RECOMMENDER_WATCH_INTERVAL"] = "0"
+    os.environ["RECOMMENDER_CACHE_SIZE"] = "0"
+    use_service(MUSIC_DIR)
+
+    import api  # noqa: E402
+    from service_common import metrics  # noqa: E402
+    import recommendation  # noqa: E402
+
+    artifact = recommendation._ensure_ready().artifact
+    rng = random.Random(seed)
+    rows = len(artifact.clusters)
+    track_ids = [artifact.track_ids[rng.randrange(rows)] for _ in range(requests)]
+    by_track = [api.RecommendByTrackIdRequest(track_id=t, n=10) for t in track_ids]
+    by_emotion = [
+        api.RecommendByEmotionRequest(
+            probabilities=[rng.random() for _ in range(7)], track_id=t, n=10
+        )
+        for t in track_ids
+    ]
+
+    results = {
+        "rows": rows,
+        "stage_on_ns": _stage_cost(metrics, True, 200000),
+        "stage_off_ns": _stage_cost(metrics, False, 200000),
+        "by_track_id": _alternate(
+            metrics, api.api_recommend_by_track_id, by_track, rounds
+        ),
+        "by_emotion_seeded": _alternate(
+            metrics, api.api_recommend_by_emotion, by_emotion, rounds
+        ),
+    }
+    metrics.STAGE_TIMERS = True
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--songs", default=None, help="Use an existing songs.json")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        songs_path = Path(args.songs) if args.songs else write_songs_json(
+            Path(tmp) / "songs.json", args.rows, seed=args.seed
+        )
+        results = run(
+            songs_path, Path(tmp) / "artifacts", args.requests, args.rounds, args.seed
+        )
+
+    print(f"rows={results['rows']}")
+    print(f"  with stage(): on={results['stage_on_ns']:.0f}ns "
+          f"off={results['stage_off_ns']:.0f}ns")
+    for name in ("by_track_id", "by_emotion_seeded"):
+        r = results[name]
+        print(f"  {name:<18} p50 on={r['on_p50_us']:7.1f}us off={r['off_p50_us']:7.1f}us"
+              f"  p99 on={r['on_p99_us']:7.1f}us off={r['off_p99_us']:7.1f}us")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
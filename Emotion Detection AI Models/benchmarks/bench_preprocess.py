@@ -0,0 +1,112 @@
+"""
+Image decode / preprocessing cost of /emotion/predict.
+
+Times the original full-resolution decode against the draft-mode decode
+into a preallocated buffer, for camera-sized JPEGs, plus the cost of a
+prediction-cache hit (hashing the upload only)::
+
+    python -m benchmarks.bench_preprocess --sizes 640x480 4032x3024
+
+Also reports the largest pixel difference between the two decodes, since
+draft mode downsamples in the DCT domain before the final resize.
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+
+from benchmarks import FACIAL_DIR, use_service
+
+
+def photo_jpeg(width: int, height: int, seed: int = 0, quality: int = 90) -> bytes:
+    """
+    A colour JPEG with smooth structure plus sensor-like noise, so it
+    compresses roughly like a photo rather than like pure noise.
+    """
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    base = 128 + 60 * np.sin(x / 97.0) * np.cos(y / 61.0)
+    channels = [base + rng.normal(0, 12, base.shape) + 20 * c for c in range(3)]
+    pixels = np.clip(np.stack(channels, axis=-1), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, mode="RGB").save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def legacy_preprocess(image_bytes: bytes) -> np.ndarray:
+    # The original preprocess_image_bytes.
+    from PIL import Image
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("L")
+        img = img.resize((48, 48))
+    arr = np.array(img).astype("float32") / 255.0
+    return np.expand_dims(np.expand_dims(arr, axis=-1), axis=0)
+
+
+def _time_ms(fn: Callable[[], object], repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def run(sizes: List[str], repeat: int) -> List[dict]:
+    use_service(FACIAL_DIR)
+    import emotion_model_utils as emu
+
+    buffer = np.empty((1, 48, 48, 1), dtype=np.float32)
+    results = []
+    for size in sizes:
+        width, height = (int(v) for v in size.lower().split("x"))
+        image = photo_jpeg(width, height)
+        legacy_ms = _time_ms(lambda: legacy_preprocess(image), repeat)
+        draft_ms = _time_ms(lambda: emu.preprocess_image_into(image, buffer[0]), repeat)
+        hash_ms = _time_ms(lambda: emu.image_key(image), repeat)
+        diff = np.abs(legacy_preprocess(image) - buffer).max() * 255
+        results.append(
+            {
+                "size": size,
+                "jpeg_kb": len(image) / 1024,
+                "legacy_ms": legacy_ms,
+                "draft_ms": draft_ms,
+                "cache_hit_ms": hash_ms,
+                "max_pixel_diff": float(diff),
+            }
+        )
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes", nargs="+", default=["640x480", "1920x1080", "4032x3024"]
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat)
+    for r in results:
+        print(f"{r['size']:<10} ({r['jpeg_kb']:6.0f} KB)  "
+              f"legacy={r['legacy_ms']:7.2f}ms  "
+              f"draft={r['draft_ms']:6.2f}ms  "
+              f"speedup={r['legacy_ms'] / r['draft_ms']:5.1f}x  "
+              f"cache_hit={r['cache_hit_ms']:5.2f}ms  "
+              f"max_pixel_diff={r['max_pixel_diff']:.0f}/255")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Per-request latency of the recommendation endpoints.
+
+Calls the FastAPI handler functions directly (no HTTP), so the numbers cover
+seed lookup, the neighbor query and response assembly::
+
+    python -m benchmarks.bench_recommend --rows 20000 --requests 2000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, List
+
+import numpy as np
+
+from benchmarks import MUSIC_DIR, use_service
+from benchmarks.synthetic import write_songs_json
+
+
+RESULTS = (
+    "by_title",
+    "by_track_id",
+    "from_multiple",
+    "by_emotion",
+    "by_emotion_seeded",
+)
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _time_calls(fn: Callable[[Any], Any], payloads: List[Any]) -> dict[str, float]:
+    """
+    Call ``fn`` once per payload and summarize the latencies in microseconds.
+    """
+    from fastapi import HTTPException
+
+    samples: List[float] = []
+    errors = 0
+    for payload in payloads:
+        start = time.perf_counter()
+        try:
+            fn(payload)
+        except HTTPException:
+            errors += 1
+        samples.append((time.perf_counter() - start) * 1e6)
+
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": _percentile(samples, 0.50),
+        "p99_us": _percentile(samples, 0.99),
+        "errors": errors,
+    }
+
+
+def run(songs_path: Path, artifact_dir: Path, requests: int, n: int, seed: int):
+    os.environ["RECOMMENDER_SONGS_PATH"] = str(songs_path)
+    os.environ["RECOMMENDER_ARTIFACT_DIR"] = str(artifact_dir)
+    os.environ.setdefault("RECOMMENDER_WATCH_INTERVAL", "0")
+    use_service(MUSIC_DIR)
+
+    start = time.perf_counter()
+    import api  # noqa: E402
+    import recommendation  # noqa: E402
+
+    artifact = recommendation._ensure_ready().artifact
+    load_seconds = time.perf_counter() - start
+
+    # Seeds are random titled tracks of the served artifact; parsing
+    # songs.json again would not fit in memory for the largest catalogues.
+    rng = random.Random(seed)
+    rows = len(artifact.clusters)
+    picks: List[dict[str, str]] = []
+    while len(picks) < requests:
+        i = rng.randrange(rows)
+        if artifact.titles[i]:
+            picks.append(
+                {"title": artifact.titles[i], "track_id": artifact.track_ids[i]}
+            )
+    titles = [s["title"] for s in picks]
+
+    by_title = [api.RecommendByTitleRequest(title=s["title"], n=n) for s in picks]
+    by_track = [api.RecommendByTrackIdRequest(track_id=s["track_id"], n=n) for s in picks]
+    multiple = [
+        api.RecommendFromMultipleRequest(
+            titles=rng.sample(titles, 3), n=n
+        )
+        for _ in range(requests)
+    ]
+    # Emotion mixes like the facial service's output: one dominant class.
+    moods = [
+        list(p) for p in np.random.default_rng(seed).dirichlet([0.3] * 7, requests)
+    ]
+    by_emotion = [api.RecommendByEmotionRequest(probabilities=p, n=n) for p in moods]
+    by_emotion_seeded = [
+        api.RecommendByEmotionRequest(probabilities=p, track_id=s["track_id"], n=n)
+        for p, s in zip(moods, picks)
+    ]
+
+    return {
+        "rows": rows,
+        "requests": requests,
+        "n": n,
+        "load_seconds": load_seconds,
+        "by_title": _time_calls(api.api_recommend_by_title, by_title),
+        "by_track_id": _time_calls(api.api_recommend_by_track_id, by_track),
+        "from_multiple": _time_calls(api.api_recommend_from_multiple, multiple),
+        "by_emotion": _time_calls(api.api_recommend_by_emotion, by_emotion),
+        "by_emotion_seeded": _time_calls(
+            api.api_recommend_by_emotion, by_emotion_seeded
+        ),
+    }
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--rows", type=int, default=20000, help="Synthetic catalogue size"
+    )
+    parser.add_argument("--songs", default=None, help="Use an existing songs.json")
+    parser.add_argument(
+        "--artifacts", default=None, help="Serve, or build into, this directory"
+    )
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--n", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        songs_path = Path(args.songs) if args.songs else write_songs_json(
+            Path(tmp) / "songs.json", args.rows, seed=args.seed
+        )
+        artifact_dir = Path(args.artifacts or Path(tmp) / "artifacts")
+        results = run(songs_path, artifact_dir, args.requests, args.n, args.seed)
+
+    print(f"rows={results['rows']} requests={results['requests']} n={results['n']} "
+          f"load={results['load_seconds']:.2f}s")
+    for name in RESULTS:
+        r = results[name]
+        print(f"  {name:<18} mean={r['mean_us']:8.1f}us  p50={r['p50_us']:8.1f}us  "
+              f"p99={r['p99_us']:8.1f}us  errors={r['errors']}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
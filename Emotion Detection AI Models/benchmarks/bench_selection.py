@@ -0,0 +1,168 @@
+"""
+Server-side exclusion / artist cap / diversity against filtering on the client.
+
+Each request excludes ``--played`` of the seed's ``2 * played`` nearest
+neighbors (tracks the listener already heard) and allows one song per artist. The "client"
+strategy asks for ``n``, filters the response, and asks again with double
+the ``n`` (up to the API limit of 100) while it is short; the "server"
+strategy sends the filters along and takes one response::
+
+    python -m benchmarks.bench_selection --rows 100000 --requests 1000
+
+Calls the FastAPI handler functions directly (no HTTP), with the result
+cache disabled so every call is scored.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, List
+
+from benchmarks import MUSIC_DIR, use_service
+from benchmarks.bench_recommend import _percentile
+from benchmarks.synthetic import write_songs_json
+
+
+API_MAX_N = 100
+
+
+def _summary(samples: List[float], calls: List[int], full: List[bool]) -> dict:
+    return {
+        "mean_us": statistics.fmean(samples),
+        "p50_us": _percentile(samples, 0.50),
+        "p99_us": _percentile(samples, 0.99),
+        "calls_per_request": statistics.fmean(calls),
+        "full_rate": sum(full) / len(full),
+    }
+
+
+def _usable(items: List[dict], played_oids: set, n: int) -> List[dict]:
+    seen_artists: set = set()
+    usable = []
+    for item in items:
+        if item["$oid"] in played_oids or item["artist"] in seen_artists:
+            continue
+        seen_artists.add(item["artist"])
+        usable.append(item)
+    return usable[:n]
+
+
+def run(
+    songs_path: Path,
+    artifact_dir: Path,
+    requests: int,
+    n: int,
+    played: int,
+    diversity: float,
+    seed: int,
+) -> dict[str, Any]:
+    os.environ["RECOMMENDER_SONGS_PATH"] = str(songs_path)
+    os.environ["RECOMMENDER_ARTIFACT_DIR"] = str(artifact_dir)
+    os.environ["RECOMMENDER_WATCH_INTERVAL"] = "0"
+    os.environ["RECOMMENDER_CACHE_SIZE"] = "0"
+    use_service(MUSIC_DIR)
+
+    import api  # noqa: E402
+    import recommendation  # noqa: E402
+
+    recommendation._ensure_ready()
+
+    with songs_path.open("r", encoding="utf-8") as f:
+        songs = json.load(f)
+    track_of = {song["_id"]["$oid"]: song["track_id"] for song in songs}
+    rng = random.Random(seed)
+    seeds = [rng.choice(songs)["track_id"] for _ in range(requests)]
+
+    # The listener has already played a random half of each seed's
+    # ``2 * played`` closest neighbors; the client knows them by both IDs.
+    history = []
+    for track_id in seeds:
+        neighbors = recommendation.recommend_by_track_id(track_id, n=played * 2)
+        oids = {item["$oid"] for item in rng.sample(neighbors, len(neighbors) // 2)}
+        history.append((oids, [track_of[oid] for oid in oids]))
+
+    results: dict[str, Any] = {"rows": len(songs), "requests": requests, "n": n}
+
+    samples, calls, full = [], [], []
+    for track_id, (oids, _) in zip(seeds, history):
+        start = time.perf_counter()
+        ask, made = n, 0
+        while True:
+            items = api.api_recommend_by_track_id(
+                api.RecommendByTrackIdRequest(track_id=track_id, n=ask)
+            )["items"]
+            made += 1
+            usable = _usable(items, oids, n)
+            if len(usable) == n or ask >= API_MAX_N or len(items) < ask:
+                break
+            ask = min(ask * 2, API_MAX_N)
+        samples.append((time.perf_counter() - start) * 1e6)
+        calls.append(made)
+        full.append(len(usable) == n)
+    results["client"] = _summary(samples, calls, full)
+
+    for label, weight in (("server", 0.0), ("server_mmr", diversity)):
+        samples, calls, full = [], [], []
+        for track_id, (oids, played_ids) in zip(seeds, history):
+            start = time.perf_counter()
+            items = api.api_recommend_by_track_id(
+                api.RecommendByTrackIdRequest(
+                    track_id=track_id,
+                    n=n,
+                    exclude_track_ids=played_ids,
+                    max_per_artist=1,
+                    diversity=weight,
+                )
+            )["items"]
+            samples.append((time.perf_counter() - start) * 1e6)
+            calls.append(1)
+            full.append(len(_usable(items, oids, n)) == n)
+        results[label] = _summary(samples, calls, full)
+    return results
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--songs", default=None, help="Use an existing songs.json")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--n", type=int, default=20)
+    parser.add_argument("--played", type=int, default=40, help="Tracks already played")
+    parser.add_argument("--diversity", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        songs_path = Path(args.songs) if args.songs else write_songs_json(
+            Path(tmp) / "songs.json", args.rows, seed=args.seed
+        )
+        results = run(
+            songs_path,
+            Path(tmp) / "artifacts",
+            args.requests,
+            args.n,
+            args.played,
+            args.diversity,
+            args.seed,
+        )
+
+    print(f"rows={results['rows']} requests={results['requests']} n={results['n']}")
+    for label in ("client", "server", "server_mmr"):
+        r = results[label]
+        print(f"  {label:<10} full={r['full_rate']:.2f} "
+              f"calls={r['calls_per_request']:.2f}  mean={r['mean_us']:7.1f}us "
+              f"p50={r['p50_us']:7.1f}us p99={r['p99_us']:7.1f}us")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Worker start-up cost of either service: import time and time to ready.
+
+Each sample is a fresh ``python -X importtime`` process that imports ``api``
+(as a uvicorn worker would), then waits until the models are loaded and a
+first request could be answered. Reports how long the import took, which
+top-level packages it and then the model loading spent their import time
+in, which heavy dependencies ended up imported, and how long the worker took
+to become ready::
+
+    python -m benchmarks.bench_startup --service music --rows 100000
+    python -m benchmarks.bench_startup --service facial --service-dir /old/tree
+
+Without ``--weights`` the facial model from ``model.json`` runs with random
+weights. ``--service-dir`` measures another checkout of the service, e.g.
+an older tree to compare against.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, List
+
+from benchmarks import FACIAL_DIR, MUSIC_DIR
+
+
+# Run inside each sample with the service as working directory.
+_WORKER = r"""
+import json, sys, time
+start = time.perf_counter()
+import api
+imported = time.perf_counter()
+sys.stderr.write(sys.argv[2] + "\n")
+if sys.argv[1] == "music":
+    import recommendation
+    recommendation._ensure_ready()
+else:
+    import numpy as np
+    from emotion_model_utils import get_batcher
+    get_batcher().predict(np.zeros((1, 48, 48, 1), dtype=np.float32))
+ready = time.perf_counter()
+print(json.dumps({
+    "import_seconds": imported - start,
+    "ready_seconds": ready - start,
+    "heavy_modules": [m for m in sys.argv[3:] if m in sys.modules],
+}))
+"""
+
+# Written to stderr between importing ``api`` and loading the models.
+_MARKER = "-- api imported --"
+
+# Dependencies worth knowing about when they show up in a worker.
+HEAVY_MODULES = ("pandas", "sklearn", "scipy", "tensorflow", "keras", "cv2")
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+) \|\s+\d+ \| +(\S+)$")
+
+
+def top_level_imports(stderr: str) -> dict[str, float]:
+    """
+    Milliseconds spent importing each top-level package (summing the
+    self time of all its modules) in ``-X importtime`` output.
+    """
+    totals: dict[str, float] = {}
+    for line in stderr.splitlines():
+        match = _IMPORTTIME.match(line)
+        if match:
+            package = match.group(2).split(".")[0]
+            totals[package] = totals.get(package, 0.0) + int(match.group(1)) / 1e3
+    return totals
+
+
+def _sample(service: str, service_dir: Path, env: dict[str, str]) -> dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _WORKER,
+         service, _MARKER, *HEAVY_MODULES],
+        cwd=service_dir,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    importing, _, loading = result.stderr.partition(_MARKER)
+    sample["imports_ms"] = top_level_imports(importing)
+    sample["load_imports_ms"] = top_level_imports(loading)
+    return sample
+
+
+def run(
+    service: str, service_dir: Path, env: dict[str, str], repeat: int, top: int
+) -> dict[str, Any]:
+    samples = [_sample(service, service_dir, env) for _ in range(repeat)]
+
+    def slowest(key: str) -> dict[str, float]:
+        packages = set().union(*(s[key] for s in samples))
+        imports = {
+            name: statistics.median(s[key].get(name, 0.0) for s in samples)
+            for name in packages
+        }
+        ranked = sorted(imports.items(), key=lambda item: item[1], reverse=True)
+        return {f"{name}_ms": ms for name, ms in ranked[:top]}
+
+    return {
+        "service": service,
+        "repeat": repeat,
+        "import_seconds": statistics.median(s["import_seconds"] for s in samples),
+        "ready_seconds": statistics.median(s["ready_seconds"] for s in samples),
+        "heavy_modules": samples[-1]["heavy_modules"],
+        "imports": slowest("imports_ms"),
+        "load_imports": slowest("load_imports_ms"),
+    }
+
+
+def _build(service_dir: Path, songs_path: Path, artifact_dir: Path) -> None:
+    subprocess.run(
+        [sys.executable, "model_artifact.py", "build",
+         "--songs", str(songs_path), "--out", str(artifact_dir)],
+        cwd=service_dir,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--service", choices=("music", "facial"), default="music")
+    parser.add_argument(
+        "--service-dir", default=None, help="Service checkout to measure"
+    )
+    parser.add_argument(
+        "--rows", type=int, default=100000, help="Synthetic catalogue size"
+    )
+    parser.add_argument("--songs", default=None, help="Use an existing songs.json")
+    parser.add_argument(
+        "--artifacts", default=None, help="Serve this prebuilt artifact directory"
+    )
+    parser.add_argument("--weights", default=None, help="Real model weights (.h5)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Packages to list")
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    args = parser.parse_args(argv)
+
+    default_dir = MUSIC_DIR if args.service == "music" else FACIAL_DIR
+    service_dir = Path(args.service_dir or default_dir)
+    env = dict(os.environ)
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.service == "music":
+            from benchmarks.synthetic import write_songs_json
+
+            songs_path = Path(args.songs) if args.songs else write_songs_json(
+                Path(tmp) / "songs.json", args.rows
+            )
+            artifact_dir = Path(args.artifacts or Path(tmp) / "artifacts")
+            if args.artifacts is None:
+                _build(service_dir, songs_path, artifact_dir)
+            env.update(
+                RECOMMENDER_SONGS_PATH=str(songs_path),
+                RECOMMENDER_ARTIFACT_DIR=str(artifact_dir),
+                RECOMMENDER_ARTIFACT_POLICY="refuse",
+                RECOMMENDER_WATCH_INTERVAL="0",
+            )
+        else:
+            from benchmarks.bench_emotion import random_weights
+
+            weights = args.weights or random_weights(Path(tmp) / "random.weights.h5")
+            env["EMOTION_MODEL_WEIGHTS_PATH"] = str(weights)
+        results = run(args.service, service_dir, env, args.repeat, args.top)
+
+    print(f"service={results['service']}  import={results['import_seconds']:.2f}s  "
+          f"ready={results['ready_seconds']:.2f}s  "
+          f"heavy modules: {', '.join(results['heavy_modules']) or 'none'}")
+    for key, title in (("imports", "import api"), ("load_imports", "then loading")):
+        print(f"  {title}:")
+        for name, ms in results[key].items():
+            print(f"    {name[:-3]:<24} {ms:8.1f} ms")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+"""
+Benchmark suite for both services, with comparison between runs.
+
+For each catalogue size a synthetic songs.json is generated and, each step
+in a fresh subprocess:
+
+- the artifact build (the offline half of ``_prepare_models``) is timed,
+  together with its peak memory and how long mapping the result takes;
+- every ``recommend_*`` handler is timed per call (``bench_recommend``),
+  including the serving-side ``_prepare_models`` on the prebuilt artifact;
+- the music app is load-tested over HTTP (``bench_http``).
+
+The facial service does not depend on the catalogue, so it runs once:
+``predict_emotion`` throughput through the batcher (``bench_emotion``) and
+HTTP latency of ``/emotion/predict``, with random weights unless
+``--weights`` is given. Everything lands in one JSON file::
+
+    python -m benchmarks.suite run --sizes 10000 100000 1000000 --output base.json
+    python -m benchmarks.suite run --sizes 10000 --output new.json --compare base.json
+    python -m benchmarks.suite compare base.json new.json
+
+``compare`` lists every latency, duration, memory and throughput figure the
+two files share, flagging those that got worse by more than ``--threshold``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Iterator, List
+
+from benchmarks import MUSIC_DIR, ROOT_DIR
+from benchmarks.synthetic import write_songs_json
+
+
+# Run inside a subprocess with the music service as working directory.
+_BUILD = r"""
+import json, resource, sys, time
+from model_artifact import build_artifact, load_artifact
+
+songs, out = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+build_artifact(songs, out)
+built = time.perf_counter()
+artifact = load_artifact(out, songs)
+loaded = time.perf_counter()
+print(json.dumps({
+    "rows": len(artifact.clusters),
+    "build_seconds": built - start,
+    "load_seconds": loaded - built,
+    "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}))
+"""
+
+# Figures where a smaller value is better, and where a larger one is.
+_LOWER_IS_BETTER = ("_us", "_ms", "_seconds", "_mb")
+_HIGHER_IS_BETTER = ("_per_second",)
+
+
+def _metadata() -> dict[str, Any]:
+    import numpy as np
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _bench(module: str, args: List[str], output: Path) -> Any:
+    """
+    Run ``python -m benchmarks.<module>`` and return the results it wrote.
+    """
+    subprocess.run(
+        [sys.executable, "-m", f"benchmarks.{module}", *args, "--output", str(output)],
+        cwd=ROOT_DIR,
+        check=True,
+    )
+    return json.loads(output.read_text(encoding="utf-8"))
+
+
+def _build(songs_path: Path, artifact_dir: Path) -> dict[str, Any]:
+    result = subprocess.run(
+        [sys.executable, "-c", _BUILD, str(songs_path), str(artifact_dir)],
+        cwd=MUSIC_DIR,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run_music(
+    size: int, workdir: Path, requests: int, concurrency: List[str], seed: int
+) -> dict[str, Any]:
+    songs_path = write_songs_json(workdir / f"songs_{size}.json", size, seed=seed)
+    artifact_dir = workdir / f"artifacts_{size}"
+    common = ["--songs", str(songs_path), "--artifacts", str(artifact_dir)]
+
+    print(f"== music rows={size}: build", flush=True)
+    build = _build(songs_path, artifact_dir)
+    print(f"   {build['build_seconds']:.2f}s, peak {build['peak_rss_mb']:.0f} MB")
+    results = {
+        "build": build,
+        "recommend": _bench(
+            "bench_recommend",
+            [*common, "--requests", str(requests), "--seed", str(seed)],
+            workdir / "recommend.json",
+        ),
+        "http": _bench(
+            "bench_http",
+            [
+                "--service", "music", *common,
+                "--requests", str(requests), "--concurrency", *concurrency,
+            ],
+            workdir / "http.json",
+        ),
+    }
+    songs_path.unlink()
+    return results
+
+
+def run_facial(
+    workdir: Path, requests: int, concurrency: List[str], weights: str | None
+) -> dict[str, Any]:
+    common = ["--weights", weights] if weights else []
+    print("== facial", flush=True)
+    throughput = _bench(
+        "bench_emotion",
+        [*common, "--requests", str(requests), "--concurrency", *concurrency],
+        workdir / "emotion.json",
+    )
+    return {
+        "throughput": {f"{r['mode']} c{r['concurrency']}": r for r in throughput},
+        "http": _bench(
+            "bench_http",
+            [
+                "--service", "facial", *common,
+                "--requests", str(requests), "--concurrency", *concurrency,
+            ],
+            workdir / "http.json",
+        ),
+    }
+
+
+def _figures(results: Any, prefix: str = "") -> Iterator[tuple[str, float]]:
+    """
+    Yield ``(dotted.path, value)`` for every comparable number in a result.
+    """
+    if isinstance(results, dict):
+        for key, value in results.items():
+            yield from _figures(value, f"{prefix}{key}.")
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        name = prefix[:-1]
+        if name.endswith(_LOWER_IS_BETTER + _HIGHER_IS_BETTER):
+            yield name, float(results)
+
+
+def compare(
+    old: dict[str, Any], new: dict[str, Any], threshold: float
+) -> List[dict[str, Any]]:
+    """
+    Compare the figures two suite results share; ``regression`` marks those
+    that got worse by more than ``threshold`` (a fraction).
+    """
+    before = dict(_figures(old))
+    rows = []
+    for name, value in _figures(new):
+        if name not in before or before[name] == 0:
+            continue
+        change = value / before[name] - 1.0
+        worse = -change if name.endswith(_HIGHER_IS_BETTER) else change
+        rows.append(
+            {
+                "figure": name,
+                "old": before[name],
+                "new": value,
+                "change": change,
+                "regression": worse > threshold,
+            }
+        )
+    return rows
+
+
+def _print_comparison(rows: List[dict[str, Any]]) -> None:
+    width = max((len(r["figure"]) for r in rows), default=0)
+    for r in rows:
+        flag = "  REGRESSION" if r["regression"] else ""
+        print(f"{r['figure']:<{width}}  {r['old']:12.2f} -> {r['new']:12.2f}  "
+              f"{r['change']:+7.1%}{flag}")
+    regressions = sum(r["regression"] for r in rows)
+    print(f"{len(rows)} figures compared, {regressions} regressions")
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the suite")
+    run_parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    run_parser.add_argument("--requests", type=int, default=1000)
+    run_parser.add_argument(
+        "--facial-requests", type=int, default=256, help="Images per facial run"
+    )
+    run_parser.add_argument("--concurrency", nargs="+", default=["1", "8", "32"])
+    run_parser.add_argument("--skip-music", action="store_true")
+    run_parser.add_argument("--skip-facial", action="store_true")
+    run_parser.add_argument("--weights", default=None, help="Real model weights (.h5)")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", required=True, help="Write results as JSON")
+    run_parser.add_argument("--compare", default=None, help="Earlier results file")
+
+    compare_parser = subparsers.add_parser("compare", help="Compare two results files")
+    compare_parser.add_argument("old")
+    compare_parser.add_argument("new")
+
+    for sub in (run_parser, compare_parser):
+        sub.add_argument(
+            "--threshold", type=float, default=0.15, help="Tolerated slowdown"
+        )
+        sub.add_argument(
+            "--strict", action="store_true", help="Exit with 1 on any regression"
+        )
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        results: dict[str, Any] = {"meta": _metadata(), "music": {}}
+        with tempfile.TemporaryDirectory() as tmp:
+            if not args.skip_music:
+                for size in args.sizes:
+                    results["music"][str(size)] = run_music(
+                        size, Path(tmp), args.requests, args.concurrency, args.seed
+                    )
+            if not args.skip_facial:
+                results["facial"] = run_facial(
+                    Path(tmp), args.facial_requests, args.concurrency, args.weights
+                )
+        Path(args.output).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Wrote {args.output}")
+        if args.compare is None:
+            return
+        old = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+    else:
+        old = json.loads(Path(args.old).read_text(encoding="utf-8"))
+        results = json.loads(Path(args.new).read_text(encoding="utf-8"))
+
+    rows = compare(old, results, args.threshold)
+    _print_comparison(rows)
+    if args.strict and any(r["regression"] for r in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Iterator, List
+
+import numpy as np
+
+
+AUDIO_FEATURES = (
+    "acousticness",
+    "danceability",
+    "energy",
+    "instrumentalness",
+    "liveness",
+    "speechiness",
+    "tempo",
+    "valence",
+)
+
+GENRES = (
+    "Rock", "Pop", "Hip-Hop", "Electronic", "Jazz", "Punk", "Indie-Rock",
+    "Folk", "Classical", "Metal", "Disco", "Blues", "Soul", "Reggae",
+    "Country", "Ambient", "Techno", "House", "Loud-Rock", "Psych-Rock",
+    "Synth Pop", "Bluegrass", "Experimental", "Noise", "Lo-Fi", "Trip-Hop",
+    "Drum & Bass", "Garage", "Post-Rock", "Shoegaze",
+)
+
+
+def _audio_features(rng: np.random.Generator, n: int) -> dict[str, np.ndarray]:
+    """
+    Draw audio features with roughly the marginal shapes seen in songs.json.
+    """
+    return {
+        "acousticness": rng.beta(0.6, 1.2, n),
+        "danceability": rng.beta(2.5, 2.5, n),
+        "energy": rng.beta(2.0, 1.5, n),
+        "instrumentalness": rng.beta(0.3, 0.8, n),
+        "liveness": rng.beta(1.2, 6.0, n),
+        "speechiness": rng.beta(0.8, 8.0, n),
+        "tempo": np.clip(rng.normal(122.0, 28.0, n), 40.0, 240.0),
+        "valence": rng.beta(1.6, 1.8, n),
+    }
+
+
+def generate_feature_matrix(n: int, seed: int = 0) -> np.ndarray:
+    """
+    Return an ``(n, len(AUDIO_FEATURES))`` matrix of synthetic audio features,
+    for benchmarks that bypass songs.json parsing entirely.
+    """
+    features = _audio_features(np.random.default_rng(seed), n)
+    return np.column_stack([features[name] for name in AUDIO_FEATURES])
+
+
+def iter_songs(
+    n: int, seed: int = 0, null_rate: float = 0.01
+) -> Iterator[dict[str, Any]]:
+    """
+    Yield ``n`` songs.json-style records one at a time.
+
+    Genre popularity follows a Zipf-like curve, a few percent of titles are
+    duplicated, and ``null_rate`` of titles / some feature values are missing,
+    mirroring the real catalogue.
+    """
+    rng = np.random.default_rng(seed)
+    features = _audio_features(rng, n)
+
+    genre_weights = 1.0 / np.arange(1, len(GENRES) + 1)
+    genre_weights /= genre_weights.sum()
+    genre_counts = rng.choice(5, size=n, p=[0.03, 0.55, 0.25, 0.12, 0.05])
+
+    # ~3% of songs reuse the title of another song.
+    duplicate = rng.random(n) < 0.03
+    title_ids = np.where(duplicate, rng.integers(0, max(n // 10, 1), n), np.arange(n))
+    missing_title = rng.random(n) < null_rate
+    missing_feature = rng.random((n, len(AUDIO_FEATURES))) < null_rate / 4
+
+    for i in range(n):
+        audio_feature = {
+            name: None if missing_feature[i, j] else round(float(features[name][i]), 10)
+            for j, name in enumerate(AUDIO_FEATURES)
+        }
+        genres = rng.choice(
+            len(GENRES), size=genre_counts[i], replace=False, p=genre_weights
+        )
+        yield {
+            "_id": {"$oid": f"{0x696BDC61EAEECC7F00000000 + i:024x}"},
+            "track_id": str(i),
+            "artist": f"Artist {rng.integers(0, max(n // 8, 1))}",
+            "title": None if missing_title[i] else f"Track {title_ids[i]}",
+            "genre": [GENRES[g] for g in genres],
+            "audio_feature": audio_feature,
+            "s3_url": f"s3://music-bucket/tracks/{i}.mp3",
+        }
+
+
+def generate_songs(
+    n: int, seed: int = 0, null_rate: float = 0.01
+) -> List[dict[str, Any]]:
+    """
+    Generate ``n`` songs.json-style records (see ``iter_songs``).
+    """
+    return list(iter_songs(n, seed=seed, null_rate=null_rate))
+
+
+def write_songs_json(path: str | Path, n: int, seed: int = 0) -> Path:
+    """
+    Write a synthetic catalogue of ``n`` songs to ``path`` and return it.
+
+    Songs are written as they are generated, so million-row catalogues do
+    not have to fit in memory as Python objects.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        f.write("[")
+        for i, song in enumerate(iter_songs(n, seed=seed)):
+            if i:
+                f.write(", ")
+            json.dump(song, f)
+        f.write("]")
+    return path
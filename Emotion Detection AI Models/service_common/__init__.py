@@ -0,0 +1,8 @@
+"""
+Modules shared by the FastAPI services: ``metrics`` (stage timers, request
+counters, ``GET /metrics``) and ``serving`` (thread pools, load shedding and
+the multi-worker launcher).
+
+The services import it through their ``shared_path`` module, which puts
+``Emotion Detection AI Models/`` on ``sys.path``.
+"""
@@ -0,0 +1,449 @@
+"""
+In-process metrics for the FastAPI services: per-stage timers, request
+counters and latency histograms, rendered in the Prometheus text format for
+``GET /metrics``, plus an opt-in sampling profiler for slow requests.
+"""
+from __future__ import annotations
+
+import os
+import re
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Mapping, Tuple
+
+
+# Stage timers cost one to two microseconds per stage; set
+# METRICS_STAGE_TIMERS=0 to turn ``stage()`` into a shared no-op.
+STAGE_TIMERS = os.environ.get("METRICS_STAGE_TIMERS", "1") != "0"
+
+# Sampling profiler: requests slower than METRICS_PROFILE_SLOW_MS get the
+# stacks sampled while they ran (every METRICS_PROFILE_INTERVAL_MS) written
+# to METRICS_PROFILE_DIR as folded stacks. Off unless the threshold is set;
+# at most METRICS_PROFILE_MAX_FILES files are written per process.
+PROFILE_SLOW_MS = float(os.environ.get("METRICS_PROFILE_SLOW_MS", "0"))
+PROFILE_INTERVAL_MS = float(os.environ.get("METRICS_PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = Path(os.environ.get("METRICS_PROFILE_DIR", "profiles"))
+PROFILE_MAX_FILES = int(os.environ.get("METRICS_PROFILE_MAX_FILES", "100"))
+
+# Histogram bucket upper bounds in seconds, from 50 microseconds to 10 seconds.
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram, safe to update from any thread.
+
+    ``observe`` only appends to a deque (atomic under the GIL, so no lock on
+    the hot path); observations are sorted into buckets in batches, when
+    read or once enough have queued up.
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "_pending", "_lock")
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self.buckets = buckets
+        # One count per bucket plus the +Inf overflow, not yet cumulative.
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._pending: "deque[float]" = deque()
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        self._pending.append(seconds)
+        if len(self._pending) >= 1024:
+            self._drain()
+
+    def _drain(self) -> None:
+        with self._lock:
+            pending, buckets, counts = self._pending, self.buckets, self.counts
+            while pending:
+                seconds = pending.popleft()
+                counts[bisect_left(buckets, seconds)] += 1
+                self.sum += seconds
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        self._drain()
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+_LOCK = threading.Lock()
+_HISTOGRAMS: Dict[Tuple[str, Labels], Histogram] = {}
+_COUNTERS: Dict[Tuple[str, Labels], float] = {}
+_GAUGES: Dict[Tuple[str, Labels], float] = {}
+_STAGES: Dict[str, Histogram] = {}
+_HELP = {
+    "stage_duration_seconds": "Time spent in each stage of request handling.",
+    "http_requests_total": "HTTP requests by route, method and status code.",
+    "http_request_duration_seconds": "HTTP request latency by route.",
+    "http_requests_in_flight": "HTTP requests being handled right now.",
+    "http_requests_shed_total": "HTTP requests answered 429 because of overload.",
+    "model_load_seconds": "Time the last model load took.",
+    "process_resident_memory_bytes": "Resident memory of this process.",
+    "process_cpu_seconds_total": "CPU time used by this process.",
+    "process_start_time_seconds": "Start time of this process (Unix time).",
+}
+_START_TIME = time.time()
+
+
+def histogram(name: str, labels: Labels = ()) -> Histogram:
+    """
+    Return the histogram ``name`` with ``labels``, creating it on first use.
+    """
+    key = (name, labels)
+    found = _HISTOGRAMS.get(key)
+    if found is None:
+        with _LOCK:
+            found = _HISTOGRAMS.setdefault(key, Histogram())
+    return found
+
+
+def inc(name: str, labels: Labels = (), amount: float = 1.0) -> None:
+    key = (name, labels)
+    with _LOCK:
+        _COUNTERS[key] = _COUNTERS.get(key, 0.0) + amount
+
+
+def set_gauge(name: str, value: float, labels: Labels = ()) -> None:
+    with _LOCK:
+        _GAUGES[(name, labels)] = float(value)
+
+
+# ── Stage timers ──────────────────────────────────────────────────────────────
+
+_perf_counter = time.perf_counter
+
+
+class _Stage:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: Histogram) -> None:
+        self.histogram = histogram
+
+    def __enter__(self) -> "_Stage":
+        self.start = _perf_counter()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.histogram.observe(_perf_counter() - self.start)
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoStage":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        return None
+
+
+_NO_STAGE = _NoStage()
+
+
+def _stage_histogram(name: str) -> Histogram:
+    found = _STAGES.get(name)
+    if found is None:
+        found = histogram("stage_duration_seconds", (("stage", name),))
+        _STAGES[name] = found
+    return found
+
+
+def stage(name: str) -> _Stage | _NoStage:
+    """
+    Time a block into ``stage_duration_seconds{stage=name}``::
+
+        with stage("recommend.neighbors"):
+            ...
+    """
+    if not STAGE_TIMERS:
+        return _NO_STAGE
+    return _Stage(_STAGES.get(name) or _stage_histogram(name))
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    """
+    Record a stage duration measured elsewhere (e.g. a response's timings).
+    """
+    if STAGE_TIMERS:
+        _stage_histogram(name).observe(seconds)
+
+
+# ── Exposition ────────────────────────────────────────────────────────────────
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{_escape(value)}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _resident_memory_bytes() -> int:
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        import resource
+
+        # Peak rather than current RSS, in KiB on Linux and bytes on macOS.
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def render(
+    gauges: Mapping[str, float] | None = None,
+    counters: Mapping[str, float] | None = None,
+) -> str:
+    """
+    Every metric in the Prometheus text exposition format, plus process
+    memory and CPU time and the service-specific ``gauges`` / ``counters``.
+    """
+    set_gauge("process_resident_memory_bytes", _resident_memory_bytes())
+    set_gauge("process_start_time_seconds", _START_TIME)
+
+    with _LOCK:
+        _COUNTERS[("process_cpu_seconds_total", ())] = time.process_time()
+        histograms = sorted(_HISTOGRAMS.items())
+        counter_items = sorted(_COUNTERS.items())
+        gauge_items = sorted(_GAUGES.items())
+    counter_items += [((name, ()), value) for name, value in (counters or {}).items()]
+    gauge_items += [((name, ()), value) for name, value in (gauges or {}).items()]
+
+    lines: List[str] = []
+    declared: set[str] = set()
+
+    def declare(name: str, kind: str) -> None:
+        if name not in declared:
+            declared.add(name)
+            if name in _HELP:
+                lines.append(f"# HELP {name} {_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+
+    for (name, labels), hist in histograms:
+        declare(name, "histogram")
+        counts, total = hist.snapshot()
+        cumulative = 0
+        for bound, count in zip(hist.buckets, counts):
+            cumulative += count
+            le = _format_labels(labels, f'le="{bound}"')
+            lines.append(f"{name}_bucket{le} {cumulative}")
+        cumulative += counts[-1]
+        inf = _format_labels(labels, 'le="+Inf"')
+        lines.append(f"{name}_bucket{inf} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {total!r}")
+        lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    for kind, items in (("counter", counter_items), ("gauge", gauge_items)):
+        for (name, labels), value in items:
+            declare(name, kind)
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# ── Slow-request profiler ─────────────────────────────────────────────────────
+
+def _fold(frame: Any) -> List[str]:
+    """
+    The frames of a stack, outermost first, as ``function (file:line)``.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        name = getattr(code, "co_qualname", code.co_name)
+        names.append(f"{name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.reverse()
+    return names
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of every thread each ``interval`` seconds while at
+    least one request is in flight, keeping the most recent ``max_samples``.
+
+    Requests that took ``slow`` seconds or longer get the samples taken
+    while they ran written to ``directory`` as folded stacks: one
+    ``thread;outer;...;inner count`` line per distinct stack, which
+    flamegraph.pl, inferno and speedscope render as a flame graph. Stacks of
+    all threads are kept because the work of one request can span the event
+    loop, the thread pool and worker threads such as the inference batcher;
+    idle threads show up as their waiting frames.
+    """
+
+    def __init__(
+        self,
+        slow: float,
+        interval: float,
+        directory: Path,
+        max_files: int = 100,
+        max_samples: int = 50000,
+    ) -> None:
+        self.slow = slow
+        self.interval = interval
+        self.directory = directory
+        self.max_files = max_files
+        self.files_written = 0
+        self._samples: "deque[Tuple[float, str]]" = deque(maxlen=max_samples)
+        self._pending: List[Tuple[str, float, float, float]] = []
+        self._active = 0
+        self._wake = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def begin(self) -> float:
+        """
+        Note a request starting; returns its start time for :meth:`end`.
+        """
+        with self._wake:
+            self._active += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="metrics-profiler", daemon=True
+                )
+                self._thread.start()
+            self._wake.notify()
+        return time.perf_counter()
+
+    def end(self, started: float, label: str) -> None:
+        """
+        Note a request ending; if it was slow, queue its stacks to be written.
+        """
+        ended = time.perf_counter()
+        with self._wake:
+            self._active -= 1
+            if ended - started >= self.slow and self.files_written < self.max_files:
+                self._pending.append((label, started, ended, time.time()))
+                self._wake.notify()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while True:
+            with self._wake:
+                while not self._active and not self._pending:
+                    self._wake.wait()
+                pending, self._pending = self._pending, []
+            for dump in pending:
+                self._write(*dump)
+            if self._active:
+                self._sample(own)
+                time.sleep(self.interval)
+
+    def _sample(self, own: int) -> None:
+        now = time.perf_counter()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident != own:
+                thread = names.get(ident, str(ident))
+                self._samples.append((now, ";".join([thread, *_fold(frame)])))
+
+    def _write(self, label: str, started: float, ended: float, wall: float) -> None:
+        if self.files_written >= self.max_files:
+            return
+        counts: Dict[str, int] = {}
+        for at, stack in list(self._samples):
+            if started <= at <= ended:
+                counts[stack] = counts.get(stack, 0) + 1
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", label).strip("_") or "request"
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(wall))
+        millis = int((ended - started) * 1e3)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{stamp}-{self.files_written:04d}-{slug}-{millis}ms.folded"
+        path = self.directory / name
+        with path.open("w", encoding="utf-8") as f:
+            for stack, count in sorted(counts.items()):
+                f.write(f"{stack} {count}\n")
+        self.files_written += 1
+
+
+PROFILER = (
+    SamplingProfiler(
+        PROFILE_SLOW_MS / 1e3, PROFILE_INTERVAL_MS / 1e3, PROFILE_DIR, PROFILE_MAX_FILES
+    )
+    if PROFILE_SLOW_MS > 0
+    else None
+)
+
+
+# ── ASGI middleware ───────────────────────────────────────────────────────────
+
+class MetricsMiddleware:
+    """
+    Count and time every HTTP request by route template (``/recommend/...``,
+    not the raw path, so the label set stays bounded) and method, and hand
+    requests to the slow-request profiler when it is enabled.
+    """
+
+    def __init__(self, app: Callable[..., Awaitable[None]]) -> None:
+        self.app = app
+        self._in_flight = 0
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self._in_flight += 1
+        set_gauge("http_requests_in_flight", self._in_flight)
+        started = PROFILER.begin() if PROFILER is not None else 0.0
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            self._in_flight -= 1
+            set_gauge("http_requests_in_flight", self._in_flight)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or _route_path(scope)
+            method = scope["method"]
+            histogram("http_request_duration_seconds", (("route", path),)).observe(
+                elapsed
+            )
+            inc(
+                "http_requests_total",
+                (("method", method), ("route", path), ("status", str(status))),
+            )
+            if PROFILER is not None:
+                PROFILER.end(started, f"{method} {path}")
+
+
+def _route_path(scope: dict) -> str:
+    """
+    The route template of a request on Starlette versions that do not put
+    the matched route in the scope, or of one answered before routing (e.g.
+    shed with a 429).
+    """
+    from starlette.routing import Match
+
+    endpoint = scope.get("endpoint")
+    for route in getattr(scope.get("app"), "routes", ()):
+        if endpoint is not None:
+            if getattr(route, "endpoint", None) is endpoint:
+                return route.path
+        elif route.matches(scope)[0] is Match.FULL:
+            return route.path
+    return "unmatched"
+
@@ -0,0 +1,196 @@
+"""
+Worker concurrency for the FastAPI services: how many threads run blocking
+work, how many BLAS threads each may use, when to shed load instead of
+queueing it, and a launcher for several worker processes::
+
+    cd "Emotion Detection AI Models"
+    python -m service_common.serving "Facial Recognition System" --workers 4
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Awaitable, Callable, Iterable, List
+
+from service_common.metrics import inc
+
+
+# Worker processes started by ``main``; each worker reads it to take its
+# share of the cores.
+WORKERS = int(os.environ.get("SERVING_WORKERS", "1"))
+
+# Threads per worker for blocking work: Starlette's pool for sync handlers
+# and the event loop's default executor (asyncio.to_thread).
+THREADS = int(os.environ.get("SERVING_THREADS", "0")) or min(
+    32, (os.cpu_count() or 1) + 4
+)
+
+# Requests allowed to wait beyond the SERVING_THREADS being handled; later
+# ones get 429 with a Retry-After of SERVING_RETRY_AFTER seconds. 0 disables
+# load shedding.
+MAX_QUEUE = int(os.environ.get("SERVING_MAX_QUEUE", "64"))
+RETRY_AFTER = int(os.environ.get("SERVING_RETRY_AFTER", "1"))
+MAX_IN_FLIGHT = THREADS + MAX_QUEUE if MAX_QUEUE > 0 else 0
+
+# BLAS / OpenMP threads per worker; 0 leaves it to the service (see
+# ``limit_blas_threads``).
+BLAS_THREADS = int(os.environ.get("SERVING_BLAS_THREADS", "0"))
+
+# Read at start-up by OpenBLAS, MKL, OpenMP, numexpr and TensorFlow.
+_THREAD_ENV = (
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "BLIS_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+    "TF_NUM_INTRAOP_THREADS",
+)
+
+# Never shed: probes and monitoring must answer however busy the worker is.
+EXEMPT_PATHS = ("/health", "/ready", "/metrics")
+
+
+def limit_blas_threads(default: int | None = None) -> int:
+    """
+    Cap the BLAS / OpenMP thread pools of this process and return the cap:
+    ``SERVING_BLAS_THREADS`` if set, else ``default``, else an even share of
+    the cores between the ``SERVING_WORKERS`` processes.
+
+    Libraries already loaded are capped through threadpoolctl when it is
+    installed; the environment variables cover those loaded later (e.g.
+    TensorFlow, which the emotion service imports while its model loads).
+    """
+    threads = BLAS_THREADS or default or max(1, (os.cpu_count() or 1) // WORKERS)
+    for name in _THREAD_ENV:
+        os.environ.setdefault(name, str(threads))
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return threads
+    threadpool_limits(limits=threads)
+    return threads
+
+
+def configure_thread_pools(threads: int = THREADS) -> None:
+    """
+    Size the pools that run blocking work. Call from the event loop, e.g. in
+    the app's lifespan.
+    """
+    import anyio.to_thread
+
+    # Starlette runs sync handlers through anyio's default limiter ...
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    # ... and asyncio.to_thread uses the loop's default executor.
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=threads, thread_name_prefix="serving")
+    )
+
+
+class LoadShedder:
+    """
+    Answer 429 instead of queueing once ``max_in_flight`` requests are being
+    handled (0: never), so latency stays bounded under overload and clients
+    (or the load balancer) retry elsewhere. Paths in ``exempt`` are never
+    shed.
+
+    Install it inside ``MetricsMiddleware`` so shed requests are counted.
+    """
+
+    def __init__(
+        self,
+        app: Callable[..., Awaitable[None]],
+        max_in_flight: int = MAX_IN_FLIGHT,
+        retry_after: int = RETRY_AFTER,
+        exempt: Iterable[str] = EXEMPT_PATHS,
+    ) -> None:
+        self.app = app
+        self.max_in_flight = max_in_flight
+        self.exempt = frozenset(exempt)
+        self._in_flight = 0
+        self._body = json.dumps({"detail": "Server overloaded, retry later"}).encode()
+        self._headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(self._body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+        ]
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if (
+            scope["type"] != "http"
+            or self.max_in_flight <= 0
+            or scope["path"] in self.exempt
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        # Only the event loop thread touches the counter, so no lock.
+        if self._in_flight >= self.max_in_flight:
+            inc("http_requests_shed_total")
+            await send(
+                {"type": "http.response.start", "status": 429, "headers": self._headers}
+            )
+            await send({"type": "http.response.body", "body": self._body})
+            return
+
+        self._in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._in_flight -= 1
+
+
+# ── Launcher ──────────────────────────────────────────────────────────────────
+
+def main(argv: List[str] | None = None) -> None:
+    """
+    Serve ``api:app`` of a service from several worker processes on one port.
+
+    Workers are separate interpreters, so pure-Python work (building
+    response records, JSON encoding, image decoding) runs in parallel
+    instead of contending for one GIL. Each worker loads the model itself,
+    read-only: the recommender memory-maps the same artifact files, so its
+    features, metadata and lookup tables are shared through the page cache
+    rather than copied per worker.
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__.strip().splitlines()[0])
+    parser.add_argument("service_dir", help="Service directory holding api.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1, help="Worker processes"
+    )
+    parser.add_argument("--threads", type=int, default=None, help="SERVING_THREADS")
+    parser.add_argument("--max-queue", type=int, default=None, help="SERVING_MAX_QUEUE")
+    parser.add_argument(
+        "--blas-threads", type=int, default=None, help="SERVING_BLAS_THREADS"
+    )
+    args = parser.parse_args(argv)
+
+    # Workers are spawned, so they read their settings from the environment.
+    os.environ["SERVING_WORKERS"] = str(args.workers)
+    for name, value in (
+        ("SERVING_THREADS", args.threads),
+        ("SERVING_MAX_QUEUE", args.max_queue),
+        ("SERVING_BLAS_THREADS", args.blas_threads),
+    ):
+        if value is not None:
+            os.environ[name] = str(value)
+
+    import uvicorn
+
+    uvicorn.run(
+        "api:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        app_dir=str(Path(args.service_dir).resolve()),
+    )
+
+
+if __name__ == "__main__":
+    main()
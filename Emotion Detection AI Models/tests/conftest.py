@@ -0,0 +1,23 @@
+"""
+Tests for both services. Their modules are flat (``recommendation``,
+``emotion_model_utils``, ...), so both service directories go on
+``sys.path``, as the benchmarks do::
+
+    cd "Emotion Detection AI Models"
+    python -m pytest -q tests
+"""
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+if str(ROOT_DIR) not in sys.path:
+    sys.path.insert(0, str(ROOT_DIR))
+
+from benchmarks import FACIAL_DIR, MUSIC_DIR, use_service  # noqa: E402
+
+
+use_service(MUSIC_DIR)
+use_service(FACIAL_DIR)
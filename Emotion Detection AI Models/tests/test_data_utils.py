@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from benchmarks.synthetic import generate_songs
+from data_utils import READ_CHUNK_CHARS, iter_songs
+
+
+def _write_array(path, songs, separator=", "):
+    path.write_text("[" + separator.join(json.dumps(s) for s in songs) + "]")
+    return path
+
+
+def test_json_array_across_the_read_chunk_boundary(tmp_path):
+    # Enough songs for the file to span several default-sized reads, so some
+    # song objects are split between two of them.
+    songs = generate_songs(6000, seed=1)
+    path = _write_array(tmp_path / "songs.json", songs)
+    assert path.stat().st_size > 2 * READ_CHUNK_CHARS
+
+    assert list(iter_songs(path)) == songs
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 7, 64, 4096])
+def test_json_array_with_small_chunks(tmp_path, chunk_chars):
+    songs = generate_songs(50, seed=2)
+    path = _write_array(tmp_path / "songs.json", songs, separator=" ,\n  ")
+    path.write_text("\n  " + path.read_text() + "\n")
+
+    assert list(iter_songs(path, chunk_chars=chunk_chars)) == songs
+
+
+@pytest.mark.parametrize("text", ["[]", "  [ \n ]  ", "", "\n\n"])
+def test_empty_inputs(tmp_path, text):
+    path = tmp_path / "songs.json"
+    path.write_text(text)
+
+    assert list(iter_songs(path, chunk_chars=2)) == []
+
+
+@pytest.mark.parametrize("chunk_chars", [3, 100, READ_CHUNK_CHARS])
+def test_ndjson(tmp_path, chunk_chars):
+    songs = generate_songs(200, seed=3)
+    lines = [json.dumps(s) for s in songs]
+    # Blank lines are skipped and the last line needs no newline.
+    path = tmp_path / "songs.ndjson"
+    path.write_text("\n" + "\n".join(lines[:100]) + "\n\n" + "\n".join(lines[100:]))
+
+    assert list(iter_songs(path, chunk_chars=chunk_chars)) == songs
+
+
+def test_malformed_inputs(tmp_path):
+    path = tmp_path / "songs.json"
+    path.write_text('[{"track_id": "1"} {"track_id": "2"}]')
+    with pytest.raises(ValueError, match="expected ','"):
+        list(iter_songs(path, chunk_chars=4))
+
+    path.write_text('[{"track_id": "1"}, 2]')
+    with pytest.raises(ValueError, match="list of song objects"):
+        list(iter_songs(path))
+
+    path.write_text('{"track_id": "1"}\n[1]\n')
+    with pytest.raises(ValueError, match="one song object"):
+        list(iter_songs(path))
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+
+import numpy as np
+import pytest
+
+import emotion_model_utils
+from emotion_model_utils import EMOTION_CLASSES, InferenceBatcher, predict_probabilities
+
+
+class FakeModel:
+    """
+    Keras stand-in whose output row ``i`` is the first pixel of input ``i``
+    plus the class index, so every row says which image it came from.
+    """
+
+    def __init__(self) -> None:
+        self.batch_sizes: list[int] = []
+
+    def predict_on_batch(self, batch: np.ndarray) -> np.ndarray:
+        self.batch_sizes.append(len(batch))
+        return batch[:, 0, 0, :1] + np.arange(len(EMOTION_CLASSES))
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(emotion_model_utils, "ENGINE", "keras")
+    monkeypatch.setattr(emotion_model_utils, "load_inference_model", lambda: model)
+    return model
+
+
+def _images(first_id: int, count: int) -> np.ndarray:
+    ids = np.arange(first_id, first_id + count, dtype=np.float32)
+    return np.broadcast_to(ids[:, None, None, None], (count, 48, 48, 1)).copy()
+
+
+def _held_batcher(max_batch_size: int, predict_fn=predict_probabilities):
+    """
+    A batcher whose worker waits until the returned event is set, so every
+    job submitted before that is queued when batching starts.
+    """
+    release = threading.Event()
+    batcher = InferenceBatcher(
+        predict_fn, max_batch_size=max_batch_size, max_wait_ms=0, warmup=release.wait
+    )
+    return batcher, release
+
+
+def test_rows_go_back_to_their_futures_under_padding(model):
+    batcher, release = _held_batcher(max_batch_size=8)
+    sizes = [3, 2, 1, 4, 1, 5]
+    jobs, first_id = [], 0
+    for size in sizes:
+        jobs.append((first_id, size, batcher.submit(_images(first_id, size))))
+        first_id += size
+    release.set()
+
+    for first, size, future in jobs:
+        expected = np.arange(first, first + size)[:, None] + np.arange(
+            len(EMOTION_CLASSES)
+        )
+        np.testing.assert_array_equal(future.result(timeout=10), expected)
+    batcher.close()
+
+    # 3+2+1 (4 does not fit), 4+1, 5: padded to the 8 / 8 / 8 buckets.
+    assert batcher.stats()["batch_size_histogram"] == {"5": 2, "6": 1}
+    assert model.batch_sizes == [8, 8, 8]
+
+
+def test_batches_above_the_largest_bucket_are_split(model):
+    batcher, release = _held_batcher(max_batch_size=64)
+    big = batcher.submit(_images(0, 40))
+    small = batcher.submit(_images(40, 3))
+    release.set()
+
+    assert big.result(timeout=10)[:, 0].tolist() == list(range(40))
+    assert small.result(timeout=10)[:, 0].tolist() == [40, 41, 42]
+    batcher.close()
+    # 43 rows: one chunk of the largest bucket (32), then 11 padded to 16.
+    assert model.batch_sizes == [32, 16]
+
+
+def test_errors_reach_every_caller_and_cancelled_jobs_are_skipped():
+    calls = []
+
+    def failing(batch: np.ndarray) -> np.ndarray:
+        calls.append(len(batch))
+        raise RuntimeError("model failed")
+
+    batcher, release = _held_batcher(max_batch_size=8, predict_fn=failing)
+    cancelled = batcher.submit(_images(0, 2))
+    futures = [batcher.submit(_images(2, 1)), batcher.submit(_images(3, 2))]
+    assert cancelled.cancel()
+    release.set()
+
+    for future in futures:
+        with pytest.raises(RuntimeError, match="model failed"):
+            future.result(timeout=10)
+    batcher.close()
+    assert calls == [3]
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import shutil
+
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import generate_songs, write_songs_json
+from model_artifact import (
+    build_artifact,
+    load_artifact,
+    prune_builds,
+    refit_artifact,
+    resolve_latest,
+    update_artifact,
+)
+
+
+ROWS = 400
+CLUSTERS = 4
+
+
+@pytest.fixture(scope="module")
+def built(tmp_path_factory):
+    root = tmp_path_factory.mktemp("built")
+    songs_path = write_songs_json(root / "songs.json", ROWS, seed=0)
+    build_artifact(songs_path, root / "artifacts", n_clusters=CLUSTERS, cluster_jobs=1)
+    return songs_path, root / "artifacts"
+
+
+@pytest.fixture
+def artifact_dir(built, tmp_path):
+    """
+    A private copy of the built artifact, so each test can write revisions.
+    """
+    songs_path, source = built
+    target = tmp_path / "artifacts"
+    shutil.copytree(source, target)
+    return songs_path, target
+
+
+def _load(artifact_dir):
+    songs_path, target = artifact_dir
+    return load_artifact(target, songs_path, mmap=False)
+
+
+def _row(artifact, track_id):
+    position = artifact.position_for_track_id(track_id)
+    if position is None:
+        return None
+    return {
+        "title": artifact.titles[position],
+        "artist": artifact.artists[position],
+        "genres": artifact.genres_at(position),
+        "s3_url": artifact.metadata_for("s3_url", np.array([position]))[0],
+        "cluster": int(artifact.clusters[position]),
+        "features": np.array(artifact.features[position]),
+    }
+
+
+def _new_songs(count, prefix="new", seed=7):
+    songs = generate_songs(count, seed=seed, null_rate=0.0)
+    for i, song in enumerate(songs):
+        song["track_id"] = f"{prefix}{i}"
+        song["title"] = f"Fresh {prefix} {i}"
+        song["artist"] = f"Newcomer {i}"
+        song["s3_url"] = f"s3://new/{prefix}{i}.mp3"
+    return songs
+
+
+def _assert_consistent(artifact):
+    n = len(artifact.clusters)
+    assert len(artifact.features) == len(artifact.track_ids) == n
+    assert len(artifact.titles) == len(artifact.artists) == n
+    assert artifact.clusters.min() >= 0
+    assert artifact.clusters.max() < int(artifact.manifest["n_clusters"])
+    assert np.isfinite(artifact.features).all()
+    for position in range(n):
+        assert artifact.position_for_track_id(artifact.track_ids[position]) == position
+
+
+def test_add(artifact_dir):
+    before = _load(artifact_dir)
+    untouched = {t: _row(before, t) for t in ("0", "17", "399")}
+    songs = _new_songs(3)
+
+    build_dir, summary = update_artifact(before, add=songs)
+    after = _load(artifact_dir)
+
+    assert summary == {"added": 3, "replaced": 0, "removed": 0, "missing": []}
+    assert after.build_id == build_dir.name == f"{before.build_id}-r1"
+    assert len(after.clusters) == ROWS + 3
+    _assert_consistent(after)
+    for song in songs:
+        row = _row(after, song["track_id"])
+        assert row["title"] == song["title"]
+        assert row["artist"] == song["artist"]
+        assert row["genres"] == song["genre"]
+        assert row["s3_url"] == song["s3_url"]
+        assert after.position_for_track_id(song["track_id"]) in (
+            after.positions_for_title(song["title"])
+        )
+    # Existing tracks keep their features and cluster.
+    for track_id, row in untouched.items():
+        new_row = _row(after, track_id)
+        np.testing.assert_array_equal(new_row.pop("features"), row["features"])
+        assert new_row == {k: v for k, v in row.items() if k != "features"}
+
+
+def test_replace(artifact_dir):
+    before = _load(artifact_dir)
+    song = _new_songs(1)[0]
+    song["track_id"] = "5"
+    old_title = before.titles[before.position_for_track_id("5")]
+
+    _, summary = update_artifact(before, add=[song])
+    after = _load(artifact_dir)
+
+    assert summary == {"added": 0, "replaced": 1, "removed": 0, "missing": []}
+    assert len(after.clusters) == ROWS
+    _assert_consistent(after)
+    row = _row(after, "5")
+    assert (row["title"], row["artist"]) == (song["title"], song["artist"])
+    assert after.position_for_track_id("5") not in after.positions_for_title(old_title)
+
+
+def test_remove(artifact_dir):
+    before = _load(artifact_dir)
+    kept = _row(before, "3")
+
+    _, summary = update_artifact(before, remove=["1", "2", "2", "unknown"])
+    after = _load(artifact_dir)
+
+    assert summary == {"added": 0, "replaced": 0, "removed": 2, "missing": ["unknown"]}
+    assert len(after.clusters) == ROWS - 2
+    _assert_consistent(after)
+    assert _row(after, "1") is None and _row(after, "2") is None
+    np.testing.assert_array_equal(_row(after, "3")["features"], kept["features"])
+
+
+def test_add_and_remove_the_same_track(artifact_dir):
+    before = _load(artifact_dir)
+    song = _new_songs(1)[0]
+    song["track_id"] = "8"
+
+    _, summary = update_artifact(before, add=[song], remove=["8"])
+    after = _load(artifact_dir)
+
+    # Removed first, then added back with the new data.
+    assert summary == {"added": 1, "replaced": 0, "removed": 1, "missing": []}
+    assert len(after.clusters) == ROWS
+    _assert_consistent(after)
+    assert _row(after, "8")["title"] == song["title"]
+
+
+def test_successive_updates_and_refit_keep_added_tracks(artifact_dir):
+    songs = _new_songs(5)
+    update_artifact(_load(artifact_dir), add=songs[:3])
+    update_artifact(_load(artifact_dir), add=songs[3:], remove=["new0", "10"])
+    updated = _load(artifact_dir)
+    assert updated.manifest["incremental"]["added"] == 5
+
+    build_dir = refit_artifact(updated, n_clusters=CLUSTERS, cluster_jobs=1)
+    refit = _load(artifact_dir)
+
+    assert refit.build_id == build_dir.name
+    assert build_dir.name.endswith("-r3")
+    assert len(refit.clusters) == ROWS - 1 + 4
+    _assert_consistent(refit)
+    assert refit.manifest["incremental"] == {
+        "fitted_rows": ROWS + 3,
+        "added": 0,
+        "removed": 0,
+        "updates": 0,
+    }
+    assert _row(refit, "new0") is None and _row(refit, "10") is None
+    for song in songs[1:]:
+        row = _row(refit, song["track_id"])
+        assert (row["title"], row["genres"]) == (song["title"], song["genre"])
+
+
+def test_prune_keeps_latest(artifact_dir):
+    _, root = artifact_dir
+    for i in range(3):
+        update_artifact(_load(artifact_dir), add=_new_songs(1, prefix=f"p{i}"))
+    latest = resolve_latest(root)
+
+    removed = prune_builds(root, keep=2, grace=0)
+
+    builds = sorted(p.name for p in root.iterdir() if p.is_dir())
+    assert len(removed) == 2
+    assert latest.name in builds and len(builds) == 2
+    assert _row(_load(artifact_dir), "p20") is not None
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import json
+from collections import Counter
+
+import numpy as np
+import pytest
+
+import recommendation
+from benchmarks.synthetic import generate_songs
+from knn_index import build_index
+from model_artifact import build_artifact, load_artifact
+from recommendation import ModelSnapshot, Selection
+
+
+ROWS = 600
+ARTISTS = 12
+
+
+@pytest.fixture(scope="module")
+def snapshot(tmp_path_factory):
+    root = tmp_path_factory.mktemp("rerank")
+    songs = generate_songs(ROWS, seed=4)
+    for i, song in enumerate(songs):
+        # Few artists, so the per-artist cap removes most candidates.
+        song["artist"] = f"Artist {i % ARTISTS}"
+    songs_path = root / "songs.json"
+    songs_path.write_text(json.dumps(songs))
+    build_artifact(songs_path, root / "artifacts", n_clusters=2, cluster_jobs=1)
+    artifact = load_artifact(root / "artifacts", songs_path, mmap=False)
+    index = build_index(
+        (artifact.index_positions, artifact.index_offsets, artifact.index_blocks),
+        backend="exact",
+    )
+    return ModelSnapshot(artifact=artifact, index=index, mood=None, loaded_at="")
+
+
+@pytest.fixture(autouse=True)
+def small_pool(monkeypatch):
+    # A pool smaller than most requests need, so it has to grow.
+    monkeypatch.setattr(recommendation, "RERANK_POOL", 4)
+
+
+def _ranked(snapshot, seed, exclude):
+    """
+    Every eligible member of the seed's cluster, best first.
+    """
+    artifact = snapshot.artifact
+    cluster = int(artifact.clusters[seed])
+    size = int((artifact.clusters == cluster).sum())
+    positions, _ = snapshot.index.query(
+        artifact.features[seed], cluster, size, exclude | {seed}
+    )
+    return positions.tolist()
+
+
+def _expected_count(snapshot, ranked, n, cap):
+    if cap is None:
+        return min(n, len(ranked))
+    per_artist = Counter(snapshot.artifact.artists.take(np.asarray(ranked)))
+    return min(n, sum(min(cap, count) for count in per_artist.values()))
+
+
+def _recommend(snapshot, seed, n, selection):
+    records = recommendation._recommend_for_position(
+        snapshot, seed, n, "seed", selection
+    )
+    return [snapshot.artifact.position_for_track_id(r["track_id"]) for r in records]
+
+
+@pytest.mark.parametrize(
+    "n, cap, diversity, excluded",
+    [
+        (8, 1, 0.0, 0),
+        (30, 2, 0.0, 0),
+        (10, 1, 0.5, 0),
+        (25, 3, 0.3, 40),
+        (30, None, 0.9, 40),
+        (200, 1, 0.0, 0),  # more than the cap allows: every eligible song
+        (500, None, 0.2, 10),  # more than the cluster holds
+    ],
+)
+def test_returns_n_when_enough_candidates(snapshot, n, cap, diversity, excluded):
+    artifact = snapshot.artifact
+    seed = 0
+    exclude = frozenset(_ranked(snapshot, seed, frozenset())[: 2 * excluded : 2])
+    assert len(exclude) == excluded
+    ranked = _ranked(snapshot, seed, exclude)
+    selection = Selection(exclude=exclude, max_per_artist=cap, diversity=diversity)
+
+    picked = _recommend(snapshot, seed, n, selection)
+
+    assert len(picked) == _expected_count(snapshot, ranked, n, cap)
+    assert len(set(picked)) == len(picked)
+    assert seed not in picked and not exclude & set(picked)
+    assert set(artifact.clusters[picked]) == {artifact.clusters[seed]}
+    if cap is not None:
+        assert max(Counter(artifact.artists.take(np.asarray(picked))).values()) <= cap
+
+
+def test_cap_without_diversity_keeps_each_artists_best(snapshot):
+    artifact = snapshot.artifact
+    ranked = _ranked(snapshot, 0, frozenset())
+    per_artist: Counter[str] = Counter()
+    expected = []
+    for position in ranked:
+        artist = artifact.artists[position]
+        if per_artist[artist] < 2:
+            per_artist[artist] += 1
+            expected.append(position)
+
+    picked = _recommend(snapshot, 0, 15, Selection(max_per_artist=2))
+
+    assert picked == expected[:15]
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import pytest
+
+import result_cache
+from result_cache import ResultCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeShared:
+    """
+    In-memory stand-in for ``RedisResultStore``.
+    """
+
+    url = "fake://"
+    errors = 0
+
+    def __init__(self) -> None:
+        self.values: dict[tuple, list] = {}
+        self.ttls: dict[tuple, float] = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def put(self, key, records, ttl):
+        self.values[key] = records
+        self.ttls[key] = ttl
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(result_cache.time, "monotonic", clock)
+    return clock
+
+
+def test_get_and_put_copy_the_records():
+    cache = ResultCache(10)
+    records = [{"track_id": "1", "score": 0.5}]
+    cache.put(("v1", "track", "1", 5), records)
+    records[0]["score"] = 0.0
+    records.append({"track_id": "2"})
+
+    first = cache.get(("v1", "track", "1", 5))
+    assert first == [{"track_id": "1", "score": 0.5}]
+    first[0]["extra"] = True
+    first.clear()
+
+    assert cache.get(("v1", "track", "1", 5)) == [{"track_id": "1", "score": 0.5}]
+    assert cache.stats()["hits"] == 2
+
+
+def test_shared_hits_are_copied_and_kept_locally():
+    shared = FakeShared()
+    shared.values[("v1", "track", "1", 5)] = [{"track_id": "1"}]
+    cache = ResultCache(10, ttl=60.0, shared=shared)
+
+    records = cache.get(("v1", "track", "1", 5))
+    records[0]["track_id"] = "changed"
+    assert shared.values[("v1", "track", "1", 5)] == [{"track_id": "1"}]
+    assert cache.get(("v1", "track", "1", 5)) == [{"track_id": "1"}]
+    assert (cache.stats()["shared_hits"], cache.stats()["hits"]) == (1, 1)
+
+    cache.put(("v1", "track", "2", 5), [{"track_id": "2"}])
+    assert shared.ttls[("v1", "track", "2", 5)] == 60.0
+
+
+def test_entries_expire_after_the_ttl(clock):
+    cache = ResultCache(10, ttl=30.0)
+    cache.put(("v1", "a"), [{"track_id": "1"}])
+
+    clock.now += 29.9
+    assert cache.get(("v1", "a")) is not None
+    clock.now += 0.1
+    assert cache.get(("v1", "a")) is None
+    stats = cache.stats()
+    assert (stats["expirations"], stats["misses"], stats["entries"]) == (1, 1, 0)
+
+
+def test_no_ttl_never_expires(clock):
+    cache = ResultCache(10)
+    cache.put(("v1", "a"), [])
+
+    clock.now += 10**9
+    assert cache.get(("v1", "a")) == []
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResultCache(2)
+    cache.put(("v1", "a"), [])
+    cache.put(("v1", "b"), [])
+    cache.get(("v1", "a"))
+    cache.put(("v1", "c"), [])
+
+    assert cache.get(("v1", "b")) is None
+    assert cache.get(("v1", "a")) == []
+    assert cache.stats()["evictions"] == 1
+
+
+def test_invalidate_drops_other_versions():
+    cache = ResultCache(10)
+    for key in [("v1", "a"), ("v1", "b"), ("v2", "a")]:
+        cache.put(key, [{"key": list(key)}])
+
+    assert cache.invalidate("v2") == 2
+    assert cache.get(("v1", "a")) is None
+    assert cache.get(("v2", "a")) == [{"key": ["v2", "a"]}]
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_disabled_local_tier():
+    cache = ResultCache(0)
+    cache.put(("v1", "a"), [])
+
+    assert cache.get(("v1", "a")) is None
+    assert cache.stats()["entries"] == 0